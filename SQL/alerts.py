@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from quantity import Quantity, parse_quantity
+
+
+# 提醒类型
+ALERT_LOW = '余量不足'
+ALERT_LOW_PERCENT = '余量比例低'
+ALERT_IDLE = '久未使用'
+ALERT_EXPIRING = '即将过期'
+ALERT_EXPIRED = '已过期'
+
+# 默认规则，可在配置文件中用 alert_rules 覆盖；值为 None 时不检查该项
+DEFAULT_RULES = {
+    'min_remaining': None,  # 剩余量低于该数量（如 '5g'、'10mL'）
+    'min_percent': 10,  # 剩余量低于原净含量的百分比
+    'idle_days': 180,  # 超过天数没有使用
+    'expiry_days': 30,  # 距有效期不足天数
+}
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class AlertEngine:
+    """
+    库存提醒：每次写入某个产品后，只按主键读取该产品在 records 中的最新状态
+    （剩余量、原净含量、最后使用、有效期）检查规则，不扫描整张表。
+    随时间变化的规则（久未使用、过期）由 check_due 定期检查，每次只查询
+    上次检查以来新跨过期限的那一段时间范围（使用索引）。
+    同一产品同一类型的提醒在解除前只记录一次。
+    """
+
+    def __init__(self, db_manager, rules=None):
+        """
+        :param db_manager: DynamicDatabase，提醒保存在同一个数据库的 alerts 表中
+        :param rules: 覆盖 DEFAULT_RULES 的规则
+        """
+        self.db_manager = db_manager
+        self.conn = db_manager.conn
+        self.cursor = self.conn.cursor()
+        self.rules = dict(DEFAULT_RULES, **(rules or {}))
+        self.min_remaining = parse_quantity(self.rules['min_remaining']) if self.rules['min_remaining'] else None
+        self.listeners = []  # 产生新提醒时调用，参数为提醒字典
+        self._create_tables()
+        db_manager.add_write_listener(self.evaluate)
+
+    def _create_tables(self):
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS alerts (
+                提醒_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                产品_id INTEGER,
+                仓库_id INTEGER,
+                类型 TEXT,
+                内容 TEXT,
+                创建时间 TIMESTAMP,
+                解除时间 TIMESTAMP
+            );
+        """)
+        # 每个产品每种类型只有一条未解除的提醒
+        self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_active "
+                            "ON alerts (产品_id, 类型) WHERE 解除时间 IS NULL;")
+        # 定期检查的进度：上次检查到的时间界限
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS alert_state (名称 TEXT PRIMARY KEY, 值 TEXT);")
+        self.conn.commit()
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def evaluate(self, product_id, now=None):
+        """
+        按某个产品的最新状态检查全部规则：满足条件的产生提醒，不再满足的解除。
+        :return: 新产生的提醒列表
+        """
+        now = now or datetime.now()
+        self.cursor.execute("SELECT 仓库_id, 名称, 净含量, 单位, 精度, 剩余量, 最后使用, 有效期 "
+                            "FROM records WHERE 产品_id = ?;", (product_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return []
+        warehouse_id, name, original, unit, precision, remaining, last_used, expiry = row
+        label = f"{warehouse_id}:{product_id} {name if name not in (None, 'null') else ''}".strip()
+
+        triggered = {}
+        if isinstance(remaining, (int, float)) and unit:
+            quantity = Quantity(remaining, unit, precision or 0)
+            if self.min_remaining is not None and quantity.dimension == self.min_remaining.dimension \
+                    and remaining < self.min_remaining.base:
+                triggered[ALERT_LOW] = f"{label} 剩余 {quantity.display()}，低于 {self.min_remaining.display()}"
+            if self.rules['min_percent'] is not None and isinstance(original, (int, float)) and original > 0:
+                percent = remaining / original * 100
+                if percent < self.rules['min_percent']:
+                    triggered[ALERT_LOW_PERCENT] = f"{label} 剩余 {quantity.display()}，仅为原量的 {percent:.0f}%"
+        if self.rules['idle_days'] is not None and last_used:
+            cutoff = (now - timedelta(days=self.rules['idle_days'])).strftime(TIME_FORMAT)
+            if last_used < cutoff:
+                triggered[ALERT_IDLE] = f"{label} 自 {last_used[:10]} 起超过 {self.rules['idle_days']} 天未使用"
+        if expiry and expiry != 'null':
+            today = now.strftime('%Y-%m-%d')
+            if expiry < today:
+                triggered[ALERT_EXPIRED] = f"{label} 已于 {expiry} 过期"
+            elif self.rules['expiry_days'] is not None and \
+                    expiry <= (now + timedelta(days=self.rules['expiry_days'])).strftime('%Y-%m-%d'):
+                triggered[ALERT_EXPIRING] = f"{label} 将于 {expiry} 过期"
+
+        timestamp = now.strftime(TIME_FORMAT)
+        new_alerts = []
+        for alert_type in (ALERT_LOW, ALERT_LOW_PERCENT, ALERT_IDLE, ALERT_EXPIRING, ALERT_EXPIRED):
+            if alert_type in triggered:
+                self.cursor.execute("INSERT OR IGNORE INTO alerts (产品_id, 仓库_id, 类型, 内容, 创建时间) "
+                                    "VALUES (?, ?, ?, ?, ?);",
+                                    (product_id, warehouse_id, alert_type, triggered[alert_type], timestamp))
+                if self.cursor.rowcount:
+                    new_alerts.append({'提醒_id': self.cursor.lastrowid, '产品_id': product_id,
+                                       '仓库_id': warehouse_id, '类型': alert_type,
+                                       '内容': triggered[alert_type], '创建时间': timestamp})
+            else:
+                self.cursor.execute("UPDATE alerts SET 解除时间 = ? "
+                                    "WHERE 产品_id = ? AND 类型 = ? AND 解除时间 IS NULL;",
+                                    (timestamp, product_id, alert_type))
+        self.conn.commit()
+
+        for alert in new_alerts:
+            for callback in self.listeners:
+                callback(alert)
+        return new_alerts
+
+    def check_due(self, now=None):
+        """
+        检查随时间到期的规则：只查询自上次检查以来最后使用时间跨过久未使用期限、
+        或有效期进入提醒范围/已经过去的产品。
+        :return: 新产生的提醒列表
+        """
+        now = now or datetime.now()
+        windows = []
+        if self.rules['idle_days'] is not None:
+            cutoff = (now - timedelta(days=self.rules['idle_days'])).strftime(TIME_FORMAT)
+            windows.append(('idle_cutoff', '最后使用', cutoff, True))
+        today = now.strftime('%Y-%m-%d')
+        windows.append(('expired_before', '有效期', today, True))
+        if self.rules['expiry_days'] is not None:
+            horizon = (now + timedelta(days=self.rules['expiry_days'])).strftime('%Y-%m-%d')
+            windows.append(('expiring_until', '有效期', horizon, False))
+
+        product_ids = set()
+        for state_name, column, bound, exclusive in windows:
+            previous = self._get_state(state_name)
+            if previous is not None and previous >= bound:
+                continue
+            upper = '<' if exclusive else '<='
+            lower = ('>=' if exclusive else '>') if previous is not None else '>'
+            # 首次检查从最早的值开始（'' 小于任何日期文本）
+            self.cursor.execute(f"SELECT 产品_id FROM records WHERE {column} {lower} ? AND {column} {upper} ? "
+                                f"AND {column} != 'null';", (previous or '', bound))
+            product_ids.update(row[0] for row in self.cursor.fetchall())
+            self._set_state(state_name, bound)
+        self.conn.commit()
+
+        new_alerts = []
+        for product_id in sorted(product_ids):
+            new_alerts.extend(self.evaluate(product_id, now))
+        return new_alerts
+
+    def _get_state(self, name):
+        self.cursor.execute("SELECT 值 FROM alert_state WHERE 名称 = ?;", (name,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, name, value):
+        self.cursor.execute("INSERT OR REPLACE INTO alert_state (名称, 值) VALUES (?, ?);", (name, value))
+
+    def active_alerts(self, warehouse_id=None):
+        """未解除的提醒，按时间从新到旧"""
+        query = "SELECT 提醒_id, 产品_id, 仓库_id, 类型, 内容, 创建时间 FROM alerts WHERE 解除时间 IS NULL"
+        params = []
+        if warehouse_id is not None:
+            query += " AND 仓库_id = ?"
+            params.append(warehouse_id)
+        self.cursor.execute(query + " ORDER BY 创建时间 DESC, 提醒_id DESC;", params)
+        columns = ['提醒_id', '产品_id', '仓库_id', '类型', '内容', '创建时间']
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
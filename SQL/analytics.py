@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+from quantity import Quantity, UNITS
+
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# pandas / NumPy 在第一次计算时才导入，每次写入后的增量更新不需要它们
+HALF_LIFE_DAYS = 30  # 用量速率的半衰期：越近的使用权重越大
+MIN_SPAN_DAYS = 1.0  # 观察时间不足一天时按一天计算，避免刚录入就算出极大的速率
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_days(moment):
+    """时间（文本或 datetime）换算为天数（浮点数），便于计算时间间隔"""
+    if isinstance(moment, str):
+        moment = datetime.strptime(moment[:19], TIME_FORMAT)
+    return (moment - _EPOCH).total_seconds() / 86400
+
+
+def _series_to_days(timestamps):
+    """时间文本列换算为天数，与 _to_days 一致"""
+    import pandas as pd
+    return (pd.to_datetime(timestamps.str[:19]) - pd.Timestamp(_EPOCH)) / pd.Timedelta(days=1)
+
+
+class ConsumptionAnalytics:
+    """
+    用量统计和用完日期预测。
+    每个产品在 consumption_stats 中保存一行累计值，每次写入后按该产品的最新状态增量更新：
+    用量为相邻两次剩余量的减少量（增加视为更换或更正，不计入），
+    速率为按时间指数衰减的用量 / 时间（半衰期 HALF_LIFE_DAYS），近期的使用权重更大。
+    报表只读取这张统计表，用 NumPy 按列计算，不再遍历 change_logs。
+    """
+
+    def __init__(self, db_manager, half_life_days=HALF_LIFE_DAYS):
+        self.db_manager = db_manager
+        self.conn = db_manager.conn
+        self.cursor = self.conn.cursor()
+        self.half_life_days = half_life_days
+        if self._create_table():
+            self.rebuild()
+        db_manager.add_write_listener(self.update)
+
+    def _create_table(self):
+        """创建统计表，返回是否为新建（需要从历史记录重建）"""
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'consumption_stats';")
+        exists = self.cursor.fetchone() is not None
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS consumption_stats (
+                产品_id INTEGER PRIMARY KEY,
+                cas TEXT,
+                单位 TEXT,
+                最后时间 TEXT,
+                最后量 REAL,
+                累计用量 REAL DEFAULT 0,
+                使用次数 INTEGER DEFAULT 0,
+                衰减用量 REAL DEFAULT 0,
+                衰减天数 REAL DEFAULT 0
+            );
+        """)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_consumption_stats_cas ON consumption_stats (cas);")
+        self.conn.commit()
+        return not exists
+
+    def rebuild(self):
+        """由 records 和 change_logs 的全部历史重新计算统计表（仅在首次创建时需要）"""
+        import numpy as np
+        import pandas as pd
+        records = pd.read_sql_query(
+            "SELECT 产品_id, cas, 单位, 录入时间 AS 时间, 净含量 FROM records "
+            "WHERE typeof(净含量) IN ('real', 'integer');", self.conn)
+        logs = pd.read_sql_query(
+            "SELECT 产品_id, 更新时间 AS 时间, 净含量 FROM change_logs "
+            "WHERE typeof(净含量) IN ('real', 'integer');", self.conn)
+        self.cursor.execute("DELETE FROM consumption_stats;")
+        if records.empty:
+            self.conn.commit()
+            return
+        series = pd.concat([records[['产品_id', '时间', '净含量']], logs], ignore_index=True)
+        series = series[series['产品_id'].isin(records['产品_id'])]
+        series['天'] = _series_to_days(series['时间'])
+        series = series.sort_values(['产品_id', '天'], kind='stable')
+
+        grouped = series.groupby('产品_id')
+        used = (-grouped['净含量'].diff()).clip(lower=0).fillna(0)
+        elapsed = grouped['天'].diff().clip(lower=0).fillna(0)
+        # 衰减累计的闭式解：每一段乘以 0.5 ** (距最后一次的天数 / 半衰期)
+        weight = np.power(0.5, (grouped['天'].transform('max') - series['天']) / self.half_life_days)
+        series = series.assign(用量=used, 次数=(used > 0).astype(int),
+                               衰减用量=used * weight, 衰减天数=elapsed * weight)
+        grouped = series.groupby('产品_id')
+        stats = pd.DataFrame({
+            '最后时间': grouped['时间'].last(),
+            '最后量': grouped['净含量'].last(),
+            '累计用量': grouped['用量'].sum(),
+            '使用次数': grouped['次数'].sum(),
+            '衰减用量': grouped['衰减用量'].sum(),
+            '衰减天数': grouped['衰减天数'].sum(),
+        }).join(records.set_index('产品_id')[['cas', '单位']])
+        self.cursor.executemany(
+            "INSERT INTO consumption_stats (产品_id, cas, 单位, 最后时间, 最后量, 累计用量, 使用次数, 衰减用量, 衰减天数) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);",
+            [(int(pid), row.cas, row.单位, row.最后时间, float(row.最后量), float(row.累计用量),
+              int(row.使用次数), float(row.衰减用量), float(row.衰减天数))
+             for pid, row in stats.iterrows()])
+        self.conn.commit()
+
+    def update(self, product_id):
+        """写入回调：按该产品当前的剩余量和最后使用时间更新统计（主键查询，O(1)）"""
+        self.cursor.execute("SELECT cas, 单位, 剩余量, 最后使用 FROM records WHERE 产品_id = ?;", (product_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return
+        cas, unit, remaining, last_used = row
+        if not isinstance(remaining, (int, float)) or not last_used:
+            return
+        self.cursor.execute("SELECT 最后时间, 最后量, 衰减用量, 衰减天数 FROM consumption_stats WHERE 产品_id = ?;",
+                            (product_id,))
+        stats = self.cursor.fetchone()
+        if stats is None or stats[1] is None:
+            self.cursor.execute("INSERT OR REPLACE INTO consumption_stats (产品_id, cas, 单位, 最后时间, 最后量) "
+                                "VALUES (?, ?, ?, ?, ?);", (product_id, cas, unit, last_used, remaining))
+            self.conn.commit()
+            return
+        previous_time, previous_amount, decayed_used, decayed_days = stats
+        if last_used == previous_time and remaining == previous_amount:
+            return  # 补全字段等写入，没有新的使用
+
+        elapsed = max(0.0, _to_days(last_used) - _to_days(previous_time))
+        used = max(0.0, previous_amount - remaining)
+        decay = 0.5 ** (elapsed / self.half_life_days)
+        self.cursor.execute("""
+            UPDATE consumption_stats SET cas = ?, 单位 = ?, 最后时间 = ?, 最后量 = ?,
+                累计用量 = 累计用量 + ?, 使用次数 = 使用次数 + ?, 衰减用量 = ?, 衰减天数 = ?
+            WHERE 产品_id = ?;
+        """, (cas, unit, last_used, remaining, used, 1 if used > 0 else 0,
+              decayed_used * decay + used, decayed_days * decay + elapsed, product_id))
+        self.conn.commit()
+
+    def _stats_frame(self, where='', params=()):
+        """统计表与 records 中的名称、仓库合并为 DataFrame"""
+        import pandas as pd
+        return pd.read_sql_query(
+            "SELECT s.产品_id, r.仓库_id, r.名称, s.cas, s.单位, r.精度, s.最后时间, s.最后量, "
+            "s.累计用量, s.使用次数, s.衰减用量, s.衰减天数 "
+            f"FROM consumption_stats s JOIN records r ON r.产品_id = s.产品_id {where};", self.conn, params=params)
+
+    def _forecast(self, frame, now):
+        """
+        按列计算日用量和预计用完日期。最后一次使用到现在没有用量的时间也计入，
+        长期不用的瓶子速率随之下降。
+        """
+        import numpy as np
+        now_days = _to_days(now)
+        idle = np.clip(now_days - _series_to_days(frame['最后时间']).to_numpy(dtype=float), 0, None)
+        decay = np.power(0.5, idle / self.half_life_days)
+        used = frame['衰减用量'].to_numpy(dtype=float) * decay
+        days = np.maximum(frame['衰减天数'].to_numpy(dtype=float) * decay + idle, MIN_SPAN_DAYS)
+        rate = used / days
+        remaining = frame['最后量'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_left = np.where(rate > 0, remaining / rate, np.inf)
+        frame = frame.assign(日用量=rate, 剩余天数=days_left)
+        frame['预计用完'] = [(now + timedelta(days=float(d))).strftime('%Y-%m-%d') if np.isfinite(d) else None
+                         for d in days_left]
+        return frame
+
+    def product_forecast(self, product_id, now=None):
+        """
+        某个产品的用量速率和预计用完日期。
+        :return: {'日用量': Quantity, '剩余天数': float 或 None, '预计用完': 'YYYY-MM-DD' 或 None}，没有统计时为 None
+        """
+        import numpy as np
+        import pandas as pd
+        frame = self._stats_frame("WHERE s.产品_id = ?", (product_id,))
+        if frame.empty or not frame.loc[0, '单位']:
+            return None
+        row = self._forecast(frame, now or datetime.now()).iloc[0]
+        unit = row['单位']
+        precision = int(row['精度']) if pd.notna(row['精度']) else 0
+        return {'日用量': Quantity(row['日用量'], unit, precision + 1),
+                '剩余天数': float(row['剩余天数']) if np.isfinite(row['剩余天数']) else None,
+                '预计用完': row['预计用完']}
+
+    def rolling_usage(self, product_id, days=30, now=None):
+        """某个产品最近 days 天的用量（基本单位），按该产品的使用记录计算"""
+        import pandas as pd
+        since = ((now or datetime.now()) - timedelta(days=days)).strftime(TIME_FORMAT)
+        series = pd.read_sql_query(
+            "SELECT 更新时间, 净含量 FROM change_logs WHERE 产品_id = ? AND typeof(净含量) IN ('real', 'integer') "
+            "ORDER BY 更新时间;", self.conn, params=(product_id,))
+        self.cursor.execute("SELECT 录入时间, 净含量 FROM records WHERE 产品_id = ?;", (product_id,))
+        first = self.cursor.fetchone()
+        if first is not None and isinstance(first[1], (int, float)):
+            series = pd.concat([pd.DataFrame([first], columns=['更新时间', '净含量']), series], ignore_index=True)
+        used = (-series['净含量'].diff()).clip(lower=0)
+        return float(used[series['更新时间'] >= since].sum())
+
+    def reorder_report(self, horizon_days=30, by='product', now=None):
+        """
+        补货建议：预计在 horizon_days 天内用完的产品（by='product'），
+        或按 CAS 号汇总同一化学品所有瓶子的剩余量和日用量（by='cas'）。
+        :return: DataFrame，按剩余天数从少到多
+        """
+        import numpy as np
+        now = now or datetime.now()
+        frame = self._forecast(self._stats_frame(), now)
+        if by == 'cas':
+            frame = frame[frame['cas'].notna() & (frame['cas'] != 'null')]
+            frame = frame.assign(量纲=frame['单位'].map(lambda unit: UNITS.get(unit, (None,))[0]))
+            frame = frame.groupby(['cas', '量纲'], as_index=False).agg(
+                名称=('名称', 'first'), 瓶数=('产品_id', 'count'), 最后量=('最后量', 'sum'),
+                日用量=('日用量', 'sum'), 单位=('单位', 'first'))
+            rate = frame['日用量'].to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                frame['剩余天数'] = np.where(rate > 0, frame['最后量'].to_numpy() / rate, np.inf)
+            frame['预计用完'] = [(now + timedelta(days=float(d))).strftime('%Y-%m-%d') if np.isfinite(d) else None
+                             for d in frame['剩余天数']]
+        frame = frame[frame['剩余天数'] <= horizon_days].sort_values('剩余天数').reset_index(drop=True)
+        # 剩余量和日用量按原单位显示，数值列仍为基本单位（g 或 mL）
+        frame['剩余'] = [Quantity(amount, unit, 1).display() for amount, unit in zip(frame['最后量'], frame['单位'])]
+        frame['每日用量'] = [Quantity(rate, unit, 2).display() for rate, unit in zip(frame['日用量'], frame['单位'])]
+        return frame.rename(columns={'最后量': '剩余量'})
@@ -0,0 +1,315 @@
+"""
+化学品参考库的生成和更新：从 CSV / SDF 文件生成只读的 chemicals.db（SQL/chemical.py 查询使用），
+并用增量更新包在设备上升级，不需要重新下载整个参考库。
+
+    python -m SQL.catalog_build build chemicals.csv extra.sdf -o chemicals.db --version 2026.10
+    python -m SQL.catalog_build build old_chemicals.db -o chemicals.db --version 2026.10  # 转换旧版参考库
+    python -m SQL.catalog_build pack old.db new.db -o update-2026.11.db      # 两个版本的差异
+    python -m SQL.catalog_build apply chemicals.db update-2026.11.db         # 在设备上应用更新包
+    python -m SQL.catalog_build info chemicals.db
+
+参考库的 chemicals 表以 cas 为主键（WITHOUT ROWID），整行保存在主键 B 树中，查询只需一次查找；
+生成后 VACUUM 压实。应用更新包时先写入临时文件再整体替换，正在查询的进程不会读到一半的数据。
+"""
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from SQL.chemical import LEGACY_COLUMNS
+
+
+# 参考库 chemicals 表的字段，cas 为主键
+CATALOG_FIELDS = ['cas', '分子量', '分子式', '中文名称', '名称']
+
+# CSV 表头 / SDF 数据项名称 -> 参考库字段
+FIELD_ALIASES = {
+    'cas': ['cas', 'cas号', 'cas_number', 'casno', 'cas_rn', 'cas number'],
+    '分子量': ['分子量', 'mw', 'molecular_weight', 'molecularweight', 'molecular weight', 'pubchem_molecular_weight'],
+    '分子式': ['分子式', 'formula', 'molecular_formula', 'molecularformula', 'molecular formula',
+             'pubchem_molecular_formula'],
+    '中文名称': ['中文名称', '中文名', 'chinese_name', 'name_cn'],
+    '名称': ['名称', '英文名称', 'name', 'english_name', 'iupac_name', 'pubchem_iupac_name'],
+}
+
+SCHEMA_VERSION = 1
+
+_CAS_PATTERN = re.compile(r'^(\d{2,7})-(\d{2})-(\d)$')
+
+
+def normalize_cas(text):
+    """规范化并校验 CAS 号（末位校验码），不合法时返回 None"""
+    text = str(text or '').strip().replace('\u2010', '-').replace('\uff0d', '-')
+    match = _CAS_PATTERN.match(text)
+    if not match:
+        return None
+    digits = match.group(1) + match.group(2)
+    checksum = sum(int(digit) * weight for weight, digit in enumerate(reversed(digits), start=1)) % 10
+    return text if checksum == int(match.group(3)) else None
+
+
+def _field_map(names):
+    """源文件中的列名 -> 参考库字段"""
+    aliases = {alias: field for field, names_ in FIELD_ALIASES.items() for alias in names_}
+    return {name: aliases[name.strip().lower()] for name in names if name and name.strip().lower() in aliases}
+
+
+def read_csv(path):
+    """逐行读取 CSV（UTF-8，可带 BOM），按表头识别字段"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        mapping = _field_map(reader.fieldnames or [])
+        if 'cas' not in mapping.values():
+            raise ValueError(f"{path} 没有 CAS 列")
+        for row in reader:
+            yield {field: (row.get(name) or '').strip() for name, field in mapping.items()}
+
+
+def read_sdf(path):
+    """
+    逐条读取 SDF：数据项 "> <名称>" 下一行起为值；
+    没有名称数据项时使用分子块第一行（分子名）。
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        lines, items, current = [], {}, None
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.startswith('$$$$'):
+                yield _sdf_record(lines, items)
+                lines, items, current = [], {}, None
+            elif line.startswith('>'):
+                match = re.search(r'<([^>]+)>', line)
+                current = match.group(1) if match else None
+                if current:
+                    items[current] = ''
+            elif current is not None:
+                if line.strip():
+                    items[current] = (items[current] + ' ' + line.strip()).strip()
+                else:
+                    current = None
+            else:
+                lines.append(line)
+        if items:
+            yield _sdf_record(lines, items)
+
+
+def _sdf_record(lines, items):
+    record = {field: items[name].strip() for name, field in _field_map(items).items()}
+    if not record.get('名称') and lines and lines[0].strip():
+        record['名称'] = lines[0].strip()
+    return record
+
+
+def read_db(path):
+    """
+    读取已有的参考库：新格式按列名读取，旧版（没有 catalog_meta 表）按 LEGACY_COLUMNS 的位置读取，
+    用于把设备上的旧版 chemicals.db 转换为新格式。
+    """
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        if read_meta(conn):
+            rows = conn.execute(f"SELECT {', '.join(CATALOG_FIELDS)} FROM chemicals;")
+            fields = CATALOG_FIELDS
+        else:
+            rows = conn.execute("SELECT * FROM chemicals;")
+            fields = LEGACY_COLUMNS
+        for row in rows:
+            yield {field: '' if value is None else str(value).strip() for field, value in zip(fields, row)}
+    finally:
+        conn.close()
+
+
+def read_source(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.sdf', '.sd', '.mol'):
+        return read_sdf(path)
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        return read_db(path)
+    if extension in ('.csv', '.txt'):
+        return read_csv(path)
+    raise ValueError(f"不支持的文件类型: {path}")
+
+
+def collect(paths):
+    """
+    读取全部源文件，按 CAS 号合并：后面文件中的非空值补充或覆盖前面的值。
+    :return: ({cas: {字段: 值}}, 跳过的行数)
+    """
+    chemicals, skipped = {}, 0
+    for path in paths:
+        for record in read_source(path):
+            cas = normalize_cas(record.get('cas'))
+            if cas is None:
+                skipped += 1
+                continue
+            merged = chemicals.setdefault(cas, dict.fromkeys(CATALOG_FIELDS[1:], ''))
+            merged.update({field: value for field, value in record.items() if field != 'cas' and value})
+    return chemicals, skipped
+
+
+def create_catalog(path, version, source=''):
+    """新建空的参考库文件（已存在时覆盖），返回连接"""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA page_size = 4096;")
+    conn.execute("PRAGMA journal_mode = OFF;")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+    columns = ', '.join(f"{field} TEXT NOT NULL DEFAULT ''" for field in CATALOG_FIELDS[1:])
+    conn.execute(f"CREATE TABLE chemicals (cas TEXT PRIMARY KEY, {columns}) WITHOUT ROWID;")
+    conn.execute("CREATE TABLE catalog_meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;")
+    set_meta(conn, version=version, source=source)
+    return conn
+
+
+def set_meta(conn, **values):
+    values['built'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany("INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?);",
+                     [(key, str(value)) for key, value in values.items()])
+
+
+def read_meta(conn):
+    try:
+        return dict(conn.execute("SELECT key, value FROM catalog_meta;").fetchall())
+    except sqlite3.OperationalError:
+        return {}
+
+
+def _write_rows(conn, chemicals):
+    placeholders = ', '.join('?' * len(CATALOG_FIELDS))
+    # 按主键顺序插入，B 树页面顺序填满
+    conn.executemany(f"INSERT OR REPLACE INTO chemicals ({', '.join(CATALOG_FIELDS)}) VALUES ({placeholders});",
+                     ([cas] + [chemicals[cas][field] for field in CATALOG_FIELDS[1:]] for cas in sorted(chemicals)))
+
+
+def _finish(conn):
+    conn.execute("INSERT OR REPLACE INTO catalog_meta (key, value) SELECT 'count', COUNT(*) FROM chemicals;")
+    conn.commit()
+    conn.execute("VACUUM;")
+    conn.close()
+
+
+def build(paths, output, version):
+    chemicals, skipped = collect(paths)
+    conn = create_catalog(output, version, source=', '.join(os.path.basename(path) for path in paths))
+    _write_rows(conn, chemicals)
+    _finish(conn)
+    return len(chemicals), skipped
+
+
+def _rows(path):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        meta = read_meta(conn)
+        rows = {row[0]: row for row in conn.execute(f"SELECT {', '.join(CATALOG_FIELDS)} FROM chemicals;")}
+    finally:
+        conn.close()
+    return meta, rows
+
+
+def make_pack(old_path, new_path, output):
+    """
+    生成从 old 版本升级到 new 版本的更新包：新增或修改的行，以及删除的 CAS 号。
+    更新包也是参考库格式的 SQLite 文件，另有 deleted 表，meta 中记录 base_version。
+    """
+    old_meta, old_rows = _rows(old_path)
+    new_meta, new_rows = _rows(new_path)
+    changed = {cas: dict(zip(CATALOG_FIELDS[1:], row[1:])) for cas, row in new_rows.items() if old_rows.get(cas) != row}
+    deleted = sorted(set(old_rows) - set(new_rows))
+    conn = create_catalog(output, new_meta.get('version', ''), source=new_meta.get('source', ''))
+    set_meta(conn, base_version=old_meta.get('version', ''), count=len(new_rows))
+    conn.execute("CREATE TABLE deleted (cas TEXT PRIMARY KEY) WITHOUT ROWID;")
+    conn.executemany("INSERT INTO deleted (cas) VALUES (?);", [(cas,) for cas in deleted])
+    _write_rows(conn, changed)
+    conn.commit()
+    conn.execute("VACUUM;")
+    conn.close()
+    return len(changed), len(deleted)
+
+
+def apply_pack(catalog_path, pack_path):
+    """
+    把更新包应用到参考库：版本必须与更新包的 base_version 一致。
+    在临时文件中完成修改和压实后用 os.replace 原子替换。
+    """
+    pack = sqlite3.connect(f'file:{pack_path}?mode=ro', uri=True)
+    try:
+        pack_meta = read_meta(pack)
+        if 'base_version' not in pack_meta:
+            raise ValueError(f"{pack_path} 不是更新包")
+        changes = pack.execute(f"SELECT {', '.join(CATALOG_FIELDS)} FROM chemicals;").fetchall()
+        deleted = [row[0] for row in pack.execute("SELECT cas FROM deleted;")]
+    finally:
+        pack.close()
+
+    conn = sqlite3.connect(catalog_path)
+    try:
+        current = read_meta(conn).get('version', '')
+        if current != pack_meta['base_version']:
+            raise ValueError(f"参考库版本为 {current or '未知'}，更新包需要 {pack_meta['base_version']}")
+        temporary = catalog_path + '.tmp'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        conn.execute("VACUUM INTO ?;", (temporary,))
+    finally:
+        conn.close()
+
+    conn = sqlite3.connect(temporary)
+    try:
+        conn.executemany("DELETE FROM chemicals WHERE cas = ?;", [(cas,) for cas in deleted])
+        placeholders = ', '.join('?' * len(CATALOG_FIELDS))
+        conn.executemany(f"INSERT OR REPLACE INTO chemicals ({', '.join(CATALOG_FIELDS)}) "
+                         f"VALUES ({placeholders});", changes)
+        set_meta(conn, version=pack_meta.get('version', ''), source=pack_meta.get('source', ''))
+        _finish(conn)
+    except Exception:
+        conn.close()
+        os.remove(temporary)
+        raise
+    os.replace(temporary, catalog_path)
+    return len(changes), len(deleted)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成和更新化学品参考库")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="从 CSV/SDF 生成参考库")
+    build_parser.add_argument('sources', nargs='+')
+    build_parser.add_argument('-o', '--output', default='chemicals.db')
+    build_parser.add_argument('--version', default=datetime.now().strftime('%Y.%m.%d'))
+    pack_parser = commands.add_parser('pack', help="生成两个版本之间的更新包")
+    pack_parser.add_argument('old')
+    pack_parser.add_argument('new')
+    pack_parser.add_argument('-o', '--output', required=True)
+    apply_parser = commands.add_parser('apply', help="应用更新包")
+    apply_parser.add_argument('catalog')
+    apply_parser.add_argument('pack')
+    info_parser = commands.add_parser('info', help="显示参考库版本")
+    info_parser.add_argument('catalog')
+    options = parser.parse_args(argv)
+
+    try:
+        if options.command == 'build':
+            count, skipped = build(options.sources, options.output, options.version)
+            print(f"已生成 {options.output}：{count} 种化学品，跳过 {skipped} 行（CAS 号缺失或校验错误）")
+        elif options.command == 'pack':
+            changed, deleted = make_pack(options.old, options.new, options.output)
+            print(f"已生成更新包 {options.output}：新增或修改 {changed}，删除 {deleted}")
+        elif options.command == 'apply':
+            changed, deleted = apply_pack(options.catalog, options.pack)
+            print(f"已更新 {options.catalog}：新增或修改 {changed}，删除 {deleted}")
+        else:
+            conn = sqlite3.connect(f'file:{options.catalog}?mode=ro', uri=True)
+            for key, value in sorted(read_meta(conn).items()):
+                print(f"{key}: {value}")
+            conn.close()
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,84 @@
+import os
 import sqlite3
+import threading
+from metrics import histogram
+
+
+# 化学品参考库（由 SQL/catalog_build.py 生成），可用环境变量 CHEMICAL_CATALOG 或配置文件 chemical_catalog 指定
+CATALOG_PATH = os.environ.get('CHEMICAL_CATALOG', '/home/qhyoo/pycode/qt_code/chemicals.db')
+
+# 参考库只读：页面通过 mmap 直接映射文件，由系统页缓存按需读入，进程自己的缓存保持很小
+CATALOG_MMAP_SIZE = 64 * 1024 * 1024
+CATALOG_CACHE_KIB = 256
+
+# 查询参考库时读取的字段（按名称读取，与 chemicals 表中列的顺序无关）
+CHEMICAL_FIELDS = ('分子量', '分子式', '中文名称', '名称')
+
+# 旧版参考库（没有 catalog_meta 表）的列名不同，只能按位置读取：各列依次为
+LEGACY_COLUMNS = ('cas',) + CHEMICAL_FIELDS
+
+CHEMICAL_LOOKUP_SECONDS = histogram('chemical_lookup_seconds', '按 CAS 号查询化学品参考库的耗时')
+
+_local = threading.local()  # 每个线程一个只读连接
+
+
+def set_catalog_path(path):
+    """更换参考库文件，各线程下次查询时重新打开"""
+    global CATALOG_PATH
+    CATALOG_PATH = path
+
+
+def _connection():
+    """
+    当前线程的只读连接和参考库是否为旧版格式。参考库文件被替换（应用更新包后）或路径改变时重新打开，
+    检查只需要一次 stat，不重新读取数据。
+    """
+    stat = os.stat(CATALOG_PATH)
+    key = (CATALOG_PATH, stat.st_ino, stat.st_mtime_ns)
+    cached = getattr(_local, 'catalog', None)
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+    if cached is not None:
+        cached[1].close()
+    conn = sqlite3.connect(f'file:{CATALOG_PATH}?mode=ro', uri=True)
+    conn.execute(f"PRAGMA mmap_size = {CATALOG_MMAP_SIZE};")
+    conn.execute(f"PRAGMA cache_size = -{CATALOG_CACHE_KIB};")
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'catalog_meta';").fetchone() is None
+    _local.catalog = (key, conn, legacy)
+    return conn, legacy
+
+
 def query_by_cas_number(cas_number):
-    conn = sqlite3.connect('/home/qhyoo/pycode/qt_code/chemicals.db')
-    cursor = conn.cursor()
-    query = f"SELECT * FROM chemicals WHERE cas = ?"
-    cursor.execute(query, (cas_number,))
-    result = cursor.fetchone()
-    conn.close()
-    return result
+    """
+    按 CAS 号查询一行，返回 {字段: 值}（字段见 CHEMICAL_FIELDS），查不到时返回 None。
+    新格式的参考库以 cas 为主键（WITHOUT ROWID），一次主键查找即可取到整行；
+    旧版参考库按 LEGACY_COLUMNS 的位置读取。
+    """
+    cas = str(cas_number).strip()
+    with CHEMICAL_LOOKUP_SECONDS.time():
+        conn, legacy = _connection()
+        if legacy:
+            row = conn.execute("SELECT * FROM chemicals WHERE cas = ?", (cas,)).fetchone()
+            row = row[1:len(LEGACY_COLUMNS)] if row is not None else None
+        else:
+            columns = ', '.join(CHEMICAL_FIELDS)
+            row = conn.execute(f"SELECT {columns} FROM chemicals WHERE cas = ?", (cas,)).fetchone()
+    return dict(zip(CHEMICAL_FIELDS, row)) if row is not None else None
 
-# # 测试查询函数
-# test_cas_number = '56-87-1'
-# result = query_by_cas_number(test_cas_number)
-# if result:
-#     print(f"\nQuery result for CAS number {test_cas_number}:")
-#     print(result)
-# else:
-#     print(f"\nNo entry found for CAS number {test_cas_number}")
 
+def query_chemical_fields(cas_number):
+    """查询化学品信息，返回录入表格参数名到值的字典，查不到时返回空字典"""
+    chemical_info = query_by_cas_number(cas_number)
+    if not chemical_info:
+        return {}
+    return {field: str(value) for field, value in chemical_info.items()}
 
 
+def catalog_info():
+    """参考库的版本信息（catalog_meta 表），旧版本没有该表或文件不存在时返回空字典"""
+    try:
+        conn, legacy = _connection()
+        return {} if legacy else dict(conn.execute("SELECT key, value FROM catalog_meta;").fetchall())
+    except (OSError, sqlite3.Error):
+        return {}
@@ -1,11 +1,16 @@
 from PyQt5.QtWidgets import QDialog, QPushButton, QVBoxLayout, QApplication
 import sqlite3
-import pandas as pd
+from applog import get_logger
+
+
+log = get_logger('ui')
 
 
 class ExportDialog(QDialog):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, db_path='/home/qhyoo/pyproject/code/test_data.db', parent=None, analytics=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.analytics = analytics  # ConsumptionAnalytics，提供时可导出补货建议
         
         self.initUI()
     
@@ -17,26 +22,34 @@ class ExportDialog(QDialog):
         btn_first_entry = QPushButton('导出首次录入数据', self)
         btn_usage_history = QPushButton('导出使用历史', self)
         btn_latest_data = QPushButton('导出各产品最新数据', self)
+        btn_alerts = QPushButton('导出库存提醒', self)
+        btn_reorder = QPushButton('导出补货建议', self)
+        btn_reorder.setEnabled(self.analytics is not None)
         
         # 当按钮被点击时关闭对话框，你可以在这里添加处理函数
         btn_first_entry.clicked.connect(lambda: self.onClicked('首次录入数据'))
         btn_usage_history.clicked.connect(lambda: self.onClicked('使用历史'))
         btn_latest_data.clicked.connect(lambda: self.onClicked('最新数据'))
+        btn_alerts.clicked.connect(lambda: self.onClicked('库存提醒'))
+        btn_reorder.clicked.connect(lambda: self.onClicked('补货建议'))
         
         # 创建布局并添加部件
         layout = QVBoxLayout()
         layout.addWidget(btn_first_entry)
         layout.addWidget(btn_usage_history)
         layout.addWidget(btn_latest_data)
+        layout.addWidget(btn_alerts)
+        layout.addWidget(btn_reorder)
         
         # 设置对话框的布局
         self.setLayout(layout)
     
 
     def onClicked(self, text):
-        print(f'{text} 被点击了')
+        log.info("导出数据", type=text)
+        import pandas as pd  # 延迟导入，点击导出时才加载 pandas 和 openpyxl
         # 连接到 SQLite 数据库
-        conn = sqlite3.connect('/home/qhyoo/pyproject/code/test_data.db')
+        conn = sqlite3.connect(self.db_path)
         
         if text == '首次录入数据':
             # 使用 pandas 读取 SQL 查询结果
@@ -77,6 +90,16 @@ class ExportDialog(QDialog):
 
             # 导出为 Excel 文件
             df_latest.to_excel('/home/qhyoo/Desktop/latest_data.xlsx', index=False)
+        elif text == '库存提醒':
+            # 未解除的提醒在前，各自按时间从新到旧
+            df_alerts = pd.read_sql_query(
+                "SELECT * FROM alerts ORDER BY 解除时间 IS NOT NULL, 创建时间 DESC;", conn)
+            df_alerts.to_excel('/home/qhyoo/Desktop/alerts.xlsx', index=False)
+        elif text == '补货建议':
+            # 按 CAS 汇总同一化学品的所有瓶子，预计 30 天内用完的排在前面
+            df_reorder = self.analytics.reorder_report(horizon_days=30, by='cas')
+            df_reorder.to_excel('/home/qhyoo/Desktop/reorder.xlsx', index=False)
+        conn.close()
         self.accept()
 
 # # 修改你的 get_data_of_sql 方法来显示这个对话框
@@ -0,0 +1,103 @@
+import sqlite3
+from quantity import Quantity
+from SQL.sql import SEARCH_FIELDS
+
+
+# 库存浏览显示的列
+BROWSE_COLUMNS = ['仓库_id', '产品_id', '中文名称', '名称', 'cas', 'lot', '位置', '剩余量', '有效期']
+
+# 可以筛选的字段；名称按前缀匹配，其余按等值匹配，都使用 records 上的索引
+FILTER_FIELDS = ('仓库_id', 'cas', '名称', 'lot', '位置')
+
+
+# trigram 索引只能匹配至少 3 个字符的内容，更短的词用 LIKE
+FTS_MIN_LENGTH = 3
+
+
+def search_terms(text):
+    """搜索框内容按空格分成多个词，多个词同时满足"""
+    return str(text or '').split()
+
+
+def fts_query(term):
+    """
+    一个词转为 FTS5 查询：trigram 索引按子串匹配，
+    例如 '丙醇' 可以搜到 异丙醇，'propanol' 可以搜到 2-Propanol。
+    """
+    return '"' + term.replace('"', '""') + '"'
+
+
+class InventorySearch:
+    """
+    库存浏览的分页查询，使用单独的只读连接。
+    按产品ID从新到旧分页，每页从上一页最后一个产品ID往后取（不使用 OFFSET），翻到多深都一样快。
+    """
+
+    def __init__(self, db_path, timeout=2.0):
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=timeout)
+        self.conn.row_factory = sqlite3.Row
+        self.has_fts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records_fts';").fetchone() is not None
+
+    def close(self):
+        self.conn.close()
+
+    def _where(self, filters, text):
+        conditions, params = [], []
+        for field in FILTER_FIELDS:
+            value = filters.get(field)
+            if value in (None, ''):
+                continue
+            if field == '名称':
+                # 前缀范围查询可以使用 名称 索引（LIKE 默认不区分大小写，用不上索引）
+                conditions.append("名称 >= ? AND 名称 < ?")
+                params.extend([value, value + '\uffff'])
+            else:
+                conditions.append(f"{field} = ?")
+                params.append(value)
+        like = ' OR '.join(f"{field} LIKE ?" for field in SEARCH_FIELDS)
+        for term in search_terms(text):
+            if self.has_fts and len(term) >= FTS_MIN_LENGTH:
+                conditions.append("产品_id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)")
+                params.append(fts_query(term))
+            else:
+                conditions.append(f"({like})")
+                params.extend([f'%{term}%'] * len(SEARCH_FIELDS))
+        return conditions, params
+
+    def page(self, filters=None, text='', after=None, limit=100):
+        """
+        一页搜索结果，按产品ID从大到小。
+        :param filters: {字段: 值}，字段见 FILTER_FIELDS
+        :param text: 全文检索内容（名称、中文名称、cas、lot、位置）
+        :param after: 上一页最后一行的产品ID，取第一页时为 None
+        :return: [字典, ...]，剩余量已换算为带单位的文字
+        """
+        conditions, params = self._where(filters or {}, text)
+        if after is not None:
+            conditions.append("产品_id < ?")
+            params.append(after)
+        query = "SELECT * FROM records"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        params.append(int(limit))
+        rows = self.conn.execute(query + " ORDER BY 产品_id DESC LIMIT ?;", params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def count(self, filters=None, text=''):
+        """符合条件的记录数"""
+        conditions, params = self._where(filters or {}, text)
+        query = "SELECT COUNT(*) FROM records"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.conn.execute(query + ";", params).fetchone()[0]
+
+    @staticmethod
+    def _record(row):
+        record = {}
+        for column in BROWSE_COLUMNS:
+            value = row[column] if column in row.keys() else None
+            record[column] = '' if value in (None, 'null') else value
+        if isinstance(record['剩余量'], (int, float)) and row['单位']:
+            record['剩余量'] = Quantity(record['剩余量'], row['单位'], row['精度'] or 0).display()
+        return record
@@ -1,17 +1,81 @@
 import sqlite3
+from collections import OrderedDict
+from calendar import monthrange
 from datetime import datetime
 import os
+import re
+import time
+from metrics import counter, histogram
+from applog import get_logger
+from quantity import Quantity, parse_quantity
+
+# 每个站点分到一段产品ID：产品_id = 站点编号 * STATION_ID_BLOCK + 站内序号。
+# 各站的ID互不重叠，二维码仍是 "仓库:产品" 的十进制数字；
+# 未设置站点编号时（以及升级前已打印的标签）ID 落在 0 号段，照常可读。
+STATION_ID_BLOCK = 10 ** 6
+
+# 库存浏览全文检索的字段
+SEARCH_FIELDS = ('名称', '中文名称', 'cas', 'lot', '位置')
+
+log = get_logger('db')
+
+DB_INSERT_SECONDS = histogram('db_insert_record_seconds', '录入记录（单条或一批）写入并提交的耗时')
+DB_CHANGE_LOG_SECONDS = histogram('db_change_log_seconds', '保存一条使用记录并提交的耗时')
+DB_LOOKUP_SECONDS = histogram('db_lookup_seconds', '缓存未命中时查询产品最新记录的耗时')
+DB_LISTENER_SECONDS = histogram('db_write_listener_seconds', '写入后回调（提醒、用量统计）的耗时')
+DB_CACHE_HITS = counter('db_cache_hits_total', '最新记录缓存命中次数')
+DB_CACHE_MISSES = counter('db_cache_misses_total', '最新记录缓存未命中次数')
+
+
+def split_product_id(product_id):
+    """把产品ID拆成 (站点编号, 站内序号)"""
+    return divmod(int(product_id), STATION_ID_BLOCK)
+
+
+_EXPIRY_PATTERN = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})(?:\s*[-/.月]\s*(\d{1,2}))?')
+
+
+def normalize_expiry(text):
+    """
+    把有效期（'2026/5/31'、'2026.05'、'2026年5月' 等）统一为 'YYYY-MM-DD'，便于按日期范围查询。
+    只有年月时取当月最后一天；无法解析时返回 None。
+    """
+    match = _EXPIRY_PATTERN.search(str(text or ''))
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        return None
+    day = int(match.group(3)) if match.group(3) else monthrange(year, month)[1]
+    try:
+        return datetime(year, month, day).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
 
 class DynamicDatabase:
-    def __init__(self, db_path='/home/qhyoo/pycode/qt_code/data/test_data.db'):
+    def __init__(self, db_path='/home/qhyoo/pycode/qt_code/data/test_data.db', cache_size=64, station_id=None):
         # 确保数据库目录存在
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
         self.conn = sqlite3.connect(db_path)
         self.cursor = self.conn.cursor()
 
+        # 仓库_id:产品_id -> 最新记录 的 LRU 缓存，重复扫码时不再查询数据库
+        self.record_cache = OrderedDict()
+        self.cache_size = cache_size
+
+        # 写入产品数据后调用的回调（参数为产品ID），例如提醒规则的增量检查
+        self.write_listeners = []
+
         # Create initial tables if they don't exist
         self._create_main_table()
         self._create_change_log_table()
+        self._create_quantity_columns()
+        self._migrate_quantities()
+        self._create_state_columns()
+        self._create_search_index()
+        self.station_id = int(station_id) if station_id else None
 
     def _create_main_table(self):
         query = """
@@ -27,6 +91,8 @@ class DynamicDatabase:
                 );
                 """
         self.cursor.execute(query)
+        # 按 CAS 号查询库存（站点接口、补货统计）
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_cas ON records (cas);")
         self.conn.commit()
 
     def _create_change_log_table(self):
@@ -42,6 +108,172 @@ class DynamicDatabase:
         self.cursor.execute(query)
         self.conn.commit()
 
+    def _create_quantity_columns(self):
+        """
+        净含量以基本单位（g 或 mL）的 REAL 保存，单位和小数位数另存一列；
+        records.剩余量 保存最近一次使用后的剩余量，用于按数量建索引查询。
+        """
+        for table in ('records', 'change_logs'):
+            columns = self._get_column_names(table)
+            if '单位' not in columns:
+                self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN 单位 TEXT;")
+            if '精度' not in columns:
+                self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN 精度 INTEGER;")
+        if '剩余量' not in self._get_column_names('records'):
+            self.cursor.execute("ALTER TABLE records ADD COLUMN 剩余量 REAL;")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_剩余量 ON records (单位, 剩余量);")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_logs_产品_id ON change_logs (产品_id, 更新时间);")
+        self.conn.commit()
+
+    def _migrate_quantities(self):
+        """把旧版本以文本保存的净含量（如 '500.0g'）转换为数值，并补齐剩余量"""
+        for table, key in (('records', '产品_id'), ('change_logs', '记录_id')):
+            self.cursor.execute(f"SELECT {key}, 净含量 FROM {table} WHERE typeof(净含量) = 'text' AND 净含量 != 'null';")
+            for row_id, text in self.cursor.fetchall():
+                quantity = parse_quantity(text)
+                if quantity is not None:
+                    self.cursor.execute(f"UPDATE {table} SET 净含量 = ?, 单位 = ?, 精度 = ? WHERE {key} = ?;",
+                                        (quantity.base, quantity.unit, quantity.precision, row_id))
+            # 以前只录入数字的记录按克处理
+            self.cursor.execute(f"SELECT {key}, 净含量 FROM {table} "
+                                f"WHERE typeof(净含量) IN ('real', 'integer') AND 单位 IS NULL;")
+            for row_id, value in self.cursor.fetchall():
+                quantity = parse_quantity(value)
+                self.cursor.execute(f"UPDATE {table} SET 单位 = ?, 精度 = ? WHERE {key} = ?;",
+                                    (quantity.unit, quantity.precision, row_id))
+        # 剩余量：有使用记录的取最近一次的净含量，否则取录入时的净含量
+        self.cursor.execute("""
+            UPDATE records SET 剩余量 = COALESCE(
+                (SELECT cl.净含量 FROM change_logs cl WHERE cl.产品_id = records.产品_id
+                 AND typeof(cl.净含量) IN ('real', 'integer') ORDER BY cl.更新时间 DESC, cl.记录_id DESC LIMIT 1),
+                CASE WHEN typeof(净含量) IN ('real', 'integer') THEN 净含量 END)
+            WHERE 剩余量 IS NULL;
+        """)
+        self.conn.commit()
+
+    def _create_state_columns(self):
+        """
+        records.最后使用 保存最近一次使用（没有使用记录时为录入时间），records.有效期 为 'YYYY-MM-DD'，
+        两列都建索引，按时间范围查询久未使用和将要过期的产品时不扫描全表。
+        """
+        columns = self._get_column_names('records')
+        for column in ('最后使用', '有效期'):
+            if column not in columns:
+                self.cursor.execute(f"ALTER TABLE records ADD COLUMN {column} TEXT;")
+        self.cursor.execute("""
+            UPDATE records SET 最后使用 = COALESCE(
+                (SELECT MAX(cl.更新时间) FROM change_logs cl WHERE cl.产品_id = records.产品_id), 录入时间)
+            WHERE 最后使用 IS NULL;
+        """)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_最后使用 ON records (最后使用);")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_有效期 ON records (有效期);")
+        self.conn.commit()
+
+    def _create_search_index(self):
+        """
+        库存浏览的筛选索引和全文检索。
+        单列索引末尾隐含产品_id，按 仓库/名称/lot/位置 等值筛选后按产品ID分页时不需要排序；
+        records_fts 是以 records 为外部内容的 FTS5 索引，由触发器在录入、修改和删除时维护，
+        只在搜索字段变化时更新（使用记录只改剩余量，不触发）。
+        使用 trigram 分词（SQLite 3.34 以上），中文名称中间的部分（如 异丙醇 中的 丙醇）也能搜到。
+        """
+        self._add_new_columns('records', dict.fromkeys(SEARCH_FIELDS))
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_仓库_id ON records (仓库_id);")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_名称 ON records (名称);")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_lot ON records (lot);")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_位置 ON records (仓库_id, 位置);")
+        existing = self.cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'records_fts';").fetchone()
+        if existing and 'trigram' not in existing[0]:
+            # 旧版本按词分词的索引搜不到中文名称中间的部分，重新建立
+            self.cursor.executescript("""
+                DROP TRIGGER IF EXISTS records_fts_insert;
+                DROP TRIGGER IF EXISTS records_fts_delete;
+                DROP TRIGGER IF EXISTS records_fts_update;
+                DROP TABLE records_fts;
+            """)
+            existing = None
+        if not existing:
+            columns = ', '.join(SEARCH_FIELDS)
+            # 'null' 表示空值，不写入全文索引；删除时要给出与写入时相同的值，所以各处用同一个表达式
+            new_values = ', '.join(f"NULLIF(new.{field}, 'null')" for field in SEARCH_FIELDS)
+            old_values = ', '.join(f"NULLIF(old.{field}, 'null')" for field in SEARCH_FIELDS)
+            try:
+                self.cursor.execute(f"CREATE VIRTUAL TABLE records_fts USING fts5({columns}, "
+                                    f"content='records', content_rowid='产品_id', tokenize='trigram');")
+            except sqlite3.OperationalError as e:
+                # 系统的 SQLite 没有编译 FTS5 或版本低于 3.34 时，浏览器用 LIKE 搜索
+                log.warning("不支持全文检索: %s", e)
+                return
+            self.cursor.executescript(f"""
+                CREATE TRIGGER records_fts_insert AFTER INSERT ON records BEGIN
+                    INSERT INTO records_fts (rowid, {columns}) VALUES (new.产品_id, {new_values});
+                END;
+                CREATE TRIGGER records_fts_delete AFTER DELETE ON records BEGIN
+                    INSERT INTO records_fts (records_fts, rowid, {columns})
+                    VALUES ('delete', old.产品_id, {old_values});
+                END;
+                CREATE TRIGGER records_fts_update AFTER UPDATE OF {columns} ON records BEGIN
+                    INSERT INTO records_fts (records_fts, rowid, {columns})
+                    VALUES ('delete', old.产品_id, {old_values});
+                    INSERT INTO records_fts (rowid, {columns}) VALUES (new.产品_id, {new_values});
+                END;
+            """)
+            # 已有的记录一次写入索引
+            self.cursor.execute(f"INSERT INTO records_fts (rowid, {columns}) SELECT 产品_id, "
+                                + ', '.join(f"NULLIF({field}, 'null')" for field in SEARCH_FIELDS)
+                                + " FROM records;")
+        self.conn.commit()
+
+    def add_write_listener(self, callback):
+        """注册写入回调：录入、补全或使用某个产品并提交后，以产品ID调用 callback"""
+        self.write_listeners.append(callback)
+
+    def _notify_write(self, product_ids):
+        with DB_LISTENER_SECONDS.time():
+            for product_id in product_ids:
+                for callback in self.write_listeners:
+                    try:
+                        callback(product_id)
+                    except Exception as e:
+                        log.exception("写入回调出错: %s", e, product_id=product_id)
+
+    @staticmethod
+    def _normalize_expiry(data_dict):
+        """有效期统一为 'YYYY-MM-DD'，无法解析的值原样保留"""
+        if data_dict.get('有效期') not in (None, 'null', ''):
+            data_dict['有效期'] = normalize_expiry(data_dict['有效期']) or data_dict['有效期']
+
+    @staticmethod
+    def _normalize_quantity(data_dict):
+        """把字典中的净含量（'500.0g'、Quantity 或数字）换成基本单位的数值，并填入单位和精度"""
+        if '净含量' not in data_dict:
+            return None
+        quantity = parse_quantity(data_dict['净含量'])
+        if quantity is None:
+            return None
+        data_dict['净含量'] = round(quantity.base, 9)  # 去掉减法产生的浮点误差位
+        data_dict['单位'] = quantity.unit
+        data_dict['精度'] = quantity.precision
+        return quantity
+
+    def get_products_below(self, amount, warehouse_id=None):
+        """
+        剩余量低于指定数量的产品（例如 parse_quantity('10g')），使用 (单位, 剩余量) 索引。
+        :return: [(仓库_id, 产品_id, Quantity), ...]，按剩余量从少到多
+        """
+        amount = parse_quantity(amount)
+        units = [unit for unit, (dimension, _) in Quantity.UNITS.items() if dimension == amount.dimension]
+        placeholders = ', '.join('?' * len(units))
+        query = f"SELECT 仓库_id, 产品_id, 剩余量, 单位, 精度 FROM records WHERE 单位 IN ({placeholders}) AND 剩余量 < ?"
+        params = units + [amount.base]
+        if warehouse_id is not None:
+            query += " AND 仓库_id = ?"
+            params.append(warehouse_id)
+        self.cursor.execute(query + " ORDER BY 剩余量;", params)
+        return [(wh, pid, Quantity(remaining, unit, precision or 0))
+                for wh, pid, remaining, unit, precision in self.cursor.fetchall()]
+
     def insert_initial_data(self, data_dict, warehouse_id=None):
         # 检查必填字段
         required_fields = set()  # 移除所有必填字段
@@ -49,27 +281,123 @@ class DynamicDatabase:
         if missing_fields:
             raise ValueError(f"Missing required fields: {missing_fields}")
 
+        started = time.perf_counter()
+        self._normalize_quantity(data_dict)
+        self._normalize_expiry(data_dict)
+
         # Check and add new columns if necessary
         self._add_new_columns('records', data_dict)
 
+        try:
+            product_id = self._insert_record(data_dict, warehouse_id)
+        except OverflowError:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+        DB_INSERT_SECONDS.observe(time.perf_counter() - started)
+        self._notify_write([product_id])
+        return product_id
+
+    def insert_records_batch(self, data_dicts, warehouse_id=None):
+        """
+        批量录入：所有记录在同一个事务中插入，任何一条失败则全部回滚。
+        :return: 与 data_dicts 顺序一致的产品ID列表
+        """
+        if not data_dicts:
+            return []
+        started = time.perf_counter()
+        # 先一次性补齐所有记录用到的新列（ALTER TABLE 会提交事务，不能放在插入过程中）
+        all_fields = {}
+        for data_dict in data_dicts:
+            self._normalize_quantity(data_dict)
+            self._normalize_expiry(data_dict)
+            all_fields.update(dict.fromkeys(data_dict))
+        self._add_new_columns('records', all_fields)
+
+        try:
+            product_ids = [self._insert_record(data_dict, warehouse_id) for data_dict in data_dicts]
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+        DB_INSERT_SECONDS.observe(time.perf_counter() - started)
+        self._notify_write(product_ids)
+        return product_ids
+
+    def _insert_record(self, data_dict, warehouse_id=None):
+        """插入一条记录并返回产品ID，不提交事务"""
         # Prepare column names and values for insertion
         columns = list(data_dict.keys())
         placeholders = ', '.join([f":{col}" for col in columns])  # 确保占位符格式正确
 
+        # 新录入的瓶子剩余量即净含量
+        if isinstance(data_dict.get('净含量'), float):
+            data_dict['剩余量'] = data_dict['净含量']
+            if '剩余量' not in columns:
+                columns.append('剩余量')
+                placeholders += ', :剩余量'
+
         # Update the input time to current timestamp with second precision
         data_dict['录入时间'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        data_dict['最后使用'] = data_dict['录入时间']
+        if '最后使用' not in columns:
+            columns.append('最后使用')
+            placeholders += ', :最后使用'
 
         # Automatically assign warehouse_id if provided
         if warehouse_id is not None:
             data_dict['仓库_id'] = warehouse_id
 
         # Insert data into the table
-        query = f"INSERT INTO records ({', '.join(columns)}) VALUES ({placeholders});"
+        if self.station_id:
+            # 在同一条语句里取本站ID段内的下一个ID（主键范围查询），插入与分配是原子的
+            base = self.station_id * STATION_ID_BLOCK
+            data_dict['_段起点'] = base
+            data_dict['_段终点'] = base + STATION_ID_BLOCK - 1
+            query = (f"INSERT INTO records (产品_id, {', '.join(columns)}) VALUES ("
+                     f"(SELECT COALESCE(MAX(产品_id), :_段起点) + 1 FROM records "
+                     f"WHERE 产品_id BETWEEN :_段起点 AND :_段终点), {placeholders});")
+        else:
+            query = f"INSERT INTO records ({', '.join(columns)}) VALUES ({placeholders});"
         self.cursor.execute(query, data_dict)  # 使用字典绑定参数
-        self.conn.commit()
-        product_id = self.get_latest_product_id()
+        data_dict.pop('_段起点', None)
+        data_dict.pop('_段终点', None)
+        # 直接取本次插入的ID，不再另外查询 MAX(产品_id)
+        product_id = self.cursor.lastrowid
+        if self.station_id and split_product_id(product_id)[0] != self.station_id:
+            raise OverflowError(f"站点 {self.station_id} 的产品ID已用完")
         return product_id
 
+    def fill_missing_fields(self, product_id, fields):
+        """
+        补全 records 中某个产品为空（NULL/'null'/''）的字段，已有的值不覆盖。
+        用于离线录入的产品在网络恢复、补识别之后写回识别结果。
+        :return: 实际写入的字段名列表
+        """
+        if not fields:
+            return []
+        self._normalize_quantity(fields)
+        self._normalize_expiry(fields)
+        self._add_new_columns('records', fields)
+        self.cursor.execute("SELECT * FROM records WHERE 产品_id = ?;", (product_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return []
+        current = dict(zip(self._get_column_names('records'), row))
+        updates = {key: value for key, value in fields.items()
+                   if current.get(key) in (None, 'null', '')}
+        if updates:
+            assignments = ', '.join(f"{key} = :{key}" for key in updates)
+            self.cursor.execute(f"UPDATE records SET {assignments} WHERE 产品_id = :产品_id;",
+                                dict(updates, 产品_id=product_id))
+            if '净含量' in updates:
+                self.cursor.execute("UPDATE records SET 剩余量 = 净含量 WHERE 产品_id = ? AND 剩余量 IS NULL "
+                                    "AND typeof(净含量) = 'real';", (product_id,))
+            self.conn.commit()
+            self.invalidate_record_cache(product_id)
+            self._notify_write([product_id])
+        return list(updates)
+
     def _add_new_columns(self, table_name, data_dict):
         existing_columns = set(self._get_column_names(table_name))
         new_columns = set(data_dict.keys()) - existing_columns
@@ -128,6 +456,14 @@ class DynamicDatabase:
         result = self.cursor.fetchone()
         return result[0] if result else None
 
+    def get_product_ids_by_position(self, position, warehouse_id):
+        """获取某个仓库中指定位置（货架）上所有产品的ID"""
+        if '位置' not in self._get_column_names('records'):
+            return []
+        query = "SELECT 产品_id FROM records WHERE 位置 = ? AND 仓库_id = ? ORDER BY 产品_id;"
+        self.cursor.execute(query, (position, warehouse_id))
+        return [row[0] for row in self.cursor.fetchall()]
+
     def get_record_from_main_table(self, product_id, warehouse_id):
         query = """
                 SELECT r.*, cl.净含量 AS 最新净含量, cl.更新时间 AS 最新更新时间
@@ -159,7 +495,44 @@ class DynamicDatabase:
 
         return record_dict
 
+    def get_latest_record(self, product_id, warehouse_id):
+        """
+        获取产品的最新记录：优先取最近一次使用记录，没有则取首次录入记录。
+        结果缓存在 LRU 中，写入该产品的使用记录时失效。
+        """
+        key = (int(warehouse_id), int(product_id))
+        if key in self.record_cache:
+            DB_CACHE_HITS.inc()
+            self.record_cache.move_to_end(key)
+            return dict(self.record_cache[key])
+
+        DB_CACHE_MISSES.inc()
+        with DB_LOOKUP_SECONDS.time():
+            record = self.get_change_logs_as_dict(product_id, warehouse_id)
+            if record is None:
+                record = self.get_record_from_main_table(product_id, warehouse_id)
+        if record is None:
+            return None
+
+        self.record_cache[key] = dict(record)
+        if len(self.record_cache) > self.cache_size:
+            self.record_cache.popitem(last=False)
+        return record
+
+    def invalidate_record_cache(self, product_id):
+        """使某个产品的缓存记录失效"""
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return
+        for key in [key for key in self.record_cache if key[1] == product_id]:
+            del self.record_cache[key]
+
     def insert_change_log_from_dict(self, change_log_dict):
+        started = time.perf_counter()
+        # 净含量换算为基本单位的数值（单位、精度随之保存）
+        self._normalize_quantity(change_log_dict)
+
         # Ensure all keys are valid columns in change_logs table or add them if not
         existing_columns = set(self._get_column_names('change_logs'))
         new_columns = set(change_log_dict.keys()) - existing_columns
@@ -179,12 +552,18 @@ class DynamicDatabase:
         # Insert data into the change_logs table
         query = f"INSERT INTO change_logs ({', '.join(columns)}) VALUES ({placeholders});"
         
-        # 确保净含量保持原始精度
-        if '净含量' in change_log_dict:
-            change_log_dict['净含量'] = float(change_log_dict['净含量'])
-        
         self.cursor.execute(query, change_log_dict)  # 使用字典绑定参数
+        # 同一事务中更新该瓶的最新状态（剩余量、最后使用时间）
+        product_id = change_log_dict.get('产品_id')
+        self.cursor.execute("UPDATE records SET 最后使用 = ? WHERE 产品_id = ?;",
+                            (change_log_dict['更新时间'], product_id))
+        if isinstance(change_log_dict.get('净含量'), float):
+            self.cursor.execute("UPDATE records SET 剩余量 = ? WHERE 产品_id = ?;",
+                                (change_log_dict['净含量'], product_id))
         self.conn.commit()
+        DB_CHANGE_LOG_SECONDS.observe(time.perf_counter() - started)
+        self.invalidate_record_cache(product_id)
+        self._notify_write([product_id])
 
     def get_change_logs_as_dict(self, product_id, warehouse_id):
         query = """
@@ -0,0 +1,4 @@
+from .station_api import StationAPI
+from .queries import InventoryQueries
+
+__all__ = ['StationAPI', 'InventoryQueries']
@@ -0,0 +1,29 @@
+from concurrent.futures import Future
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class MainThreadBridge(QObject):
+    """
+    在界面主线程中执行其他线程提交的函数（工作流服务只能在主线程中调用）。
+    submit 立即返回 concurrent.futures.Future，函数由 Qt 事件循环在主线程中执行。
+    必须在主线程中创建。
+    """
+    call_requested = pyqtSignal(object, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 信号从其他线程发出，按队列连接在本对象所在的主线程中执行
+        self.call_requested.connect(self._run)
+
+    def submit(self, function, *args):
+        future = Future()
+        self.call_requested.emit(function, args, future)
+        return future
+
+    def _run(self, function, args, future):
+        if not future.set_running_or_notify_cancel():
+            return  # 调用方已经放弃等待
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
@@ -0,0 +1,71 @@
+import sqlite3
+from quantity import Quantity
+
+
+# 列表查询最多返回的行数
+MAX_LIMIT = 200
+
+
+class InventoryQueries:
+    """
+    站点接口使用的只读查询。使用单独的只读连接，不与界面共用连接和缓存；
+    只能在同一个线程中使用（接口的数据库线程）。
+    """
+
+    def __init__(self, db_path, timeout=2.0):
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=timeout)
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _record(row):
+        """数据库行转为字典：去掉 'null'，补上带单位的剩余量和净含量"""
+        record = {key: row[key] for key in row.keys() if row[key] not in (None, 'null')}
+        unit, precision = record.get('单位'), record.get('精度') or 0
+        if unit:
+            for column in ('净含量', '剩余量'):
+                if isinstance(record.get(column), (int, float)):
+                    record[f'{column}显示'] = Quantity(record[column], unit, precision).display()
+        return record
+
+    def product(self, product_id, warehouse_id=None):
+        """某个产品的最新状态：录入记录、最近一次使用记录和使用次数，没有时返回 None"""
+        query = "SELECT * FROM records WHERE 产品_id = ?"
+        params = [product_id]
+        if warehouse_id is not None:
+            query += " AND 仓库_id = ?"
+            params.append(warehouse_id)
+        row = self.conn.execute(query, params).fetchone()
+        if row is None:
+            return None
+        result = self._record(row)
+        latest = self.conn.execute("SELECT * FROM change_logs WHERE 产品_id = ? ORDER BY 更新时间 DESC LIMIT 1;",
+                                   (product_id,)).fetchone()
+        result['最近使用'] = self._record(latest) if latest is not None else None
+        result['使用次数'] = self.conn.execute("SELECT COUNT(*) FROM change_logs WHERE 产品_id = ?;",
+                                            (product_id,)).fetchone()[0]
+        return result
+
+    def by_cas(self, cas, warehouse_id=None, limit=50):
+        """某个 CAS 号的全部瓶子（使用 cas 索引），按产品ID排序"""
+        query = "SELECT * FROM records WHERE cas = ?"
+        params = [cas]
+        if warehouse_id is not None:
+            query += " AND 仓库_id = ?"
+            params.append(warehouse_id)
+        params.append(max(1, min(int(limit), MAX_LIMIT)))
+        return [self._record(row) for row in self.conn.execute(query + " ORDER BY 产品_id LIMIT ?;", params)]
+
+    def active_alerts(self, warehouse_id=None):
+        """未解除的库存提醒（提醒功能未启用时为空）"""
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alerts';").fetchone() is None:
+            return []
+        query = "SELECT 提醒_id, 产品_id, 仓库_id, 类型, 内容, 创建时间 FROM alerts WHERE 解除时间 IS NULL"
+        params = []
+        if warehouse_id is not None:
+            query += " AND 仓库_id = ?"
+            params.append(warehouse_id)
+        return [dict(row) for row in self.conn.execute(query + " ORDER BY 创建时间 DESC LIMIT ?;",
+                                                        params + [MAX_LIMIT])]
@@ -0,0 +1,358 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from applog import get_logger
+from core import ENROLL_FIELDS, events
+from api.queries import InventoryQueries
+from api.websocket import (OP_CLOSE, OP_PING, OP_PONG, WebSocketClosed, accept_key, encode_frame,
+                           read_frame)
+
+
+log = get_logger('api')
+
+STATUS_TEXT = {200: 'OK', 201: 'Created', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error',
+               503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class StationAPI:
+    """
+    站点的本机 HTTP / WebSocket 接口，供 LIMS、看板等系统使用：
+        GET  /api/state                  当前天平读数、最近扫码的瓶子
+        GET  /api/products/<产品_id>      产品最新状态（?warehouse=）
+        GET  /api/products?cas=<CAS>     某个 CAS 号的全部瓶子（?warehouse=&limit=）
+        GET  /api/alerts                 未解除的库存提醒
+        POST /api/enroll                 录入 {"warehouse_id": 1, "fields": {...}}
+        GET  /api/stream                 WebSocket，推送天平读数、扫码、录入和使用事件
+    在单独线程的 asyncio 事件循环中运行。同时处理的请求数和推送连接数有上限，
+    超出时直接返回 503；数据库查询在一个单独的线程中用只读连接执行，
+    录入交给界面主线程执行，远程客户端不会占满界面和串口线程。
+    """
+
+    def __init__(self, db_path, port=8080, host='0.0.0.0', token=None, enroll=None, station_info=None,
+                 max_clients=8, max_streams=4, max_body=64 * 1024, request_timeout=10.0, stream_queue=100):
+        """
+        :param token: 设置后请求需带 Authorization: Bearer <token>（WebSocket 可用 ?token=）
+        :param enroll: 录入函数 (fields, warehouse_id) -> concurrent.futures.Future（结果为产品ID），
+                       为 None 时不接受录入
+        :param station_info: /api/state 中返回的站点信息
+        :param max_clients: 同时处理的 HTTP 请求数上限
+        :param max_streams: 同时连接的 WebSocket 推送数上限
+        :param stream_queue: 每个推送连接最多缓存的消息数，客户端太慢时丢弃最早的消息
+        """
+        self.db_path = db_path
+        self.port = port
+        self.host = host
+        self.token = token
+        self.enroll = enroll
+        self.station_info = dict(station_info or {})
+        self.max_clients = max_clients
+        self.max_streams = max_streams
+        self.max_body = max_body
+        self.request_timeout = request_timeout
+        self.stream_queue = stream_queue
+
+        self.state = {'weight': None, 'remaining': None, 'last_scan': None, 'last_record': None}
+        self.state_lock = threading.Lock()
+        self.streams = set()
+        self.active = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+        # 只读查询在这个线程中执行（sqlite 连接只能在创建它的线程中使用）
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-db',
+                                              initializer=self._open_queries)
+        self.queries = None
+
+    ########## 启动和停止 ##########
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='station-api', daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, self.host, self.port))
+        except OSError as e:
+            log.error("站点接口无法监听: %s", e, port=self.port)
+            self.loop.close()
+            self.started.set()
+            return
+        log.info("站点接口已启动", host=self.host, port=self.port)
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self._shutdown_loop()
+
+    def _shutdown_loop(self):
+        """
+        停止监听，取消仍在处理的连接（WebSocket 推送等）并等它们结束后再关闭事件循环，
+        否则会出现 "Task was destroyed but it is pending" 和 "Event loop is closed"。
+        """
+        self.server.close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        self.db_executor.submit(self._close_queries)
+        self.db_executor.shutdown(wait=True)
+
+    def _open_queries(self):
+        self.queries = InventoryQueries(self.db_path)
+
+    def _close_queries(self):
+        if self.queries is not None:
+            self.queries.close()
+
+    ########## 事件推送（任意线程调用） ##########
+
+    def handle_service_event(self, event):
+        """订阅 InventoryService 的事件，更新当前状态并推送给 WebSocket 客户端"""
+        if isinstance(event, events.WeightChanged):
+            remaining = event.remaining.display() if event.remaining is not None else None
+            self.publish('weight', {'weight': event.weight, 'remaining': remaining},
+                         weight=event.weight, remaining=remaining)
+        elif isinstance(event, events.ScanAccepted):
+            self.publish('scan', {'code': event.code}, last_scan=event.code)
+        elif isinstance(event, events.RecordLoaded):
+            record = {'warehouse_id': event.warehouse_id, 'product_id': event.product_id, 'record': event.record}
+            self.publish('record', record, last_record=record)
+        elif isinstance(event, events.RecordEnrolled):
+            self.publish('enrolled', {'warehouse_id': event.warehouse_id, 'product_id': event.product_id})
+        elif isinstance(event, events.UsageRecorded):
+            remaining = event.remaining.display() if event.remaining is not None else None
+            self.publish('usage', {'product_id': event.product_id, 'remaining': remaining})
+
+    def publish(self, message_type, data, **state):
+        """推送一条消息；state 中的值同时更新到 /api/state"""
+        if state:
+            with self.state_lock:
+                self.state.update(state)
+        if self.loop is None or not self.streams:
+            return
+        message = json.dumps(dict(data, type=message_type), ensure_ascii=False, default=str)
+        try:
+            self.loop.call_soon_threadsafe(self._broadcast, message)
+        except RuntimeError:
+            pass  # 接口正在停止，事件循环已关闭
+
+    def _broadcast(self, message):
+        for queue in self.streams:
+            if queue.full():
+                queue.get_nowait()  # 客户端太慢，丢弃最早的消息
+            queue.put_nowait(message)
+
+    ########## 请求处理 ##########
+
+    async def _handle_connection(self, reader, writer):
+        if self.active >= self.max_clients:
+            try:
+                await self._respond(writer, 503, {'error': '请求过多，请稍后再试'})
+            except ConnectionError:
+                pass
+            writer.close()
+            return
+        self.active += 1
+        try:
+            try:
+                method, target, headers, body = await asyncio.wait_for(self._read_request(reader),
+                                                                       self.request_timeout)
+            except asyncio.TimeoutError:
+                return
+            except HTTPError as e:
+                await self._respond(writer, e.status, {'error': str(e)})
+                return
+            url = urlsplit(target)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if self.token and headers.get('authorization') != f'Bearer {self.token}' \
+                    and params.get('token') != self.token:
+                await self._respond(writer, 401, {'error': '未授权'})
+                return
+            if url.path == '/api/stream' and headers.get('upgrade', '').lower() == 'websocket':
+                self.active -= 1  # 推送连接单独计数，不占用请求名额
+                try:
+                    await self._stream(reader, writer, headers)
+                finally:
+                    self.active += 1
+                return
+            try:
+                status, payload = await self._route(method, url.path, params, body)
+            except HTTPError as e:
+                status, payload = e.status, {'error': str(e)}
+            except Exception as e:
+                log.exception("站点接口处理请求出错: %s", e, path=url.path)
+                status, payload = 500, {'error': '服务器内部错误'}
+            await self._respond(writer, status, payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # 接口停止时取消；正常结束连接，否则 asyncio.streams 会把取消当作未处理的异常报告
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HTTPError(400, '请求格式错误')
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HTTPError(400, 'Content-Length 格式错误')
+        if length > self.max_body:
+            raise HTTPError(413, '请求内容过大')
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _query(self, method, *args):
+        """在数据库线程中执行只读查询"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, lambda: getattr(self.queries, method)(*args))
+
+    async def _route(self, method, path, params, body):
+        warehouse_id = self._int_param(params, 'warehouse')
+        if path == '/api/state' and method == 'GET':
+            with self.state_lock:
+                state = dict(self.state)
+            return 200, dict(state, station=self.station_info)
+        if path == '/api/alerts' and method == 'GET':
+            return 200, {'alerts': await self._query('active_alerts', warehouse_id)}
+        if path == '/api/products' and method == 'GET':
+            if not params.get('cas'):
+                raise HTTPError(400, '缺少 cas 参数')
+            limit = self._int_param(params, 'limit') or 50
+            return 200, {'products': await self._query('by_cas', params['cas'], warehouse_id, limit)}
+        if path.startswith('/api/products/') and method == 'GET':
+            try:
+                product_id = int(path.rsplit('/', 1)[1])
+            except ValueError:
+                raise HTTPError(400, '产品ID格式错误')
+            product = await self._query('product', product_id, warehouse_id)
+            if product is None:
+                raise HTTPError(404, '未找到该产品')
+            return 200, product
+        if path == '/api/enroll':
+            if method != 'POST':
+                raise HTTPError(405, '请使用 POST')
+            return await self._enroll(body)
+        if path in ('/api/state', '/api/alerts', '/api/products'):
+            raise HTTPError(405, '请使用 GET')
+        raise HTTPError(404, '没有该接口')
+
+    @staticmethod
+    def _int_param(params, name):
+        if name not in params:
+            return None
+        try:
+            return int(params[name])
+        except ValueError:
+            raise HTTPError(400, f"{name} 参数应为整数")
+
+    async def _enroll(self, body):
+        if self.enroll is None:
+            raise HTTPError(503, '本站未开启远程录入')
+        try:
+            request = json.loads(body or b'{}')
+            warehouse_id = int(request['warehouse_id'])
+            fields = request.get('fields') or {}
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, '请求应为 {"warehouse_id": 整数, "fields": {...}}')
+        # 字段名会成为数据库列名，只接受录入表格中的参数
+        unknown = [name for name in fields if name not in ENROLL_FIELDS]
+        if unknown or not isinstance(fields, dict) or \
+                not all(isinstance(value, (str, int, float)) for value in fields.values()):
+            raise HTTPError(400, f"只接受以下字段（值为字符串或数字）: {', '.join(ENROLL_FIELDS)}")
+        fields = {name: str(value) for name, value in fields.items()}
+        try:
+            product_id = await asyncio.wait_for(asyncio.wrap_future(self.enroll(fields, warehouse_id)),
+                                                self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, '录入超时')
+        return 201, {'warehouse_id': warehouse_id, 'product_id': product_id}
+
+    ########## WebSocket 推送 ##########
+
+    async def _stream(self, reader, writer, headers):
+        key = headers.get('sec-websocket-key')
+        if not key:
+            await self._respond(writer, 400, {'error': '缺少 Sec-WebSocket-Key'})
+            return
+        if len(self.streams) >= self.max_streams:
+            await self._respond(writer, 503, {'error': '推送连接过多'})
+            return
+        writer.write((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode('latin-1'))
+        queue = asyncio.Queue(maxsize=self.stream_queue)
+        with self.state_lock:
+            queue.put_nowait(json.dumps(dict(self.state, type='state'), ensure_ascii=False, default=str))
+        self.streams.add(queue)
+        receiver = asyncio.ensure_future(self._receive(reader, writer))
+        try:
+            while not receiver.done():
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    break
+                writer.write(encode_frame(getter.result()))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.streams.discard(queue)
+            receiver.cancel()
+
+    async def _receive(self, reader, writer):
+        """读取客户端的控制帧：回应 ping，收到 close 或断开时结束"""
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == OP_CLOSE:
+                    writer.write(encode_frame(payload[:2], OP_CLOSE))
+                    return
+                if opcode == OP_PING:
+                    writer.write(encode_frame(payload, OP_PONG))
+        except WebSocketClosed:
+            return
@@ -0,0 +1,61 @@
+import base64
+import hashlib
+import struct
+
+
+# RFC 6455 的最小实现：只支持服务端发送文本帧，读取客户端的文本、ping、close 帧
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+def accept_key(client_key):
+    """握手应答中的 Sec-WebSocket-Accept"""
+    digest = hashlib.sha1((client_key.strip() + WEBSOCKET_GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def encode_frame(payload, opcode=OP_TEXT):
+    """编码一个服务端帧（服务端发出的帧不加掩码）"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader, max_size=64 * 1024):
+    """
+    读取一个客户端帧，返回 (opcode, payload)。
+    连接断开或帧超过 max_size 时抛出 WebSocketClosed。
+    """
+    try:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await reader.readexactly(8))[0]
+        if length > max_size:
+            raise WebSocketClosed("帧过大")
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+    except (ConnectionError, EOFError) as e:
+        raise WebSocketClosed(str(e))
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return first & 0x0F, payload
@@ -0,0 +1,3 @@
+from .log_setup import get_logger, setup_logging, shutdown_logging, RateLimitFilter, JsonFormatter
+
+__all__ = ['get_logger', 'setup_logging', 'shutdown_logging', 'RateLimitFilter', 'JsonFormatter']
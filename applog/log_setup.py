@@ -0,0 +1,170 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import threading
+import time
+from metrics import counter
+
+
+# 程序内所有模块的日志记录器都在这个名称下：get_logger('qr') -> 'chemical.qr'
+ROOT_LOGGER = 'chemical'
+
+# 日志默认写在内存文件系统中，不占用 SD 卡的写入
+DEFAULT_LOG_DIR = '/dev/shm/chemical_manager' if os.path.isdir('/dev/shm') \
+    else os.path.join(tempfile.gettempdir(), 'chemical_manager')
+
+LOG_DROPPED = counter('log_dropped_total', '日志队列已满时丢弃的日志条数')
+LOG_RATE_LIMITED = counter('log_rate_limited_total', '超过频率限制被丢弃的日志条数')
+
+# logging 本身使用的关键字参数，其余关键字参数作为结构化字段
+_LOGGING_KWARGS = {'exc_info', 'stack_info', 'stacklevel', 'extra'}
+
+_listener = None
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    结构化日志：额外的关键字参数作为字段记录，例如
+    log.debug("天平读数", weight=12.3) 写出 {"消息": "天平读数", "weight": 12.3, ...}。
+    级别未启用时在格式化之前直接返回。
+    """
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+        if fields:
+            kwargs['extra'] = dict(kwargs.get('extra') or {}, fields=fields)
+        return msg, kwargs
+
+
+def get_logger(name):
+    """模块的日志记录器，name 为模块名（如 'qr'、'libra'）"""
+    return StructuredLogger(logging.getLogger(f'{ROOT_LOGGER}.{name}'), {})
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            '时间': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            '级别': record.levelname,
+            '模块': record.name[len(ROOT_LOGGER) + 1:] or record.name,
+            '消息': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['此前被限流条数'] = suppressed
+        if record.exc_info:
+            entry['异常'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    频率限制：同一模块的同一条消息（按格式字符串区分，不按参数）每秒最多 rate 条，
+    允许短时间内突发 burst 条。超出的丢弃，下一条放行的日志带上被丢弃的条数。
+    WARNING 及以上级别不限制。
+    """
+
+    def __init__(self, rate=5.0, burst=10):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # (记录器名, 消息) -> [令牌数, 上次时间, 被丢弃条数]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                LOG_RATE_LIMITED.inc()
+                return False
+            bucket[0] -= 1
+            record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """放入有界队列后立即返回；队列已满时丢弃，调用线程从不阻塞"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+    def prepare(self, record):
+        # 同一进程内传递，不需要提前格式化；格式化在后台线程中进行
+        return record
+
+
+def setup_logging(level='INFO', levels=None, log_dir=DEFAULT_LOG_DIR, queue_size=1000, rate=5.0,
+                  max_bytes=1024 * 1024, backup_count=3, console_level='WARNING'):
+    """
+    初始化日志：调用方只把日志放入有界队列，由后台线程写入轮转的 JSON 日志文件和控制台。
+    :param level: 默认级别
+    :param levels: 各模块的级别，例如 {'qr': 'DEBUG', 'libra': 'WARNING'}
+    :param log_dir: 日志目录，默认在内存文件系统（/dev/shm）中
+    :param queue_size: 队列长度，写入跟不上时丢弃新日志
+    :param rate: 每条消息每秒最多记录的条数
+    :param console_level: 输出到控制台（journald）的最低级别
+    """
+    global _listener
+    shutdown_logging()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    root.propagate = False
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(f'{ROOT_LOGGER}.{name}').setLevel(module_level)
+
+    handlers = []
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, 'app.log'), maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    except OSError as e:
+        print(f"无法创建日志文件: {e}")
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    handlers.append(console_handler)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate=rate))
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """写完队列中的日志并停止后台线程"""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            pass  # 队列满时无法放入结束标记，后台线程是守护线程，随进程退出
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
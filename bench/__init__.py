@@ -0,0 +1,3 @@
+from .simulators import FakeOCRServer, GM861Responder, PtyDevice, make_test_video, scale_stream
+
+__all__ = ['FakeOCRServer', 'GM861Responder', 'PtyDevice', 'make_test_video', 'scale_stream']
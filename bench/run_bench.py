@@ -0,0 +1,371 @@
+"""
+端到端性能测试：用模拟设备驱动实际代码，输出各环节的吞吐量和延迟百分位数，
+并与保存的基准比较，性能下降超过容差时以返回码 1 退出。
+
+    python -m bench.run_bench                    # 运行全部环节并与 bench/baseline.json 比较
+    python -m bench.run_bench --stages qr,db     # 只运行部分环节
+    python -m bench.run_bench --save-baseline    # 把本次结果保存为基准
+
+基准与硬件有关，应在目标设备（树莓派）上生成后保存。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from PyQt5.QtCore import QCoreApplication, Qt
+from metrics import percentile
+from bench.simulators import FakeOCRServer, GM861Responder, PtyDevice, make_test_video, scale_stream
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+STAGES = ['camera', 'ocr', 'scale', 'qr', 'printer', 'db_insert', 'db_lookup', 'db_use']
+
+
+def summarize(latencies, elapsed, **extra):
+    """一个环节的结果：次数、吞吐量（次/秒）和延迟百分位数（毫秒）"""
+    result = {
+        'count': len(latencies),
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    for p in (50, 95, 99):
+        value = percentile(latencies, p)
+        result[f'p{p}_ms'] = round(value * 1000, 3) if value is not None else None
+    result.update(extra)
+    return result
+
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def bench_camera(options, workdir):
+    """摄像头：CameraThread 读取合成视频，延迟为相邻两帧送出的间隔（解码、缩放、转换）"""
+    from camera.camera_thread import CameraThread
+    video = make_test_video(os.path.join(workdir, 'camera.avi'), frames=options.frames)
+    times = []
+    camera = CameraThread(camera_id=video)
+    camera.frame_signal.connect(lambda frame: times.append(time.perf_counter()), Qt.DirectConnection)
+    started = time.perf_counter()
+    camera.start()
+    camera.wait()
+    elapsed = (times[-1] if times else time.perf_counter()) - started
+    intervals = [b - a for a, b in zip([started] + times, times)]
+    return summarize(intervals, elapsed, expected=options.frames)
+
+
+def bench_ocr(options, workdir):
+    """OCR：OCRThread 经调度器请求本地模拟服务，逐张提交并等待结果，延迟为提交到收到结果"""
+    import cv2
+    from ocr import ocr_client
+    from ocr.ocr_dispatcher import OCRDispatcher
+    from ocr.ocr_thread import OCRThread
+    video = make_test_video(os.path.join(workdir, 'ocr.avi'), frames=1)
+    capture = cv2.VideoCapture(video)
+    _, frame = capture.read()
+    capture.release()
+
+    server = FakeOCRServer(latency=options.ocr_latency, jitter=options.ocr_jitter,
+                           stall_rate=options.ocr_stall_rate).start()
+    previous_url = ocr_client.OCR_URL
+    ocr_client.set_ocr_url(server.url)
+    dispatcher = OCRDispatcher(max_workers=options.ocr_workers, timeout=options.ocr_timeout)
+    thread = OCRThread(dispatcher=dispatcher)
+    done = threading.Event()
+    errors = []
+    thread.ocr_result_signal.connect(lambda result: done.set(), Qt.DirectConnection)
+    thread.error_signal.connect(lambda message: (errors.append(message), done.set()), Qt.DirectConnection)
+    thread.start()
+    latencies = []
+    try:
+        started = time.perf_counter()
+        for _ in range(options.ocr_requests):
+            done.clear()
+            submitted = time.perf_counter()
+            thread.process_image(frame)
+            if done.wait(options.ocr_timeout * 2):
+                latencies.append(time.perf_counter() - submitted)
+        elapsed = time.perf_counter() - started
+    finally:
+        thread.stop()
+        dispatcher.shutdown()
+        server.stop()
+        ocr_client.set_ocr_url(previous_url)
+    return summarize(latencies, elapsed, errors=len(errors), server_requests=server.requests)
+
+
+def bench_scale(options, workdir):
+    """天平：伪终端按固定间隔输出读数，延迟为写入串口到 SerialMonitor 发出读数"""
+    from libra.Libra import SerialMonitor
+    device = PtyDevice()
+    stream = scale_stream(options.scale_readings, options.scale_interval)
+    written = {}
+    received = {}
+    monitor = SerialMonitor(device.port, 9600)
+    monitor.weight_signal.connect(lambda weight: received.setdefault(round(weight), time.perf_counter()),
+                                  Qt.DirectConnection)
+    monitor.start()
+    try:
+        started = time.perf_counter()
+        for index, (offset, chunk) in enumerate(stream, start=1):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            written[index] = device.write(chunk)
+        wait_until(lambda: len(received) >= len(stream), timeout=3)
+        elapsed = max(received.values(), default=time.perf_counter()) - started
+    finally:
+        monitor.stop()
+        device.close()
+    latencies = [received[index] - written[index] for index in written if index in received]
+    return summarize(latencies, elapsed, lost=len(written) - len(latencies))
+
+
+def bench_qr(options, workdir):
+    """
+    扫码：伪终端模拟 GM861（应答模式配置指令），循环回放录制的串口数据，
+    延迟为每组数据最后一块写入到 SerialCommunicator 发出扫码结果。
+    """
+    from qr.gm861_corpus import CAPTURED_STREAMS
+    from qr.qr1 import SerialCommunicator
+    streams = [(chunks, [payload for kind, payload in expected if kind == 'scan'])
+               for _, chunks, expected in CAPTURED_STREAMS]
+    streams = [(chunks, scans) for chunks, scans in streams if scans]
+    device = PtyDevice(GM861Responder())
+    received = []
+    communicator = SerialCommunicator(port=device.port)
+    communicator.data_received.connect(lambda payload: received.append((payload, time.perf_counter())),
+                                       Qt.DirectConnection)
+    expected = []
+    try:
+        communicator.start_threads()
+        started = time.perf_counter()
+        for _ in range(options.qr_rounds):
+            for chunks, scans in streams:
+                finished = device.replay(chunks)
+                expected.extend((payload, finished) for payload in scans)
+                # 间隔大于解析器的空闲分帧时间，无结束符的数据在下一组之前输出
+                time.sleep(options.qr_gap)
+        wait_until(lambda: len(received) >= len(expected), timeout=2)
+        elapsed = (received[-1][1] if received else time.perf_counter()) - started
+    finally:
+        communicator.close()
+        device.close()
+    latencies = [max(0.0, got_time - sent_time)
+                 for (payload, sent_time), (got, got_time) in zip(expected, received) if payload == got]
+    return summarize(latencies, elapsed, mode=communicator.scan_mode,
+                     mismatched=len(expected) - len(latencies))
+
+
+def bench_printer(options, workdir):
+    """
+    打印：print_string_to_printer 向伪终端写入标签，延迟为每次调用（打开串口、编码、写入）。
+    伪终端不按波特率限速，串口传输本身的时间不计在内。
+    """
+    from printer.printerQR import encode_label, print_string_to_printer
+    device = PtyDevice()
+    latencies = []
+    expected_bytes = 0
+    try:
+        started = time.perf_counter()
+        for index in range(options.labels):
+            content, content1 = f"1:{index + 1}", f"A{index % 10}"
+            expected_bytes += len(encode_label(content, content1))
+            called = time.perf_counter()
+            print_string_to_printer(content, content1, port=device.port)
+            latencies.append(time.perf_counter() - called)
+        elapsed = time.perf_counter() - started
+        wait_until(lambda: device.received_bytes() >= expected_bytes, timeout=2)
+        received_bytes = device.received_bytes()
+    finally:
+        device.close()
+    return summarize(latencies, elapsed, bytes=received_bytes, missing_bytes=expected_bytes - received_bytes)
+
+
+def bench_db(options, workdir):
+    """
+    数据库：DynamicDatabase 带上库存提醒和用量统计的写入回调，
+    分别测录入、查询最新记录（按随机产品，大多不命中缓存）和保存使用记录。
+    """
+    from SQL.sql import DynamicDatabase
+    from SQL.alerts import AlertEngine
+    from SQL.analytics import ConsumptionAnalytics
+    db = DynamicDatabase(db_path=os.path.join(workdir, 'bench.db'))
+    AlertEngine(db)
+    ConsumptionAnalytics(db)
+    random.seed(0)
+    results = {}
+    try:
+        latencies, product_ids = [], []
+        started = time.perf_counter()
+        for index in range(options.records):
+            record = {'名称': f'测试试剂{index % 500}', 'cas': f'{64 + index % 500}-17-5', 'lot': f'L{index:06d}',
+                      '净含量': '500.0mL', '位置': f'A{index % 40}', '有效期': '2030-06', '仓库_id': 1}
+            called = time.perf_counter()
+            product_ids.append(db.insert_initial_data(record))
+            latencies.append(time.perf_counter() - called)
+        results['db_insert'] = summarize(latencies, time.perf_counter() - started)
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(options.records):
+            called = time.perf_counter()
+            db.get_latest_record(random.choice(product_ids), 1)
+            latencies.append(time.perf_counter() - called)
+        results['db_lookup'] = summarize(latencies, time.perf_counter() - started)
+
+        latencies = []
+        started = time.perf_counter()
+        for index in range(options.records):
+            change = {'仓库_id': 1, '产品_id': random.choice(product_ids), '净含量': f'{400 - index % 300}.0mL'}
+            called = time.perf_counter()
+            db.insert_change_log_from_dict(change)
+            latencies.append(time.perf_counter() - called)
+        results['db_use'] = summarize(latencies, time.perf_counter() - started)
+    finally:
+        db.close()
+    return results
+
+
+BENCHMARKS = [
+    (('camera',), bench_camera),
+    (('ocr',), bench_ocr),
+    (('scale',), bench_scale),
+    (('qr',), bench_qr),
+    (('printer',), bench_printer),
+    (('db_insert', 'db_lookup', 'db_use'), bench_db),
+]
+
+
+def run(options):
+    """运行选中的环节，返回 {环节: 结果}"""
+    selected = set(options.stages)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='chemical_bench_') as workdir:
+        for stages, benchmark in BENCHMARKS:
+            if not selected.intersection(stages):
+                continue
+            try:
+                result = benchmark(options, workdir)
+            except Exception as e:
+                print(f"{'/'.join(stages)} 运行失败: {e}", file=sys.stderr)
+                results.update({stage: {'error': str(e)} for stage in stages if stage in selected})
+                continue
+            if len(stages) == 1:
+                result = {stages[0]: result}
+            results.update({stage: value for stage, value in result.items() if stage in selected})
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    与基准比较：吞吐量低于基准 (1 - tolerance) 倍，或 p95 延迟高于基准 (1 + tolerance) 倍
+    且差值超过 min_delta_ms 时视为性能下降。
+    :return: 性能下降的说明列表
+    """
+    regressions = []
+    for stage, result in results.items():
+        base = baseline.get(stage)
+        if not base:
+            continue
+        if 'error' in result:
+            regressions.append(f"{stage}: 运行失败（{result['error']}）")
+            continue
+        if base.get('throughput') and result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{stage}: 吞吐量 {result['throughput']}/s，基准 {base['throughput']}/s")
+        if base.get('p95_ms') is not None and result['p95_ms'] is not None \
+                and result['p95_ms'] > base['p95_ms'] * (1 + tolerance) \
+                and result['p95_ms'] - base['p95_ms'] > min_delta_ms:
+            regressions.append(f"{stage}: p95 延迟 {result['p95_ms']}ms，基准 {base['p95_ms']}ms")
+    return regressions
+
+
+def print_report(results):
+    print(f"{'环节':<10}{'次数':>8}{'吞吐量/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  其他")
+    for stage in STAGES:
+        result = results.get(stage)
+        if result is None:
+            continue
+        if 'error' in result:
+            print(f"{stage:<10}  失败: {result['error']}")
+            continue
+        extra = {key: value for key, value in result.items()
+                 if key not in ('count', 'seconds', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms')}
+        cells = ['-' if result[key] is None else result[key] for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{stage:<10}{result['count']:>8}{result['throughput']:>12}"
+              f"{cells[0]:>10}{cells[1]:>10}{cells[2]:>10}  {extra if extra else ''}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="端到端性能测试（模拟摄像头、天平、扫码模块、打印机和OCR服务）")
+    parser.add_argument('--stages', default=','.join(STAGES), type=lambda text: [s for s in text.split(',') if s],
+                        help=f"要运行的环节，逗号分隔：{','.join(STAGES)}")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="基准文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基准")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="允许的性能下降比例")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help="延迟增加不超过该毫秒数时不算下降")
+    parser.add_argument('--output', help="把结果写入 JSON 文件")
+    parser.add_argument('--frames', type=int, default=150, help="合成视频的帧数")
+    parser.add_argument('--ocr-requests', type=int, default=40)
+    parser.add_argument('--ocr-workers', type=int, default=2)
+    parser.add_argument('--ocr-timeout', type=float, default=5.0)
+    parser.add_argument('--ocr-latency', type=float, default=0.15, help="模拟OCR服务的平均延迟（秒）")
+    parser.add_argument('--ocr-jitter', type=float, default=0.05)
+    parser.add_argument('--ocr-stall-rate', type=float, default=0.0, help="模拟OCR服务卡顿的请求比例")
+    parser.add_argument('--scale-readings', type=int, default=60)
+    parser.add_argument('--scale-interval', type=float, default=0.05, help="天平输出读数的间隔（秒）")
+    parser.add_argument('--qr-rounds', type=int, default=10, help="录制的扫码数据回放轮数")
+    parser.add_argument('--qr-gap', type=float, default=0.05, help="两组扫码数据之间的间隔（秒）")
+    parser.add_argument('--labels', type=int, default=50)
+    parser.add_argument('--records', type=int, default=1000)
+    options = parser.parse_args(argv)
+    unknown = set(options.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"未知的环节: {', '.join(sorted(unknown))}")
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    # QThread 需要应用实例；保留引用，否则实例会立即被销毁
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    results = run(options)
+    app.processEvents()  # 先处理测试期间各线程排队到主线程的信号，再输出结果
+    print_report(results)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if options.save_baseline:
+        with open(options.baseline, 'w') as f:
+            json.dump({'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'machine': platform.machine(),
+                       'stages': results}, f, ensure_ascii=False, indent=2)
+        print(f"已保存基准: {options.baseline}")
+        return 0
+    if not os.path.exists(options.baseline):
+        print("没有基准文件，只输出结果（用 --save-baseline 保存）")
+        return 0
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != platform.machine():
+        print(f"注意：基准在 {baseline.get('machine')} 上生成，本机为 {platform.machine()}")
+    regressions = compare(results, baseline.get('stages', {}), options.tolerance, options.min_delta_ms)
+    for line in regressions:
+        print(f"性能下降 - {line}")
+    if regressions:
+        return 1
+    print("与基准相比没有性能下降")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
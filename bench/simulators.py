@@ -0,0 +1,211 @@
+import json
+import os
+import random
+import select
+import threading
+import time
+import tty
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from qr.gm861 import crc16_xmodem
+
+
+def make_test_video(path, frames=150, width=640, height=480, fps=30):
+    """
+    生成合成视频文件，代替摄像头：移动的色块和帧号文字，
+    CameraThread(camera_id=path) 会像读取摄像头一样逐帧读取。
+    """
+    import cv2
+    import numpy as np
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"无法写入测试视频: {path}")
+    for index in range(frames):
+        frame = np.full((height, width, 3), 235, dtype=np.uint8)
+        x = (index * 7) % (width - 160)
+        cv2.rectangle(frame, (x, 120), (x + 160, 360), (40, 90, 200), -1)
+        cv2.putText(frame, f"CAS 67-63-0  Lot {index:05d}", (20, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class PtyDevice:
+    """
+    基于伪终端的串口设备：程序按普通串口打开 self.port，
+    模拟器在主端写入录制的字节流，并可按收到的指令应答。
+    """
+
+    def __init__(self, responder=None):
+        """
+        :param responder: 收到指令字节时调用，返回要应答的字节（或 None）
+        """
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.responder = responder
+        self.received = bytearray()
+        self.receive_times = []  # 每次收到数据的时间（time.perf_counter）
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.thread.start()
+
+    def _read_loop(self):
+        while self.running:
+            ready, _, _ = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                break
+            with self.lock:
+                self.received += data
+                self.receive_times.append(time.perf_counter())
+            if self.responder is not None:
+                reply = self.responder(data)
+                if reply:
+                    self.write(reply)
+
+    def write(self, data):
+        """写入设备输出的字节，返回写入时间"""
+        os.write(self.master, data)
+        return time.perf_counter()
+
+    def replay(self, chunks, start=None):
+        """
+        按录制的时间间隔写入字节块，元素可以是 bytes 或 (相对时间, bytes)。
+        :return: 最后一块的写入时间
+        """
+        start = time.perf_counter() if start is None else start
+        written = start
+        for chunk in chunks:
+            if isinstance(chunk, tuple):
+                offset, chunk = chunk
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            written = self.write(chunk)
+        return written
+
+    def received_bytes(self):
+        with self.lock:
+            return len(self.received)
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=1)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def gm861_response(status, payload=b''):
+    """按 GM861 应答帧格式编码：02 00 | 状态 | 长度 | 数据 | CRC"""
+    body = bytes([status, len(payload)]) + payload
+    crc = crc16_xmodem(body)
+    return b'\x02\x00' + body + bytes([crc >> 8, crc & 0xFF])
+
+
+class GM861Responder:
+    """模拟 GM861 的指令应答：读/写标志位，触发指令回复成功应答"""
+
+    def __init__(self, zones=None):
+        self.zones = dict(zones or {0x0000: 0x03})  # 默认已处于感应模式
+        self.buffer = bytearray()
+
+    def __call__(self, data):
+        self.buffer += data
+        replies = bytearray()
+        while True:
+            start = self.buffer.find(b'\x7e\x00')
+            if start == -1 or len(self.buffer) - start < 9:
+                break
+            command = bytes(self.buffer[start:start + 9])
+            del self.buffer[:start + 9]
+            kind, address, value = command[2], (command[4] << 8) | command[5], command[6]
+            if kind == 0x07:
+                replies += gm861_response(0x00, bytes([self.zones.get(address, 0x00)]))
+            else:
+                if kind == 0x08:
+                    self.zones[address] = value
+                replies += gm861_response(0x00, b'\x00')
+        return bytes(replies)
+
+
+def scale_stream(count, interval=0.05):
+    """
+    合成的天平输出：每个读数为一行十进制数字（0.1 g 为单位）。
+    读数 i 的值为 i g，便于按数值对应写入时间。
+    """
+    return [(index * interval, f"+{index * 10:07d}\r\n".encode()) for index in range(1, count + 1)]
+
+
+# 模拟的标签识别结果（Umi-OCR "data.format": "dict" 格式）
+FAKE_OCR_DATA = [
+    {'text': 'Sigma-Aldrich', 'box': [[20, 10], [220, 10], [220, 40], [20, 40]], 'score': 0.99},
+    {'text': '2-Propanol', 'box': [[20, 60], [260, 60], [260, 95], [20, 95]], 'score': 0.98},
+    {'text': 'CAS No. 67-63-0', 'box': [[20, 120], [300, 120], [300, 150], [20, 150]], 'score': 0.97},
+    {'text': 'Lot # SHBK1234', 'box': [[20, 170], [300, 170], [300, 200], [20, 200]], 'score': 0.96},
+    {'text': 'Size 500 mL', 'box': [[20, 220], [240, 220], [240, 250], [20, 250]], 'score': 0.95},
+]
+
+
+class FakeOCRServer:
+    """
+    本地模拟的 OCR 服务（POST /api/ocr），返回固定的识别结果。
+    每个请求按 latency ± jitter 秒延迟应答，stall_rate 的比例额外卡顿 stall 秒，
+    用来检查超时和对冲请求。
+    """
+
+    def __init__(self, latency=0.15, jitter=0.05, stall_rate=0.0, stall=2.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.requests = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server.lock:
+                    server.requests += 1
+                time.sleep(server.delay())
+                try:
+                    json.loads(body)
+                    response = json.dumps({'code': 100, 'data': FAKE_OCR_DATA}).encode('utf-8')
+                    self.send_response(200)
+                except ValueError:
+                    response = b'{"code": 400}'
+                    self.send_response(400)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/api/ocr"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def delay(self):
+        delay = max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter))
+        if self.stall_rate and random.random() < self.stall_rate:
+            delay += self.stall
+        return delay
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,6 +1,10 @@
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QImage
-import cv2
+from metrics import counter, histogram
+
+
+CAMERA_FRAMES = counter('camera_frames_total', '摄像头读取的帧数')
+CAMERA_FRAME_SECONDS = histogram('camera_frame_seconds', '每帧缩放、转换和发送的耗时')
 
 
 
@@ -22,6 +26,7 @@ class CameraThread(QThread):
     ########## 摄像头 ##########
 
     def run(self):
+        import cv2  # 在摄像头线程中导入 OpenCV，不阻塞窗口显示
         try:
             self.cap = cv2.VideoCapture(self.camera_id)
             if not self.cap.isOpened():
@@ -37,18 +42,20 @@ class CameraThread(QThread):
                     self.error_occurred.emit("无法读取摄像头画面")
                     break
 
-                # 调整图像大小以匹配UI显示区域
-                resized_frame = cv2.resize(frame, (self.target_width, self.target_height))
-                rgb_image = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
-                
-                # 发送图像数据用于UI显示
-                h, w, ch = rgb_image.shape
-                bytes_per_line = ch * w
-                qimage = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                self.image_ready.emit(qimage)
-                
-                # 发送原始RGB图像数据
-                self.frame_signal.emit(rgb_image)
+                CAMERA_FRAMES.inc()
+                with CAMERA_FRAME_SECONDS.time():
+                    # 调整图像大小以匹配UI显示区域
+                    resized_frame = cv2.resize(frame, (self.target_width, self.target_height))
+                    rgb_image = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
+
+                    # 发送图像数据用于UI显示
+                    h, w, ch = rgb_image.shape
+                    bytes_per_line = ch * w
+                    qimage = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+                    self.image_ready.emit(qimage)
+
+                    # 发送原始RGB图像数据
+                    self.frame_signal.emit(rgb_image)
 
 
         except Exception as e:
@@ -0,0 +1,4 @@
+from .inventory_service import InventoryService, ENROLL_FIELDS, USE_FIELDS, parse_label_code
+from . import events
+
+__all__ = ['InventoryService', 'ENROLL_FIELDS', 'USE_FIELDS', 'parse_label_code', 'events']
@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+# InventoryService 发出的事件。界面、API 或测试脚本订阅后按类型处理，
+# 事件在调用服务方法的线程中同步发出。
+
+
+@dataclass(frozen=True)
+class OCRFieldsReady:
+    """标签识别完成，提取出录入字段"""
+    fields: Dict[str, str]
+    supplier: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class OfflineEntryStarted:
+    """网络不可用，已暂存标签图像，可手动填写后保存"""
+
+
+@dataclass(frozen=True)
+class ChemicalInfoFound:
+    """按 CAS 号查到化学品信息（名称、中文名称、分子式、分子量）"""
+    cas: str
+    fields: Dict[str, str]
+
+
+@dataclass(frozen=True)
+class ChemicalInfoMissing:
+    cas: str
+
+
+@dataclass(frozen=True)
+class RecordEnrolled:
+    """新瓶子已保存"""
+    warehouse_id: int
+    product_id: int
+    fields: Dict[str, Any]
+    remote: bool = False  # 由站点接口提交
+    batch: bool = False  # 批量录入中的一瓶
+
+
+@dataclass(frozen=True)
+class ProfileLearned:
+    """从操作员修改中记住了供应商标签上的字段关键字"""
+    supplier: str
+    fields: List[str]
+
+
+@dataclass(frozen=True)
+class OfflineJobQueued:
+    """离线录入的图像已加入离线识别队列"""
+    product_id: int
+    pending: int
+
+
+@dataclass(frozen=True)
+class OfflineRecordCompleted:
+    """离线识别结果已补全到记录中"""
+    warehouse_id: int
+    product_id: int
+    fields: List[str]
+
+
+@dataclass(frozen=True)
+class ScanAccepted:
+    """收到一次新的扫码（已去重）"""
+    code: str
+
+
+@dataclass(frozen=True)
+class InvalidCode:
+    """扫码内容不是 "仓库:产品" 格式"""
+    code: str
+
+
+@dataclass(frozen=True)
+class RecordLoaded:
+    """扫码查到瓶子的最新记录"""
+    warehouse_id: int
+    product_id: int
+    record: Dict[str, Any]
+    quantity: Any = None  # 当前净含量（Quantity），没有数值时为 None
+
+
+@dataclass(frozen=True)
+class RecordNotFound:
+    code: str
+
+
+@dataclass(frozen=True)
+class WeightChanged:
+    """天平读数变化；已扫码且有净含量时同时给出剩余量（Quantity）"""
+    weight: float
+    remaining: Any = None
+
+
+@dataclass(frozen=True)
+class UsageRecorded:
+    """使用记录已保存"""
+    product_id: Any
+    remaining: Any = None
+    forecast: Optional[Dict[str, Any]] = None  # ConsumptionAnalytics.product_forecast 的结果
+
+
+@dataclass(frozen=True)
+class LabelsQueued:
+    """标签已加入打印队列"""
+    description: str
+    count: int
+    pending: int
+    labels: List[tuple] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class ServiceError:
+    """工作流中出现的错误（已记录日志），供界面提示"""
+    message: str
@@ -0,0 +1,367 @@
+from applog import get_logger
+from ocr.supplier_profiles import ProfileStore, LEARNABLE_FIELDS
+from qr.scan_filter import ScanDeduplicator
+from quantity import Quantity
+from SQL.chemical import query_chemical_fields
+from core.events import (OCRFieldsReady, OfflineEntryStarted, ChemicalInfoFound, ChemicalInfoMissing,
+                         RecordEnrolled, ProfileLearned, OfflineJobQueued, OfflineRecordCompleted,
+                         ScanAccepted, InvalidCode, RecordLoaded, RecordNotFound, WeightChanged,
+                         UsageRecorded, LabelsQueued, ServiceError)
+
+
+log = get_logger('core')
+
+# 录入表格的参数，未填写的保存为 null
+ENROLL_FIELDS = ["净含量", "位置", "cas", "lot", "名称", "中文名称", "分子式", "分子量", "纯度", "供应商", "有效期"]
+
+# 扫码后显示、随使用记录保存的字段（按显示顺序）
+USE_FIELDS = ['中文名称', '名称', '分子式', '分子量', 'cas', '净含量', '位置', 'lot', '纯度', '仓库_id', '产品_id', '录入时间']
+
+UNKNOWN_POSITION = "未知位置"
+
+
+def parse_label_code(code):
+    """
+    解析标签二维码 "仓库:产品[;附加数据]"。
+    :return: (仓库_id, 产品_id)，格式不对时返回 None
+    """
+    parts = str(code).split(':')
+    if len(parts) != 2:
+        return None
+    try:
+        return int(parts[0]), int(parts[1].split(';')[0])
+    except ValueError:
+        return None
+
+
+class InventoryService:
+    """
+    录入、扫码查询、称重使用和打印标签的工作流，不依赖界面。
+    界面（或无屏幕的扫码站、压力测试脚本）调用这些方法，并订阅 core.events 中的事件显示结果。
+    数据库、用量统计、打印服务和离线队列在启动阶段逐个创建后赋值给对应属性。
+    所有方法应在同一个线程中调用，事件在该线程中同步发出。
+    """
+
+    def __init__(self, db_manager=None, printer_service=None, analytics=None, offline_queue=None,
+                 profile_store=None, scan_window=2.0):
+        """
+        :param printer_service: PrinterService（或有 submit / submit_batch / pending_count 的对象）
+        :param analytics: ConsumptionAnalytics，保存使用记录后给出用完预测
+        :param offline_queue: OfflineQueue，离线录入的图像在保存后加入
+        :param scan_window: 标签停留在读头前时的重复扫码去重时间（秒）
+        """
+        self.db_manager = db_manager
+        self.printer_service = printer_service
+        self.analytics = analytics
+        self.offline_queue = offline_queue
+        self.profile_store = profile_store if profile_store is not None else ProfileStore()
+        self.scan_filter = ScanDeduplicator(window=scan_window)
+        self.listeners = []
+
+        # 录入流程
+        self.recognized = False  # 已识别（或已进入离线录入），可以保存
+        self.ocr_layout = None  # 最近一次识别的文本框布局，保存时用来学习供应商格式
+        self.ocr_fields = {}  # 最近一次识别提取出的字段，保存时与操作员修改后的值比较
+        self.offline_frame = None  # 网络不可用时暂存的图像，保存时加入离线队列
+        self.last_enrolled = None  # 最近保存的录入记录，打印标签时使用
+
+        # 使用流程
+        self.scan_locked = False  # 查到记录后不再处理新的扫码，直到保存或重新开始
+        self.current_record = None  # 当前扫码的瓶子的最新记录
+        self.current_quantity = None  # 当前瓶子的净含量（Quantity）
+        self.weighable = False  # 净含量为质量单位，可以用天平读数计算剩余量
+        self.remaining = None  # 称重后计算出的剩余量（Quantity）
+        self.weight = None  # 最近一次天平读数（g）
+
+    ########## 事件 ##########
+
+    def subscribe(self, callback):
+        """订阅事件，callback 参数为 core.events 中的事件对象"""
+        self.listeners.append(callback)
+
+    def _emit(self, event):
+        for callback in self.listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                log.exception("事件处理出错: %s", e, event=type(event).__name__)
+
+    def _error(self, message):
+        log.warning(message)
+        self._emit(ServiceError(message))
+
+    ########## 录入 ##########
+
+    def apply_ocr_result(self, data):
+        """
+        处理 OCR 结果的 data 字段：按供应商格式提取字段，识别到 CAS 号时再查询化学品信息。
+        :return: 字段字典（含查到的化学品信息）
+        """
+        fields, self.ocr_layout, supplier = self.profile_store.extract(data)
+        self.ocr_fields = dict(fields)
+        self.recognized = True
+        self.offline_frame = None
+        self._emit(OCRFieldsReady(dict(fields), supplier))
+        cas = str(fields.get('cas', '')).strip()
+        if cas and cas != 'null':
+            fields.update(self.lookup_chemical(cas))
+        return fields
+
+    def start_offline_entry(self, frame):
+        """网络不可用时的录入：暂存图像，允许先保存并打印标签，识别结果稍后补全"""
+        self.offline_frame = frame
+        self.recognized = True
+        self._emit(OfflineEntryStarted())
+
+    def lookup_chemical(self, cas):
+        """
+        按 CAS 号查询化学品信息。
+        :return: {'分子量', '分子式', '中文名称', '名称'}，查不到或出错时返回空字典
+        """
+        try:
+            fields = query_chemical_fields(cas)
+        except Exception as e:
+            self._error(f"查询化学品信息出错: {e}")
+            return {}
+        self._emit(ChemicalInfoFound(cas, fields) if fields else ChemicalInfoMissing(cas))
+        return fields
+
+    def enroll(self, fields, warehouse_id):
+        """
+        保存一瓶新试剂。
+        :param fields: 录入字段，空值为 'null'
+        :return: 产品ID
+        """
+        from ocr.ocr_client import encode_image  # 只有离线录入时才需要编码图像
+        submitted = dict(fields)  # 数据库层会把净含量等换算为数值，学习格式时用操作员填写的原值
+        product_id, record = self._insert_enrollment(fields, warehouse_id)
+        self.last_enrolled = record
+        self._emit(RecordEnrolled(warehouse_id, product_id, dict(record)))
+        self._learn_supplier_profile(submitted, self.ocr_layout, self.ocr_fields)
+        self.ocr_layout = None
+        self.ocr_fields = {}
+        if self.offline_frame is not None and self.offline_queue is not None:
+            # 离线录入：图像加入离线队列，网络恢复后补识别
+            self.offline_queue.enqueue(encode_image(self.offline_frame), product_id, warehouse_id)
+            self._emit(OfflineJobQueued(product_id, self.offline_queue.pending_count()))
+        self.offline_frame = None
+        self.recognized = False
+        return product_id
+
+    def enroll_remote(self, fields, warehouse_id):
+        """
+        其他系统提交的录入（站点接口）：只保存记录，不影响本机正在进行的录入和打印。
+        :return: 产品ID
+        """
+        product_id, record = self._insert_enrollment(fields, warehouse_id)
+        self._emit(RecordEnrolled(warehouse_id, product_id, dict(record), remote=True))
+        return product_id
+
+    def enroll_batch(self, records, warehouse_id, recognitions=None):
+        """
+        批量录入：所有瓶子在一个事务中保存，任何一瓶失败则全部不保存。
+        :param records: 每瓶的录入字段，空值为 'null'
+        :param recognitions: 与 records 对应的 (文本框布局, 识别出的字段)，用于学习供应商格式；没有识别结果的为 None
+        :return: 保存后的记录列表（含产品ID），顺序与 records 一致
+        """
+        submitted = [dict(fields) for fields in records]
+        saved = []
+        for fields in records:
+            record = {name: 'null' for name in ENROLL_FIELDS}
+            record.update(fields)
+            record['仓库_id'] = warehouse_id
+            saved.append(record)
+        product_ids = self.db_manager.insert_records_batch(saved)
+        log.info("保存批量录入记录", count=len(product_ids))
+        recognitions = recognitions or [None] * len(saved)
+        for record, product_id, fields, recognition in zip(saved, product_ids, submitted, recognitions):
+            record['产品_id'] = product_id
+            self._emit(RecordEnrolled(warehouse_id, product_id, dict(record), batch=True))
+            if recognition is not None:
+                self._learn_supplier_profile(fields, *recognition)
+        return saved
+
+    def _insert_enrollment(self, fields, warehouse_id):
+        record = {name: 'null' for name in ENROLL_FIELDS}
+        record.update(fields)
+        record['仓库_id'] = warehouse_id
+        product_id = self.db_manager.insert_initial_data(record)
+        log.info("保存录入记录", product_id=product_id)
+        record['产品_id'] = product_id
+        return product_id, record
+
+    def _learn_supplier_profile(self, record, layout, ocr_fields):
+        """操作员修改了识别结果时，记住该供应商标签上这些字段的关键字"""
+        if layout is None:
+            return
+        corrected = {name: value for name, value in record.items()
+                     if name in LEARNABLE_FIELDS and value != 'null' and value != ocr_fields.get(name)}
+        supplier = record.get('供应商', 'null')
+        if corrected and supplier != 'null':
+            learned = self.profile_store.learn(supplier, layout, corrected)
+            if learned:
+                self._emit(ProfileLearned(supplier, learned))
+
+    def reconcile_offline_results(self):
+        """把所有已识别但未写回的离线任务结果补全到 records 中"""
+        for job_id, product_id, warehouse_id, result in self.offline_queue.unreconciled():
+            try:
+                fields = self.profile_store.extract(result.get('data', ''))[0]
+                if 'cas' in fields:
+                    fields.update(query_chemical_fields(fields['cas']))
+                updated = self.db_manager.fill_missing_fields(product_id, fields)
+                self.offline_queue.mark_reconciled(job_id)
+                if updated:
+                    self._emit(OfflineRecordCompleted(warehouse_id, product_id, updated))
+            except Exception as e:
+                self._error(f"写回离线识别结果失败: {e}")
+
+    ########## 扫码和使用 ##########
+
+    def begin_use(self):
+        """开始使用流程：清除上一瓶的状态和扫码去重记录"""
+        self.scan_locked = False
+        self.scan_filter.reset()
+        self.weight = None
+        self._clear_current()
+
+    def release_scan(self):
+        """允许处理下一次扫码"""
+        self.scan_locked = False
+
+    def _clear_current(self):
+        self.current_record = None
+        self.current_quantity = None
+        self.weighable = False
+        self.remaining = None
+
+    def handle_scan(self, code):
+        """
+        处理读头的扫码结果：去重，查到记录后锁定，直到保存使用记录。
+        :return: 是否处理了这次扫码（被去重或已锁定时为 False）
+        """
+        if not self.scan_filter.accept(code) or self.scan_locked:
+            return False
+        self._emit(ScanAccepted(code))
+        if self.lookup(code) is not None:
+            self.scan_locked = True
+        return True
+
+    def lookup(self, code):
+        """
+        按标签内容查询瓶子的最新记录，作为当前瓶子。
+        :return: 记录字典，格式不对或查不到时返回 None
+        """
+        ids = parse_label_code(code)
+        if ids is None:
+            log.warning("二维码格式错误", data=code)
+            self._emit(InvalidCode(code))
+            return None
+        warehouse_id, product_id = ids
+        try:
+            # 优先读取缓存，重复扫码不再查询数据库
+            record = self.db_manager.get_latest_record(product_id, warehouse_id)
+        except Exception as e:
+            log.exception("查询二维码对应记录出错: %s", e)
+            return None
+        if not record:
+            self._emit(RecordNotFound(code))
+            return None
+        self.current_record = record
+        self.current_quantity = Quantity.from_record(record)
+        # 天平读数为克，体积单位的瓶子在这里提示一次，之后的读数不再计算剩余量
+        self.weighable = self.current_quantity is not None and self.current_quantity.dimension == 'mass'
+        self.remaining = None
+        self._emit(RecordLoaded(warehouse_id, product_id, record, self.current_quantity))
+        if self.current_quantity is not None and not self.weighable:
+            self._error(f"净含量为{self.current_quantity.display()}（体积），天平读数不计算剩余量")
+        return record
+
+    def update_weight(self, weight, precision=1):
+        """
+        天平读数（g）：已扫码时按数值计算剩余量，小数位数取净含量和天平分辨率中较高的。
+        :return: 剩余量（Quantity），无法计算时返回 None
+        """
+        self.weight = weight
+        remaining = None
+        if self.current_record is not None and self.weighable:
+            used = Quantity.from_value(weight, 'g', precision)
+            remaining = self.current_quantity.minus(used)
+            self.remaining = remaining
+        self._emit(WeightChanged(weight, remaining))
+        return remaining
+
+    def use_fields(self):
+        """当前瓶子要保存的使用记录字段（空值为 'null'）"""
+        record = self.current_record or {}
+        fields = {'使用量': str(self.weight) if self.weight is not None else 'null'}
+        for name in USE_FIELDS:
+            value = record.get(name, 'null')
+            if name == '净含量' and self.current_quantity is not None:
+                value = self.current_quantity.display()
+            fields[name] = 'null' if value in (None, '') else value
+        return fields
+
+    def record_use(self, fields=None):
+        """
+        保存当前瓶子的使用记录，净含量保存为称重后的剩余量。
+        :param fields: 要保存的字段，默认为 use_fields()；其中的 '最新净含量' 在没有称重时作为净含量
+        :return: UsageRecorded 事件
+        """
+        if self.current_record is None:
+            raise ValueError("请先扫描二维码")
+        use_data = dict(fields) if fields is not None else self.use_fields()
+        # 净含量保存为称重后的剩余量（数值、单位和精度由数据库层换算保存）
+        latest = use_data.pop('最新净含量', 'null')
+        if self.remaining is not None:
+            use_data['净含量'] = self.remaining
+        elif latest != 'null':
+            use_data['净含量'] = latest
+        self.db_manager.insert_change_log_from_dict(use_data)
+        product_id = use_data.get('产品_id')
+        log.info("保存使用记录", product_id=product_id, net=str(use_data.get('净含量')))
+        forecast = self.analytics.product_forecast(product_id) if self.analytics is not None else None
+        event = UsageRecorded(product_id, self.remaining, forecast)
+        self._clear_current()
+        self.scan_locked = False
+        self._emit(event)
+        return event
+
+    ########## 打印 ##########
+
+    def print_label(self, warehouse_id, product_id, position=None, copies=1):
+        """打印（或重打）一瓶的标签，打印机不可用时抛出 ValueError"""
+        position_text = position if position and position != 'null' else UNKNOWN_POSITION
+        label = (f"{warehouse_id}:{product_id}", position_text)
+        self.printer_service.submit(*label, copies)
+        self._emit(LabelsQueued(f"{copies} 张", copies, self.printer_service.pending_count(), [label]))
+
+    def print_enrolled_label(self):
+        """打印最近保存的录入记录的标签"""
+        if not self.last_enrolled:
+            raise ValueError("没有可用的数据")
+        record = self.last_enrolled
+        self.print_label(record['仓库_id'], record['产品_id'], record.get('位置'))
+
+    def print_records(self, records, description):
+        """打印一批记录（如批量录入保存的瓶子）的标签，合并为一个打印任务"""
+        labels = []
+        for record in records:
+            position = record.get('位置')
+            labels.append((f"{record['仓库_id']}:{record['产品_id']}",
+                           position if position and position != 'null' else UNKNOWN_POSITION))
+        self.printer_service.submit_batch(labels)
+        self._emit(LabelsQueued(f"{description} 共 {len(labels)} 张", len(labels),
+                                self.printer_service.pending_count(), labels))
+        return labels
+
+    def print_shelf(self, warehouse_id, position):
+        """打印某个货架上全部瓶子的标签，合并为一个打印任务"""
+        if not position or position == 'null':
+            raise ValueError("当前瓶子没有位置信息")
+        product_ids = self.db_manager.get_product_ids_by_position(position, warehouse_id)
+        labels = [(f"{warehouse_id}:{pid}", position) for pid in product_ids]
+        self.printer_service.submit_batch(labels)
+        self._emit(LabelsQueued(f"货架 {position} 共 {len(labels)} 张", len(labels),
+                                self.printer_service.pending_count(), labels))
+        return labels
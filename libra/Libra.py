@@ -6,6 +6,15 @@ import re
 from PyQt5.QtCore import pyqtSignal,QObject
 import threading
 import time
+from metrics import counter, histogram
+from applog import get_logger
+
+
+log = get_logger('libra')
+
+
+SCALE_SAMPLES = counter('scale_samples_total', '天平读数个数')
+SCALE_READ_SECONDS = histogram('scale_read_seconds', '读取并解析一批天平数据的耗时')
 
 
 
@@ -84,6 +93,7 @@ class SerialMonitor(QObject):
         self.running = False
         self.thread = None
         self.buffer = ""
+        self.precision = 1  # 读数分辨率为 0.1 g，计算剩余量时保留的小数位数
 
     def start(self):
         """Start the serial monitoring thread."""
@@ -93,9 +103,9 @@ class SerialMonitor(QObject):
                 self.running = True
                 self.thread = threading.Thread(target=self._monitor)
                 self.thread.start()
-                print(f"Started monitoring on {self.port} at {self.baudrate} baud.")
+                log.info("开始读取天平数据", port=self.port, baudrate=self.baudrate)
             except serial.SerialException as e:
-                print(f"Failed to open serial port: {e}")
+                log.error("无法打开天平串口: %s", e, port=self.port)
                 self.running = False
 
     def stop(self):
@@ -105,7 +115,7 @@ class SerialMonitor(QObject):
             self.thread.join(timeout=2)  # Wait for thread to finish.
         if self.ser is not None and self.ser.is_open:
             self.ser.close()
-        print("Stopped monitoring.")
+        log.info("停止读取天平数据", port=self.port)
 
 
 
@@ -117,6 +127,7 @@ class SerialMonitor(QObject):
         while self.running:
             try:
                 if self.ser.in_waiting > 0:
+                    read_started = time.perf_counter()
                     # Read raw bytes from the serial port
                     byte_data = self.ser.read(self.ser.in_waiting)
                     # 将字节字符串添加到缓冲区
@@ -134,14 +145,16 @@ class SerialMonitor(QObject):
                             weight_value = float(match)
                             weight_value = weight_value * 0.1
                             self.weight_signal.emit(weight_value)
-                            print(f"Received weight value: {weight_value}")
+                            SCALE_SAMPLES.inc()
+                            log.debug("天平读数", weight=weight_value)
                         except ValueError:
-                            print(f"Could not convert '{match}' to float")
+                            log.debug("无法解析天平数据", raw=match)
+                    SCALE_READ_SECONDS.observe(time.perf_counter() - read_started)
             except serial.SerialException as e:
-                print(f"Error reading from serial port: {e}")
+                log.error("读取天平串口出错: %s", e)
                 self.stop()
             except Exception as e:
-                print(f"Unexpected error: {e}")
+                log.exception("天平数据处理出错: %s", e)
                 self.stop()
             time.sleep(1)  # Small delay to avoid high CPU usage.
 
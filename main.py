@@ -1,12 +1,23 @@
 import sys
 import warnings
 
-from PyQt5.QtWidgets import QApplication, QDialog
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-from ui.main_ui import Ui_Dialog
-from ui.main_ui_event import MainUIEvent
-from camera.camera_thread import CameraThread
+from startup import StartupTimer
+
+# 启动耗时统计：记录各阶段和各个包的导入耗时，启动完成后输出报告
+startup_timer = StartupTimer()
+startup_timer.track_imports()
+
+with startup_timer.phase("导入模块"):
+    from PyQt5.QtWidgets import QApplication, QDialog
+    from PyQt5.QtCore import Qt, QTimer
+    from PyQt5.QtGui import QPixmap
+    from ui.main_ui import Ui_Dialog
+    from ui.main_ui_event import MainUIEvent
+    from camera.camera_thread import CameraThread
+    from applog import get_logger
+
+
+log = get_logger('ui')
 
 
 # 过滤 SIP 弃用警告
@@ -16,14 +27,40 @@ class MyApp(QDialog, Ui_Dialog):
         super(MyApp, self).__init__()
         self.setupUi(self)  # 初始化 UI
         self.event_handler = MainUIEvent(self)  # 初始化事件处理类
-        
-        # 初始化摄像头
+        self.camera_thread = None
+
+    def start_camera(self):
+        """初始化摄像头（OpenCV 在摄像头线程中导入和打开设备）"""
         self.camera_thread = CameraThread()
         self.camera_thread.image_ready.connect(self.update_camera_view)
         self.camera_thread.frame_signal.connect(self.handle_camera_frame)
         self.camera_thread.error_occurred.connect(self.handle_camera_error)
         self.camera_thread.start()
 
+    def start_subsystems(self, timer):
+        """
+        窗口显示后分阶段启动摄像头、数据库和后台服务。
+        每个阶段之间回到事件循环，界面可以先绘制并响应操作。
+        """
+        stages = [("启动摄像头", self.start_camera)] + self.event_handler.startup_stages()
+
+        def run_next():
+            if not stages:
+                timer.stop_tracking()
+                log.info("启动耗时报告\n%s", timer.report(), elapsed=round(timer.elapsed(), 3))
+                self.status_bar.showMessage(f"就绪（启动用时 {timer.elapsed():.1f} 秒）")
+                return
+            name, stage = stages.pop(0)
+            try:
+                with timer.phase(name):
+                    stage()
+            except Exception as e:
+                log.exception("启动阶段失败: %s", name, stage=name)
+                self.log_browser.append(f'<font color="red">{name}失败: {e}</font>')
+            QTimer.singleShot(0, run_next)
+
+        QTimer.singleShot(0, run_next)
+
     def handle_camera_frame(self, frame):
         """处理摄像头帧数据"""
         self.event_handler.handle_camera_frame(frame)
@@ -64,7 +101,10 @@ class MyApp(QDialog, Ui_Dialog):
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = MyApp()
-    window.show()
+    with startup_timer.phase("创建窗口"):
+        app = QApplication(sys.argv)
+        window = MyApp()
+        window.show()
+    startup_timer.mark("窗口显示")
+    window.start_subsystems(startup_timer)
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,5 @@
+from .registry import REGISTRY, Counter, Gauge, Histogram, counter, gauge, histogram, percentile, span
+from .exporter import MetricsServer, dump_metrics, render_prometheus
+
+__all__ = ['REGISTRY', 'Counter', 'Gauge', 'Histogram', 'counter', 'gauge', 'histogram', 'percentile', 'span',
+           'MetricsServer', 'dump_metrics', 'render_prometheus']
@@ -0,0 +1,69 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from metrics.registry import REGISTRY
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(registry=REGISTRY):
+    """按 Prometheus 文本格式输出全部指标"""
+    lines = []
+    for metric in registry.collect():
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if metric.kind == 'histogram':
+            for bound, count in metric.cumulative_buckets():
+                lines.append(f'{metric.name}_bucket{{le="{_format_value(bound)}"}} {count}')
+            lines.append(f"{metric.name}_sum {_format_value(metric.sum)}")
+            lines.append(f"{metric.name}_count {metric.count}")
+        else:
+            lines.append(f"{metric.name} {_format_value(metric.value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def dump_metrics(path, registry=REGISTRY):
+    """把指标写入文件（先写临时文件再改名，读取方不会读到一半的内容）"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(render_prometheus(registry))
+    os.replace(temp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus(self.server.registry).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 抓取请求很频繁，不输出访问日志
+
+
+class MetricsServer:
+    """本机的指标 HTTP 接口：GET /metrics 返回 Prometheus 文本格式"""
+
+    def __init__(self, port=9108, host='127.0.0.1', registry=REGISTRY):
+        self.server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.server.registry = registry
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
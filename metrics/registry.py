@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+
+
+# 默认的耗时分桶（秒），覆盖从扫码、数据库的毫秒级到 OCR 的秒级
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def percentile(samples, p):
+    """样本的第 p 百分位数（最近秩法），没有样本时返回 None"""
+    samples = sorted(samples)
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))]
+
+
+class Registry:
+    """
+    指标注册表。关闭时各指标的记录方法只检查一个布尔值就返回，
+    span 返回共享的空上下文管理器，热路径上几乎没有开销。
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(self, name, help_text, **kwargs)
+            return metric
+
+    def collect(self):
+        """按名称排序的全部指标"""
+        with self.lock:
+            return [self.metrics[name] for name in sorted(self.metrics)]
+
+
+class Counter:
+    """只增不减的计数"""
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.value += amount
+
+
+class Gauge:
+    """可增可减的当前值（如队列长度）"""
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help_text):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def set(self, value):
+        if self.registry.enabled:
+            self.value = value
+
+
+class Histogram:
+    """
+    耗时分布：Prometheus 格式的累计分桶、总和和次数，
+    另保留最近若干个样本，用于在诊断面板中显示百分位数。
+    """
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, buckets=DEFAULT_BUCKETS, window=512):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[index] += 1
+                    break
+
+    def time(self):
+        """计时上下文管理器：with histogram.time(): ..."""
+        if not self.registry.enabled:
+            return _NOOP_SPAN
+        return _Span(self)
+
+    def cumulative_buckets(self):
+        """[(上界, 累计次数)]，最后一项为 +Inf"""
+        with self.lock:
+            counts = list(self.bucket_counts)
+            total = self.count
+        result, running = [], 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            result.append((bound, running))
+        result.append((float('inf'), total))
+        return result
+
+    def percentile(self, p):
+        """最近样本的第 p 百分位数，没有样本时返回 None"""
+        with self.lock:
+            samples = list(self.recent)
+        return percentile(samples, p)
+
+
+class _Span:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+# 全局注册表，由 MainUIEvent 按配置文件中的 metrics_enabled 打开或关闭
+REGISTRY = Registry()
+
+
+def counter(name, help_text=''):
+    return REGISTRY._register(Counter, name, help_text)
+
+
+def gauge(name, help_text=''):
+    return REGISTRY._register(Gauge, name, help_text)
+
+
+def histogram(name, help_text='', buckets=DEFAULT_BUCKETS):
+    return REGISTRY._register(Histogram, name, help_text, buckets=buckets)
+
+
+def span(name, help_text=''):
+    """记录一段代码耗时到名为 name 的直方图：with span('db_save_seconds'): ..."""
+    if not REGISTRY.enabled:
+        return _NOOP_SPAN
+    return _Span(histogram(name, help_text))
@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+from ocr.ocr_client import encode_image, post_ocr
+from ocr.ocr_result import extract_fields
+from SQL.chemical import query_chemical_fields
+from applog import get_logger
+
+
+log = get_logger('ocr')
+
+
+# 批量录入中每一瓶的状态
+QUEUED = '排队中'
+RECOGNIZING = '识别中'
+DONE = '已识别'
+ERROR = '识别失败'
+REMOVED = '已删除'
+
+
+class BatchItem:
+    """批量录入中的一瓶：拍摄的图像和识别出的字段"""
+
+    def __init__(self, index, frame):
+        self.index = index
+        self.frame = frame
+        self.state = QUEUED
+        self.fields = {}
+        self.error = None
+        self.layout = None  # 识别结果的文本框布局，保存时用来学习供应商格式
+        self.ocr_fields = {}  # 识别提取出的字段，保存时与操作员修改后的值比较
+
+
+class BatchEnrollment(QObject):
+    """
+    批量录入：拍摄的图像放入队列，由有限大小的线程池并发识别，
+    识别结果累积在列表中，确认后一次性写入数据库。
+    拍下一瓶不需要等待上一瓶识别完成。
+    """
+    item_added = pyqtSignal(int)  # 新加入一瓶的序号
+    item_updated = pyqtSignal(int)  # 某一瓶的识别状态变化
+
+    def __init__(self, max_workers=3, timeout=10, dispatcher=None, profile_store=None):
+        """
+        :param max_workers: 同时识别的最大数量，避免压垮OCR服务和网络
+        :param timeout: 单张图像识别超时（秒）
+        :param dispatcher: 共享的 OCRDispatcher；提供时识别请求经由它发送（对冲、耗时统计）
+        :param profile_store: 供应商格式库；提供时按识别出的供应商格式提取字段
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.dispatcher = dispatcher
+        self.profile_store = profile_store
+        self.items = []
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-ocr')
+
+    def add_frame(self, frame, fields=None):
+        """
+        加入一张标签图像并开始后台识别，返回序号。
+        :param fields: 预先填写的字段（如位置），识别结果不会覆盖
+        """
+        with self.lock:
+            item = BatchItem(len(self.items), frame.copy())
+            item.fields = dict(fields or {})
+            self.items.append(item)
+        self.item_added.emit(item.index)
+        self.executor.submit(self._recognize, item)
+        return item.index
+
+    def retry(self, index):
+        """重新识别失败的一瓶"""
+        item = self.items[index]
+        if item.state == ERROR:
+            item.state = QUEUED
+            item.error = None
+            self.item_updated.emit(index)
+            self.executor.submit(self._recognize, item)
+
+    def remove(self, index):
+        """从本批中删除一瓶（正在识别的结果会被丢弃）"""
+        self.items[index].state = REMOVED
+        self.items[index].frame = None
+        self.item_updated.emit(index)
+
+    def _recognize(self, item):
+        if item.state == REMOVED:
+            return
+        item.state = RECOGNIZING
+        self.item_updated.emit(item.index)
+        try:
+            jpeg_bytes = encode_image(item.frame)
+            if self.dispatcher is not None:
+                result = self.dispatcher.submit(jpeg_bytes, self.timeout).result()
+            else:
+                result = post_ocr(jpeg_bytes, self.timeout)
+            layout = None
+            if self.profile_store is not None:
+                fields, layout, _ = self.profile_store.extract(result.get('data', ''))
+            else:
+                fields = extract_fields(result.get('data', ''))
+            ocr_fields = dict(fields)
+        except Exception as e:
+            if item.state == REMOVED:
+                return
+            item.state = ERROR
+            item.error = str(e)
+        else:
+            if item.state == REMOVED:
+                return
+            if fields.get('cas'):
+                # 参考库查询失败（如没有 chemicals.db）不影响识别结果，化学品信息可手动填写
+                try:
+                    fields.update(query_chemical_fields(fields['cas']))
+                except Exception as e:
+                    log.warning("查询化学品信息出错: %s", e, cas=fields['cas'])
+            # 操作员可能已在列表中手动填写，识别结果不覆盖已有的值
+            item.fields = dict(fields, **item.fields)
+            item.layout, item.ocr_fields = layout, ocr_fields
+            item.state = DONE
+            item.frame = None  # 识别完成后释放图像
+        self.item_updated.emit(item.index)
+
+    def pending_count(self):
+        """还没有识别完成的数量"""
+        return sum(1 for item in self.items if item.state in (QUEUED, RECOGNIZING))
+
+    def accepted_items(self):
+        """没有被删除的各瓶"""
+        return [item for item in self.items if item.state != REMOVED]
+
+    def shutdown(self):
+        """停止接受新任务；正在进行的识别在后台结束"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,38 @@
+import base64
+import json
+import os
+
+
+# OCR服务地址，可用环境变量 CHEMICAL_OCR_URL 或配置文件中的 ocr_url 覆盖（如测试用的本地服务）
+OCR_URL = os.environ.get('CHEMICAL_OCR_URL', "http://8.155.50.231:80/api/ocr")
+
+
+def set_ocr_url(url):
+    """修改OCR服务地址，之后的请求立即生效"""
+    global OCR_URL
+    OCR_URL = url
+
+
+def encode_image(image):
+    """将OpenCV图像编码为JPEG字节"""
+    import cv2  # 延迟导入，缩短启动时间
+    _, buffer = cv2.imencode('.jpg', image)
+    return buffer.tobytes()
+
+
+def post_ocr(jpeg_bytes, timeout):
+    """
+    把JPEG图像发送给OCR服务，返回识别结果字典。
+    网络错误时抛出 requests 的异常，由调用者处理。
+    """
+    import requests  # 延迟导入，第一次识别时才加载
+    data = {
+        "base64": base64.b64encode(jpeg_bytes).decode('utf-8'),
+        "options": {
+            "data.format": "dict",  # 返回每个文本框的文字和位置，按位置提取字段
+        }
+    }
+    headers = {"Content-Type": "application/json"}
+    response = requests.post(OCR_URL, data=json.dumps(data), headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return json.loads(response.text)
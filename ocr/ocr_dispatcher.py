@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from ocr.ocr_client import post_ocr
+from metrics import counter, histogram, percentile
+
+
+OCR_REQUESTS = counter('ocr_requests_total', '提交的识别请求数')
+OCR_FAILURES = counter('ocr_failures_total', '失败（含超过截止时间）的识别请求数')
+OCR_HEDGES = counter('ocr_hedged_total', '发送的对冲请求数')
+OCR_REQUEST_SECONDS = histogram('ocr_request_seconds', '从提交到拿到识别结果的耗时')
+OCR_ATTEMPT_SECONDS = histogram('ocr_attempt_seconds', '单次发送到OCR服务的往返耗时')
+
+
+class LatencyRecorder:
+    """记录最近若干次耗时，计算百分位数"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p):
+        """第 p 百分位数（秒），没有样本时返回 None"""
+        with self.lock:
+            samples = list(self.samples)
+        return percentile(samples, p)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def summary(self):
+        """{'count': 样本数, 'p50': ..., 'p95': ..., 'p99': ...}，单位毫秒"""
+        result = {'count': len(self)}
+        for p in (50, 95, 99):
+            value = self.percentile(p)
+            result[f'p{p}'] = round(value * 1000, 1) if value is not None else None
+        return result
+
+
+class OCRDispatcher:
+    """
+    OCR请求调度器：有限大小的线程池并发发送识别请求，每个请求有总的截止时间。
+    可选对冲请求：一个请求超过近期 p95 耗时仍未返回时，再发送一份相同的请求，
+    取先返回的结果。只在有空闲线程时对冲，不会成倍增加服务器负载。
+    """
+
+    def __init__(self, max_workers=2, timeout=5.0, hedge=True, hedge_percentile=95, hedge_min_samples=20):
+        """
+        :param max_workers: 同时进行的最大请求数
+        :param timeout: 每个识别请求的截止时间（秒，从提交开始计算）
+        :param hedge: 是否启用对冲请求
+        :param hedge_percentile: 超过该百分位耗时后发送对冲请求
+        :param hedge_min_samples: 样本数不足时不对冲，避免根据少量数据误判
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr')
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.attempt_latency = LatencyRecorder()  # 单次请求耗时，用于决定对冲时机
+        self.request_latency = LatencyRecorder()  # 从提交到拿到结果的耗时
+        self.hedged_count = 0
+        self.hedge_wins = 0
+        self.deadline_count = 0
+
+    def submit(self, jpeg_bytes, timeout=None):
+        """
+        提交一张JPEG图像，返回 concurrent.futures.Future：
+        成功时结果为识别结果字典；失败时为 requests 的异常（截止时间到时为 requests.exceptions.Timeout）。
+        """
+        request = _Request(jpeg_bytes, time.monotonic() + (timeout or self.timeout))
+        OCR_REQUESTS.inc()
+        self._start_attempt(request, hedged=False)
+
+        # 截止时间到时直接失败，不再等待卡住的请求
+        deadline_timer = threading.Timer(request.deadline - time.monotonic(), self._expire, (request,))
+        deadline_timer.daemon = True
+        deadline_timer.start()
+        request.timers.append(deadline_timer)
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < request.deadline - time.monotonic():
+            hedge_timer = threading.Timer(hedge_delay, self._start_hedge, (request,))
+            hedge_timer.daemon = True
+            hedge_timer.start()
+            request.timers.append(hedge_timer)
+        return request.future
+
+    def _hedge_delay(self):
+        if not self.hedge or len(self.attempt_latency) < self.hedge_min_samples:
+            return None
+        return self.attempt_latency.percentile(self.hedge_percentile)
+
+    def _start_hedge(self, request):
+        with self.lock:
+            # 没有空闲线程时不对冲
+            if request.done or self.in_flight >= self.max_workers:
+                return
+            self.hedged_count += 1
+        OCR_HEDGES.inc()
+        self._start_attempt(request, hedged=True)
+
+    def _start_attempt(self, request, hedged):
+        with self.lock:
+            self.in_flight += 1
+            request.attempts += 1
+        attempt = self.executor.submit(self._send, request)
+        attempt.add_done_callback(lambda f: self._attempt_done(request, f, hedged))
+
+    def _send(self, request):
+        """在工作线程中发送一次请求，返回 (结果, 耗时)；请求已结束（排队期间超时）时不再发送"""
+        started = time.monotonic()
+        if request.done:
+            return None, None
+        result = post_ocr(request.jpeg_bytes, max(0.1, request.deadline - started))
+        return result, time.monotonic() - started
+
+    def _attempt_done(self, request, attempt, hedged):
+        import requests  # 延迟导入，启动时不加载
+        with self.lock:
+            self.in_flight -= 1
+            request.attempts -= 1
+            remaining = request.attempts
+        if attempt.cancelled():
+            error = requests.exceptions.ConnectionError("OCR调度器已关闭")
+        else:
+            error = attempt.exception()
+        if error is None:
+            result, elapsed = attempt.result()
+            if elapsed is None:
+                return
+            self.attempt_latency.record(elapsed)
+            OCR_ATTEMPT_SECONDS.observe(elapsed)
+            if request.finish(result=result):
+                self.request_latency.record(time.monotonic() - request.submitted)
+                OCR_REQUEST_SECONDS.observe(time.monotonic() - request.submitted)
+                if hedged:
+                    self.hedge_wins += 1
+        elif remaining == 0:
+            # 所有请求都失败才报告错误
+            if request.finish(error=error):
+                OCR_FAILURES.inc()
+
+    def _expire(self, request):
+        import requests
+        if request.finish(error=requests.exceptions.Timeout(f"OCR请求超过 {self.timeout} 秒未返回")):
+            self.deadline_count += 1
+            OCR_FAILURES.inc()
+
+    def stats(self):
+        """耗时百分位数和对冲统计"""
+        return {
+            'request_ms': self.request_latency.summary(),
+            'attempt_ms': self.attempt_latency.summary(),
+            'hedged': self.hedged_count,
+            'hedge_wins': self.hedge_wins,
+            'deadline_exceeded': self.deadline_count,
+        }
+
+    def shutdown(self):
+        """不再接受新请求；进行中的请求在后台结束"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Request:
+    """一次识别请求，可能对应多次发送（对冲）"""
+
+    def __init__(self, jpeg_bytes, deadline):
+        self.jpeg_bytes = jpeg_bytes
+        self.deadline = deadline
+        self.submitted = time.monotonic()
+        self.future = Future()
+        self.attempts = 0
+        self.timers = []
+        self.lock = threading.Lock()
+        self.done = False
+
+    def finish(self, result=None, error=None):
+        """设置结果，只有第一次调用生效；返回是否生效"""
+        with self.lock:
+            if self.done:
+                return False
+            self.done = True
+        for timer in self.timers:
+            timer.cancel()
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+        return True
@@ -1,4 +1,6 @@
 import re
+from ocr.text_layout import TextLayout
+from quantity.units import UNIT_NAMES
 
 def extract_cas_number(text):
     """
@@ -42,6 +44,10 @@ def extract_lot_number_from_data(text):
         
     return None, False  # 如果没有找到批号，返回 None 和失败标志
 
+def format_unit(unit):
+    """单位统一写法：质量单位小写，体积单位写成 mL、L"""
+    return UNIT_NAMES.get(unit.lower(), unit.lower())
+
 def extract_weight_from_data(text):
     """
     从 OCR 数据中提取重量信息（以 g, kg 等单位结尾的数值）。
@@ -50,7 +56,7 @@ def extract_weight_from_data(text):
     weight_str = ""
     flag = True
     # 定义重量单位的正则表达式
-    weight_pattern = r'(\d+(\.\d+)?)(g|kg|mg|lb|oz)\b'
+    weight_pattern = r'(\d+(\.\d+)?)(g|kg|mg|lb|oz|ml|l)\b'
     
     # 使用正则表达式查找所有匹配的重量信息
     matches = re.findall(weight_pattern, text, re.IGNORECASE)
@@ -58,7 +64,7 @@ def extract_weight_from_data(text):
         if flag:
             # 提取数字部分
             number = float(match[0])
-            unit = match[2].lower()
+            unit = format_unit(match[2])
             weight_str = str(number)+str(unit)
             flag = False
             return weight_str, True  # 返回找到的第一个重量信息和成功标志
@@ -84,4 +90,107 @@ def extract_purity_from_data(text):
             flag = False
             return purity, True  # 返回所有提取到的纯度信息和成功标志
     
-    return "", False  # 如果没有找到任何纯度信息，返回空字符串和失败标志
\ No newline at end of file
+    return "", False  # 如果没有找到任何纯度信息，返回空字符串和失败标志
+
+def is_valid_cas(cas_number):
+    """检查 CAS 号的校验位（最后一位 = 其余各位数字从右往左依次乘 1、2、3… 之和除以 10 的余数）"""
+    digits = cas_number.replace('-', '')
+    total = sum(int(digit) * weight for weight, digit in enumerate(reversed(digits[:-1]), start=1))
+    return total % 10 == int(digits[-1])
+
+
+# 按位置提取时各字段的关键字（锚点）和值的正则表达式
+FIELD_ANCHORS = {
+    'cas': (r'CAS', r'\b(\d{2,7}-\d{2}-\d)\b'),
+    'lot': (r'批号|批次|次号|LOT', r'\b(?=[A-Za-z0-9]*\d)([A-Za-z0-9]{5,15})\b'),
+    '净含量': (r'净含量|规格|包装|Net|Size', r'(\d+(?:\.\d+)?)\s*(kg|mg|g|lb|oz|ml|l)\b'),
+    '纯度': (r'纯度|(?<!净)含量|Purity|Assay', r'(\d+(?:\.\d+)?)\s*%'),
+    '有效期': (r'有效期|失效日期|Expiry|Exp\.?\s*Date|Use\s*by|Retest', r'(\d{4}\s*[-/.年]\s*\d{1,2}(?:\s*[-/.月]\s*\d{1,2})?)'),
+}
+
+
+def _format_field(field, match):
+    """把值的匹配结果格式化为与纯文本提取一致的形式"""
+    if field == '净含量':
+        return str(float(match.group(1))) + format_unit(match.group(2))
+    if field == '纯度':
+        return f"{match.group(1)}%"
+    if field == '有效期':
+        return re.sub(r'\s+', '', match.group(1))
+    return match.group(1)
+
+
+def compile_anchors(anchors):
+    """把 {字段: (关键字正则, 值正则)} 预编译为正则对象"""
+    return {field: (re.compile(anchor, re.IGNORECASE), re.compile(value, re.IGNORECASE))
+            for field, (anchor, value) in anchors.items()}
+
+
+COMPILED_FIELD_ANCHORS = compile_anchors(FIELD_ANCHORS)
+
+
+def find_anchored_fields(layout, anchors):
+    """
+    按关键字位置提取字段：只在关键字之后、同一行右侧和正下方的文本中查找值。
+    :param anchors: compile_anchors 的结果
+    """
+    fields = {}
+    for field, (anchor_regex, value_regex) in anchors.items():
+        for anchor in layout.find(anchor_regex):
+            remainder = anchor.text[anchor_regex.search(anchor.text).end():]
+            candidates = [remainder] + [box.text for box in layout.right_of(anchor)[:2]] \
+                + [box.text for box in layout.below(anchor)[:1]]
+            for candidate in candidates:
+                match = value_regex.search(candidate)
+                if match:
+                    fields[field] = _format_field(field, match)
+                    break
+            if field in fields:
+                break
+    return fields
+
+
+def extract_fields_from_layout(layout):
+    """
+    按文本框位置提取字段：先找到关键字所在的文本框，只在关键字之后、
+    同一行右侧和正下方的文本中查找值，避免把别处的数字误认为该字段。
+    没有找到关键字的字段再对整段文本做一次普通匹配。
+    """
+    fields = find_anchored_fields(layout, COMPILED_FIELD_ANCHORS)
+
+    if len(fields) < len(FIELD_ANCHORS):
+        text = layout.to_text()
+        for field, value in extract_fields(text).items():
+            fields.setdefault(field, value)
+        if 'cas' not in fields:
+            # 没有 CAS 关键字时，只接受校验位正确的 CAS 号
+            for match in re.finditer(FIELD_ANCHORS['cas'][1], text):
+                if is_valid_cas(match.group(1)):
+                    fields['cas'] = match.group(1)
+                    break
+    return fields
+
+
+def extract_fields(data):
+    """
+    从 OCR 结果中提取录入表格需要的字段。
+    :param data: OCR 服务返回的 data 字段：纯文本，或带位置的文本框列表（"data.format": "dict"）
+    返回: 只包含识别成功字段的字典，键为表格参数名
+    """
+    if isinstance(data, list):
+        return extract_fields_from_layout(TextLayout.from_umi(data))
+    text = data
+    fields = {}
+    cas_number, cas_success = extract_cas_number(text)
+    if cas_success:
+        fields['cas'] = cas_number
+    lot_number, lot_success = extract_lot_number_from_data(text)
+    if lot_success:
+        fields['lot'] = lot_number
+    weight, weight_success = extract_weight_from_data(text)
+    if weight_success:
+        fields['净含量'] = weight
+    purity, purity_success = extract_purity_from_data(text)
+    if purity_success:
+        fields['纯度'] = purity
+    return fields
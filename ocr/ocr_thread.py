@@ -1,83 +1,94 @@
 from PyQt5.QtCore import QThread, pyqtSignal
-import cv2
-import requests
-import json
-import base64
-import time
+import queue
+import threading
+from ocr.ocr_client import encode_image
+from ocr.ocr_dispatcher import OCRDispatcher
+from metrics import counter
+
+
+OCR_FRAMES_DROPPED = counter('ocr_frames_dropped_total', '识别队列已满时丢弃的图像数')
+OCR_STALE_RESULTS = counter('ocr_stale_results_total', '已有更新图像的结果而丢弃的过时识别结果数')
 
 
 class OCRThread(QThread):
+    """
+    前台识别线程：把待识别的图像交给 OCRDispatcher 并发识别。
+    识别进行中再次提交的图像进入队列而不是被丢弃；
+    结果乱序返回时只采用最新提交的图像的结果。
+    """
     ocr_result_signal = pyqtSignal(dict)  # 发送OCR识别结果
     error_signal = pyqtSignal(str)  # 发送错误信息
     
-    def __init__(self):
+    def __init__(self, dispatcher=None, max_queued=4):
+        """
+        :param dispatcher: 共享的 OCRDispatcher，不提供时新建一个
+        :param max_queued: 最多排队的图像数，超出时丢弃最早的一张
+        """
         super().__init__()
-        self.image_data = None
+        self.owns_dispatcher = dispatcher is None
+        self.dispatcher = dispatcher if dispatcher is not None else OCRDispatcher()
+        self.images = queue.Queue(maxsize=max_queued)
         self.running = True
-        self.condition = True  # 用于控制线程挂起
-        self.timeout = 5  # 设置3秒超时
+        self.submitted = 0  # 已提交的序号
+        self.delivered = 0  # 已发出结果的最大序号
+        self.delivered_lock = threading.Lock()  # 调度器的多个线程同时返回结果时，检查和更新 delivered 不能交错
         
     def run(self):
         """线程主循环"""
         while self.running:
-            if self.condition:
-                # 如果没有图像数据，挂起线程
-                time.sleep(0.1)  # 使用time.sleep替代msleep
+            try:
+                image = self.images.get(timeout=0.1)
+            except queue.Empty:
                 continue
-                
-            if self.image_data is not None:
-                try:
-                    # 调用OCR服务
-                    result = self.call_ocr_service(self.image_data)
-                    if result is not None:  # 只有在成功获取结果时才发送信号
-                        self.ocr_result_signal.emit(result)
-                except Exception as e:
-                    print(f"OCR识别错误: {str(e)}")
-                finally:
-                    # 重置状态，等待下一次识别
-                    self.image_data = None
-                    self.condition = True
+            try:
+                jpeg_bytes = encode_image(image)
+            except Exception as e:
+                self.error_signal.emit(f"OCR处理错误: {str(e)}")
+                continue
+            self.submitted += 1
+            sequence = self.submitted
+            future = self.dispatcher.submit(jpeg_bytes)
+            future.add_done_callback(lambda f, sequence=sequence: self._handle_done(sequence, f))
                     
     def process_image(self, image):
         """处理新的图像数据"""
-        self.image_data = image
-        self.condition = False  # 唤醒线程进行识别
-        
-    def call_ocr_service(self, image):
-        """调用OCR服务"""
-        try:
-            # 将OpenCV图像转换为base64
-            _, buffer = cv2.imencode('.jpg', image)
-            base64_string = base64.b64encode(buffer).decode('utf-8')
-            
-            # 准备请求数据
-            url = "http://8.155.50.231:80/api/ocr"  # 使用Windows的IP地址
-            data = {
-                "base64": base64_string,
-                "options": {
-                    "data.format": "text",
-                }
-            }
-            headers = {"Content-Type": "application/json"}
-            
+        while True:
             try:
-                # 发送请求，设置超时
-                response = requests.post(url, data=json.dumps(data), headers=headers, timeout=self.timeout)
-                response.raise_for_status()
-            
-                # 返回识别结果
-                return json.loads(response.text)
-            except requests.exceptions.Timeout:
-                self.error_signal.emit("OCR服务响应超时，请检查服务是否正常运行")
-                return None
-            except requests.exceptions.ConnectionError:
-                self.error_signal.emit("无法连接到OCR服务，请检查服务是否已启动")
-                return None
+                self.images.put_nowait(image)
+                return
+            except queue.Full:
+                # 队列满时丢弃最早的图像，保留最新的
+                try:
+                    self.images.get_nowait()
+                    OCR_FRAMES_DROPPED.inc()
+                except queue.Empty:
+                    pass
+
+    def _handle_done(self, sequence, future):
+        """识别完成（在调度器的线程中调用）"""
+        import requests  # 延迟导入，启动时不加载
+        result, error = None, None
+        try:
+            result = future.result()
+        except requests.exceptions.Timeout:
+            error = "OCR服务响应超时，请检查服务是否正常运行"
+        except requests.exceptions.ConnectionError:
+            error = "无法连接到OCR服务，请检查服务是否已启动"
         except Exception as e:
-            self.error_signal.emit(f"OCR处理错误: {str(e)}")
-            return None
+            error = f"OCR处理错误: {str(e)}"
+        with self.delivered_lock:
+            if not self.running or sequence <= self.delivered:
+                OCR_STALE_RESULTS.inc()
+                return  # 已有更新的图像的结果，丢弃过时结果
+            if error is not None:
+                self.error_signal.emit(error)
+                return
+            self.delivered = sequence
+            self.ocr_result_signal.emit(result)
         
     def stop(self):
         """停止线程"""
         self.running = False
-        self.wait()  # 等待线程结束 
\ No newline at end of file
+        self.wait()  # 等待线程结束
+        if self.owns_dispatcher:
+            self.dispatcher.shutdown()
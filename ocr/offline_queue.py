@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from PyQt5.QtCore import QThread, pyqtSignal
+from ocr.ocr_client import post_ocr
+
+
+# 任务状态
+PENDING = 'pending'  # 等待识别
+RECOGNIZED = 'recognized'  # 已识别，等待写回 records
+RECONCILED = 'reconciled'  # 已写回
+FAILED = 'failed'  # 服务返回错误且超过重试次数
+
+
+class OfflineQueue:
+    """
+    离线识别任务队列，保存在 SQLite 中，断电重启后不会丢失。
+    网络不可用时暂存标签图像，网络恢复后由 OfflineDrainThread 依次识别。
+    """
+
+    def __init__(self, db_path='/home/qhyoo/pycode/qt_code/data/offline_queue.db', max_attempts=5):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # 主线程入队、后台线程出队，共用一个连接并加锁
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.max_attempts = max_attempts
+        self.wakeup = threading.Event()  # 有新任务时唤醒后台线程
+        self.online = True  # 是否能连接到OCR服务，由 OfflineDrainThread 更新
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_jobs (
+                    任务_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    创建时间 TIMESTAMP,
+                    状态 TEXT,
+                    图像 BLOB,
+                    产品_id INTEGER,
+                    仓库_id INTEGER,
+                    尝试次数 INTEGER DEFAULT 0,
+                    结果 TEXT,
+                    错误 TEXT
+                );
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_jobs_状态 ON ocr_jobs (状态, 任务_id);")
+            self.conn.commit()
+
+    def enqueue(self, jpeg_bytes, product_id, warehouse_id):
+        """
+        暂存一张标签图像，返回任务ID。
+        只在队列原本为空且网络可用时唤醒后台线程：队列不为空时后台线程会依次取到新任务，
+        网络断开时不打断退避等待，避免每录入一瓶就请求一次不可用的服务。
+        """
+        with self.lock:
+            was_empty = self.conn.execute(
+                "SELECT 1 FROM ocr_jobs WHERE 状态 = ? LIMIT 1;", (PENDING,)).fetchone() is None
+            cursor = self.conn.execute(
+                "INSERT INTO ocr_jobs (创建时间, 状态, 图像, 产品_id, 仓库_id) VALUES (?, ?, ?, ?, ?);",
+                (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), PENDING, jpeg_bytes, product_id, warehouse_id))
+            self.conn.commit()
+        if was_empty and self.online:
+            self.wakeup.set()
+        return cursor.lastrowid
+
+    def next_pending(self):
+        """取最早的一个待识别任务: (任务_id, 图像, 产品_id, 仓库_id)，没有时返回 None"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 任务_id, 图像, 产品_id, 仓库_id FROM ocr_jobs WHERE 状态 = ? ORDER BY 任务_id LIMIT 1;",
+                (PENDING,)).fetchone()
+
+    def mark_recognized(self, job_id, result):
+        """保存识别结果，图像不再需要，随即清除"""
+        with self.lock:
+            self.conn.execute("UPDATE ocr_jobs SET 状态 = ?, 结果 = ?, 图像 = NULL WHERE 任务_id = ?;",
+                              (RECOGNIZED, json.dumps(result, ensure_ascii=False), job_id))
+            self.conn.commit()
+
+    def mark_error(self, job_id, error):
+        """记录服务端错误，超过最大尝试次数后不再重试"""
+        with self.lock:
+            self.conn.execute("UPDATE ocr_jobs SET 尝试次数 = 尝试次数 + 1, 错误 = ? WHERE 任务_id = ?;",
+                              (error, job_id))
+            self.conn.execute("UPDATE ocr_jobs SET 状态 = ? WHERE 任务_id = ? AND 尝试次数 >= ?;",
+                              (FAILED, job_id, self.max_attempts))
+            self.conn.commit()
+
+    def mark_reconciled(self, job_id):
+        """识别结果已写回 records"""
+        with self.lock:
+            self.conn.execute("UPDATE ocr_jobs SET 状态 = ? WHERE 任务_id = ?;", (RECONCILED, job_id))
+            self.conn.commit()
+
+    def unreconciled(self):
+        """已识别但还没有写回的任务: [(任务_id, 产品_id, 仓库_id, 结果字典), ...]"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT 任务_id, 产品_id, 仓库_id, 结果 FROM ocr_jobs WHERE 状态 = ? ORDER BY 任务_id;",
+                (RECOGNIZED,)).fetchall()
+        return [(job_id, product_id, warehouse_id, json.loads(result))
+                for job_id, product_id, warehouse_id, result in rows]
+
+    def pending_count(self):
+        """等待识别的任务数"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM ocr_jobs WHERE 状态 = ?;", (PENDING,)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class OfflineDrainThread(QThread):
+    """
+    后台补识别线程：网络恢复后按限速依次识别离线任务。
+    连接失败时按指数退避等待，避免网络中断期间反复请求。
+    """
+    job_recognized = pyqtSignal(int, int, int, dict)  # 任务ID, 产品ID, 仓库ID, 识别结果
+    pending_changed = pyqtSignal(int)  # 剩余待识别任务数
+    online_changed = pyqtSignal(bool)  # 是否能连接到OCR服务
+
+    def __init__(self, offline_queue, min_interval=1.0, timeout=10, max_backoff=60):
+        """
+        :param min_interval: 两次请求的最小间隔（秒），限制网络恢复后的请求速率
+        :param timeout: 单次识别超时（秒）
+        :param max_backoff: 连接失败后最长的等待时间（秒）
+        """
+        super().__init__()
+        self.queue = offline_queue
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.running = True
+        self.online = True
+
+    def set_online(self, online):
+        """更新网络状态（前台识别失败/成功时也会调用）"""
+        if online != self.online:
+            self.online = online
+            self.queue.online = online
+            self.online_changed.emit(online)
+        if online:
+            self.queue.wakeup.set()
+
+    def run(self):
+        import requests  # 在后台线程中导入，不占用启动时间
+        backoff = self.min_interval
+        while self.running:
+            job = self.queue.next_pending()
+            if job is None:
+                # 没有任务时等待新任务入队
+                self.queue.wakeup.wait(5)
+                self.queue.wakeup.clear()
+                continue
+
+            job_id, jpeg_bytes, product_id, warehouse_id = job
+            try:
+                result = post_ocr(jpeg_bytes, self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.set_online(False)
+                self.queue.wakeup.wait(backoff)
+                self.queue.wakeup.clear()
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            except Exception as e:
+                # 服务端错误：记录并稍后重试，超过次数后放弃
+                self.queue.mark_error(job_id, str(e))
+            else:
+                self.set_online(True)
+                backoff = self.min_interval
+                self.queue.mark_recognized(job_id, result)
+                self.job_recognized.emit(job_id, product_id, warehouse_id, result)
+            self.pending_changed.emit(self.queue.pending_count())
+            time.sleep(self.min_interval)
+
+    def stop(self):
+        """停止线程"""
+        self.running = False
+        self.queue.wakeup.set()
+        self.wait()
@@ -0,0 +1,237 @@
+import json
+import os
+import re
+from ocr.ocr_result import (FIELD_ANCHORS, compile_anchors, find_anchored_fields, extract_fields,
+                            extract_fields_from_layout, format_unit)
+from ocr.text_layout import TextLayout
+from applog import get_logger
+
+
+log = get_logger('ocr')
+
+
+# 常见供应商的标签格式：识别关键字和各字段的关键字（锚点）
+BUILTIN_PROFILES = [
+    {
+        'name': 'Sigma-Aldrich',
+        'keywords': [r'Sigma[- ]?Aldrich', r'\bSIGMA\b', r'Merck'],
+        'anchors': {'lot': r'Lot\s*(No|#)?', 'cas': r'CAS\s*(No|#)?', '纯度': r'Assay|Purity', '净含量': r'Size|Pack'},
+    },
+    {
+        'name': '阿拉丁',
+        'keywords': [r'阿拉丁', r'Aladdin'],
+        'anchors': {'lot': r'批号|Lot', 'cas': r'CAS', '纯度': r'纯度|规格', '净含量': r'包装|净含量'},
+    },
+    {
+        'name': '麦克林',
+        'keywords': [r'麦克林', r'Macklin'],
+        'anchors': {'lot': r'批号|Lot', 'cas': r'CAS', '纯度': r'纯度|含量', '净含量': r'包装|规格'},
+    },
+    {
+        'name': '国药',
+        'keywords': [r'国药', r'Sinopharm', r'沪试'],
+        'anchors': {'lot': r'批号', 'cas': r'CAS', '纯度': r'含量', '净含量': r'净含量|规格'},
+    },
+    {
+        'name': 'TCI',
+        'keywords': [r'\bTCI\b', r'Tokyo Chemical'],
+        'anchors': {'lot': r'Lot', 'cas': r'CAS', '纯度': r'Purity|纯度', '净含量': r'Size|包装'},
+    },
+]
+
+# 可以从操作员修改中学习的字段
+LEARNABLE_FIELDS = ('cas', 'lot', '净含量', '纯度')
+
+
+class SupplierProfile:
+    """某个供应商的标签格式：识别关键字、字段关键字、净含量的默认单位"""
+
+    def __init__(self, name, keywords, anchors=None, default_unit=None, learned=False):
+        self.name = name
+        self.keywords = list(keywords)
+        self.anchors = dict(anchors or {})
+        self.default_unit = default_unit
+        self.learned = learned
+        self.compile()
+
+    def compile(self):
+        """预编译正则表达式；值的格式沿用通用规则，只替换关键字"""
+        self.keyword_regex = re.compile('|'.join(f'(?:{keyword})' for keyword in self.keywords), re.IGNORECASE)
+        self.compiled_anchors = compile_anchors(
+            {field: (self.anchors[field], FIELD_ANCHORS[field][1]) for field in self.anchors if field in FIELD_ANCHORS})
+        self.bare_number = re.compile(r'(\d+(?:\.\d+)?)\s*$')
+
+    def extract(self, layout):
+        """按本供应商的关键字提取字段，没有找到的字段由通用规则补充"""
+        fields = find_anchored_fields(layout, self.compiled_anchors)
+        if '净含量' not in fields and self.default_unit and '净含量' in self.compiled_anchors:
+            # 有的供应商在关键字里写单位（如 "Size (g)"），值只有数字
+            anchor_regex = self.compiled_anchors['净含量'][0]
+            for anchor in layout.find(anchor_regex):
+                for box in layout.right_of(anchor)[:1]:
+                    match = self.bare_number.search(box.text)
+                    if match:
+                        fields['净含量'] = str(float(match.group(1))) + self.default_unit
+                if '净含量' in fields:
+                    break
+        for field, value in extract_fields_from_layout(layout).items():
+            fields.setdefault(field, value)
+        return fields
+
+    def to_dict(self):
+        return {'name': self.name, 'keywords': self.keywords, 'anchors': self.anchors,
+                'default_unit': self.default_unit, 'learned': self.learned}
+
+
+class ProfileStore:
+    """
+    供应商格式库：内置常见供应商，另保存从操作员修改中学到的格式。
+    识别出供应商时按其格式提取，否则走通用的提取规则。
+    """
+
+    def __init__(self, path=os.path.expanduser('~/.chemical_manager_profiles.json')):
+        self.path = path
+        self.profiles = {profile['name']: SupplierProfile(**profile) for profile in BUILTIN_PROFILES}
+        self.load()
+
+    def load(self):
+        """读取学到的格式（覆盖同名的内置格式）"""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    for profile in json.load(f):
+                        self.profiles[profile['name']] = SupplierProfile(**profile)
+        except Exception as e:
+            log.warning("读取供应商格式失败: %s", e)
+
+    def save(self):
+        learned = [profile.to_dict() for profile in self.profiles.values() if profile.learned]
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(learned, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            log.error("保存供应商格式失败: %s", e)
+
+    def recognize(self, layout):
+        """
+        根据标签文字识别供应商。品牌名通常印在标签上部，
+        同时匹配多个供应商时取位置最靠上的。
+        """
+        best = None
+        for profile in self.profiles.values():
+            boxes = layout.find(profile.keyword_regex)
+            if boxes:
+                top = min(box.y0 for box in boxes)
+                if best is None or top < best[0]:
+                    best = (top, profile)
+        return best[1] if best else None
+
+    def extract(self, data):
+        """
+        从 OCR 结果的 data 字段提取字段。
+        :return: (字段字典, 文本框布局或 None, 供应商名称或 None)
+        """
+        if not isinstance(data, list):
+            return extract_fields(data), None, None
+        layout = TextLayout.from_umi(data)
+        profile = self.recognize(layout)
+        if profile is None:
+            return extract_fields_from_layout(layout), layout, None
+        fields = profile.extract(layout)
+        fields['供应商'] = profile.name
+        return fields, layout, profile.name
+
+    def learn(self, supplier, layout, corrected):
+        """
+        从操作员修改中学习：找到修改后的值在标签上所在的文本框，
+        把它左侧（或上方）最近的文字记为该字段的关键字。
+        :param supplier: 供应商名称（识别结果或操作员填写）
+        :param corrected: {字段: 修改后的值}
+        :return: 学到关键字的字段列表
+        """
+        if not supplier or layout is None:
+            return []
+        learned = {}
+        default_unit = None
+        for field, value in corrected.items():
+            if field not in LEARNABLE_FIELDS:
+                continue
+            box, prefix, number_only = self._value_box(layout, value)
+            if box is None:
+                continue
+            anchor = self._anchor_for(layout, box, prefix)
+            if anchor:
+                learned[field] = anchor
+                unit = re.search(r'(kg|mg|g|lb|oz|ml|l)$', str(value), re.IGNORECASE)
+                if field == '净含量' and number_only and unit:
+                    # 标签上只有数字，单位写在关键字里
+                    default_unit = format_unit(unit.group(1))
+        if not learned:
+            return []
+
+        profile = self.profiles.get(supplier)
+        if profile is None:
+            # 新供应商：以名称作为识别关键字，名称不在标签上时用最上方的文字
+            keyword = re.escape(supplier)
+            if not layout.find(keyword) and layout.boxes:
+                keyword = re.escape(min(layout.boxes, key=lambda box: box.y0).text.strip())
+            profile = SupplierProfile(supplier, [keyword])
+        for field, anchor in learned.items():
+            existing = profile.anchors.get(field)
+            if existing and anchor not in existing.split('|'):
+                anchor = f'{anchor}|{existing}'
+            elif existing:
+                anchor = existing
+            profile.anchors[field] = anchor
+        if default_unit:
+            profile.default_unit = default_unit
+        profile.learned = True
+        profile.compile()
+        self.profiles[supplier] = profile
+        self.save()
+        return list(learned)
+
+    @staticmethod
+    def _value_box(layout, value):
+        """
+        找到值所在的文本框，返回 (文本框, 值在框内之前的文字, 是否只匹配到数字)。
+        数字按数值比较，"500 g" 与修改后的 "500.0g" 视为同一个值。
+        """
+        text_value = re.sub(r'\s+', '', str(value)).lower()
+        numbers = re.findall(r'\d+(?:\.\d+)?', text_value)
+        for box in layout.boxes:
+            text = box.text.lower()
+            if text_value in re.sub(r'\s+', '', text):
+                position = text.find(str(value).lower())
+                prefix = box.text[:position] if position > 0 else ''
+                return box, prefix, False
+        if numbers:
+            target = float(numbers[0])
+            for box in layout.boxes:
+                for match in re.finditer(r'\d+(?:\.\d+)?', box.text):
+                    if float(match.group()) == target and len(numbers[0]) >= 2:
+                        return box, box.text[:match.start()], True
+        return None, '', False
+
+    @staticmethod
+    def _anchor_for(layout, box, prefix):
+        """值的关键字：同一文本框中值前面的文字，或左侧/上方最近的文本框"""
+        prefix = prefix.strip(' :：#.')
+        if len(prefix) >= 2:
+            return re.escape(prefix)
+        # 优先取同一行左侧的文字，其次取正上方的文字
+        left = [other for other in layout.boxes if other is not box
+                and abs(other.cy - box.cy) < box.height * 0.6 and other.x1 <= box.x0 + box.height]
+        above = [other for other in layout.boxes if other is not box
+                 and other.y1 <= box.y0 and box.y0 - other.y1 < box.height * 2
+                 and other.x0 < box.x1 and other.x1 > box.x0]
+        if left:
+            nearest = max(left, key=lambda other: other.x1)
+        elif above:
+            nearest = max(above, key=lambda other: other.y1)
+        else:
+            return None
+        keyword = nearest.text.strip(' :：#.')
+        if not keyword or re.fullmatch(r'[\d.\s%-]+', keyword):
+            return None
+        return re.escape(keyword)
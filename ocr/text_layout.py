@@ -0,0 +1,99 @@
+import re
+from collections import defaultdict
+
+
+class TextBox:
+    """OCR识别出的一个文本框（轴对齐外接矩形）"""
+    __slots__ = ('text', 'x0', 'y0', 'x1', 'y1', 'score')
+
+    def __init__(self, text, x0, y0, x1, y1, score=1.0):
+        self.text = text
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+        self.score = score
+
+    @classmethod
+    def from_umi(cls, item):
+        """由 Umi-OCR "data.format": "dict" 输出的一项构造：{'text', 'box': [[x, y] * 4], 'score'}"""
+        xs = [point[0] for point in item['box']]
+        ys = [point[1] for point in item['box']]
+        return cls(item['text'], min(xs), min(ys), max(xs), max(ys), item.get('score', 1.0))
+
+    @property
+    def cx(self):
+        return (self.x0 + self.x1) / 2
+
+    @property
+    def cy(self):
+        return (self.y0 + self.y1) / 2
+
+    @property
+    def height(self):
+        return max(1, self.y1 - self.y0)
+
+    def __repr__(self):
+        return f"TextBox({self.text!r}, {self.x0}, {self.y0}, {self.x1}, {self.y1})"
+
+
+class TextLayout:
+    """
+    文本框的空间索引：按文本框中心划分网格，查找某个关键字右侧或下方的文本
+    时只检查附近的网格，而不是扫描整张标签。
+    """
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+        heights = sorted(box.height for box in boxes)
+        self.line_height = heights[len(heights) // 2] if heights else 1
+        self.cell = self.line_height * 2
+        self.grid = defaultdict(list)
+        for box in boxes:
+            self.grid[self._cell_of(box.cx, box.cy)].append(box)
+
+    @classmethod
+    def from_umi(cls, data):
+        return cls([TextBox.from_umi(item) for item in data if item.get('text')])
+
+    def _cell_of(self, x, y):
+        return int(x // self.cell), int(y // self.cell)
+
+    def _boxes_in(self, x0, y0, x1, y1):
+        """中心落在矩形范围内的文本框"""
+        cx0, cy0 = self._cell_of(x0, y0)
+        cx1, cy1 = self._cell_of(x1, y1)
+        for gx in range(cx0, cx1 + 1):
+            for gy in range(cy0, cy1 + 1):
+                for box in self.grid.get((gx, gy), ()):
+                    if x0 <= box.cx <= x1 and y0 <= box.cy <= y1:
+                        yield box
+
+    def find(self, pattern):
+        """文本匹配正则表达式（字符串或已编译的正则）的文本框（关键字锚点）"""
+        regex = re.compile(pattern, re.IGNORECASE) if isinstance(pattern, str) else pattern
+        return [box for box in self.boxes if regex.search(box.text)]
+
+    def right_of(self, anchor, max_distance=None):
+        """与锚点在同一行、位于其右侧的文本框，按距离由近到远"""
+        if max_distance is None:
+            max_distance = anchor.height * 15
+        half = anchor.height * 0.6
+        boxes = [box for box in self._boxes_in(anchor.x1 - anchor.height, anchor.cy - half,
+                                               anchor.x1 + max_distance, anchor.cy + half)
+                 if box is not anchor and box.x0 >= anchor.cx]
+        return sorted(boxes, key=lambda box: box.x0)
+
+    def below(self, anchor):
+        """紧挨在锚点下方、水平方向有重叠的文本框（关键字和值上下排列的标签）"""
+        boxes = [box for box in self._boxes_in(anchor.x0 - anchor.height, anchor.y1,
+                                               anchor.x1 + anchor.height * 4, anchor.y1 + anchor.height * 2)
+                 if box is not anchor and box.x0 < anchor.x1 and box.x1 > anchor.x0]
+        return sorted(boxes, key=lambda box: box.y0)
+
+    def to_text(self):
+        """按阅读顺序（从上到下、从左到右）拼接为纯文本，用于没有关键字时的整体匹配"""
+        lines = []
+        for box in sorted(self.boxes, key=lambda box: box.cy):
+            if lines and abs(lines[-1][0].cy - box.cy) < self.line_height * 0.5:
+                lines[-1].append(box)
+            else:
+                lines.append([box])
+        return '\n'.join(' '.join(box.text for box in sorted(line, key=lambda box: box.x0)) for line in lines)
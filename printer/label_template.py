@@ -0,0 +1,159 @@
+import struct
+import time
+
+
+# EM20L 标签指令
+LABEL_BEGIN = b"\x1A\x5B\x01"  # 设置打印范围（标签开始）
+LABEL_END = b"\x1A\x5D\x00"  # 标签打印结束
+LABEL_PRINT = b"\x1A\x4F\x00"  # 将内容打印到纸上
+QR_BEGIN = b"\x1A\x31\x00"  # 二维码
+TEXT_BEGIN = b"\x1A\x54\x01"  # 文本
+FIELD_END = b"\x00"  # 可变内容以 0x00 结束
+
+
+class QRBlock:
+    """二维码块"""
+
+    def __init__(self, field, x, y, size=4, version=1, error_correction=4, rotation=0, max_length=64):
+        """
+        :param field: 填入二维码的字段名
+        :param x, y: 打印位置（点）
+        :param size: 二维码大小 [1-7]
+        :param version: 二维码版本 [0-20]
+        :param error_correction: 纠错等级 [1-4]
+        :param rotation: 旋转角度 [0-3]
+        :param max_length: 字段最大字节数
+        """
+        self.field = field
+        self.max_length = max_length
+        self.header = QR_BEGIN + bytes([version, error_correction]) + struct.pack('<HH', x, y) + bytes([size, rotation])
+
+
+class TextLine:
+    """一行文字"""
+
+    def __init__(self, field, x, y, font=0x11, max_length=32):
+        """
+        :param field: 打印的字段名
+        :param x, y: 打印位置（点）
+        :param font: 文字大小 [0x11, 0x22, 0x33, 0x44, 0x55, 0x66]
+        :param max_length: 字段最大字节数
+        """
+        self.field = field
+        self.max_length = max_length
+        self.header = TEXT_BEGIN + struct.pack('<HH', x, y) + b"\x00\x60\x00" + bytes([font])
+
+
+class LabelTemplate:
+    """
+    标签模板：布局只声明一次，编译成固定字节片段和可变字段槽位，
+    渲染一张标签只需要编码字段并拼接字节。
+    """
+
+    def __init__(self, name, width, height, elements, encoding='utf-8'):
+        """
+        :param name: 模板名称
+        :param width, height: 打印范围（点）
+        :param elements: QRBlock / TextLine 列表
+        """
+        self.name = name
+        self.width = width
+        self.height = height
+        self.elements = elements
+        self.encoding = encoding
+        self.max_lengths = {}
+        self.segments = self._compile()
+
+    def _compile(self):
+        """编译为 [固定字节, 字段名, 固定字节, 字段名, ..., 固定字节]"""
+        segments = []
+        # 起始位置 X/Y、宽、高，最后一个字节为旋转方向
+        static = LABEL_BEGIN + struct.pack('<HHHHB', 0, 0, self.width, self.height, 0)
+        for element in self.elements:
+            segments.append(static + element.header)
+            segments.append(element.field)
+            static = FIELD_END
+            # 同一字段出现在多个位置时取最小的长度限制
+            limit = self.max_lengths.get(element.field, element.max_length)
+            self.max_lengths[element.field] = min(limit, element.max_length)
+        segments.append(static + LABEL_END + LABEL_PRINT)
+        return segments
+
+    @property
+    def fields(self):
+        """模板用到的字段名"""
+        return list(self.max_lengths)
+
+    def encode_fields(self, **fields):
+        """编码并校验字段，返回 {字段名: bytes}"""
+        encoded = {}
+        for field, limit in self.max_lengths.items():
+            if field not in fields:
+                raise ValueError(f"标签模板 {self.name} 缺少字段: {field}")
+            data = str(fields[field]).encode(self.encoding)
+            if len(data) > limit:
+                raise ValueError(f"字段 {field} 超长: {len(data)} > {limit} 字节")
+            if FIELD_END in data:
+                raise ValueError(f"字段 {field} 不能包含 0x00")
+            encoded[field] = data
+        return encoded
+
+    def render(self, **fields):
+        """渲染一张标签，返回可以直接发送给打印机的字节流"""
+        encoded = self.encode_fields(**fields)
+        segments = self.segments
+        parts = segments[:]
+        for i in range(1, len(segments), 2):
+            parts[i] = encoded[segments[i]]
+        return b"".join(parts)
+
+
+# 48x21mm 标签（原有布局）：左侧二维码，右侧两行文字
+LABEL_48x21 = LabelTemplate('48x21', 384, 170, [
+    QRBlock('code', 21, 21, size=4),
+    TextLine('code', 128, 32),
+    TextLine('position', 128, 64),
+])
+
+# 40x30mm 标签：更大的二维码和文字
+LABEL_40x30 = LabelTemplate('40x30', 320, 240, [
+    QRBlock('code', 16, 40, size=5),
+    TextLine('code', 176, 64, font=0x22, max_length=16),
+    TextLine('position', 176, 128, font=0x22, max_length=16),
+])
+
+LABEL_TEMPLATES = {template.name: template for template in (LABEL_48x21, LABEL_40x30)}
+DEFAULT_TEMPLATE = LABEL_48x21
+
+
+def benchmark_render(template=DEFAULT_TEMPLATE, count=10000):
+    """测量渲染一张标签的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for i in range(count):
+        template.render(code=f"1:{i}", position="A-03")
+    return (time.perf_counter() - start) / count * 1e6
+
+
+if __name__ == "__main__":
+    # 与原先手写十六进制指令生成的字节流逐字节比对
+    GOLDEN = [
+        ({'code': '1:12', 'position': 'A-3'},
+         "1a5b01000000008001aa00001a31000104150015000400313a3132001a5401800020000060001131"
+         "3a3132001a54018000400000600011412d33001a5d001a4f00"),
+        ({'code': '123:4567890', 'position': '未知位置'},
+         "1a5b01000000008001aa00001a310001041500150004003132333a34353637383930001a54018000"
+         "2000006000113132333a34353637383930001a54018000400000600011e69caae79fa5e4bd8de7bd"
+         "ae001a5d001a4f00"),
+    ]
+    import sys
+
+    mismatched = 0
+    for fields, expected in GOLDEN:
+        result = DEFAULT_TEMPLATE.render(**fields).hex()
+        if result != expected:
+            mismatched += 1
+        print(f"{fields}: {'一致' if result == expected else '不一致'}")
+    for name, template in LABEL_TEMPLATES.items():
+        print(f"{name}: 渲染一张标签 {benchmark_render(template):.2f} us")
+    if mismatched:
+        sys.exit(1)
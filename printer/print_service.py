@@ -0,0 +1,187 @@
+import itertools
+import queue
+import threading
+import time
+import serial
+from PyQt5.QtCore import QObject, pyqtSignal
+from printer.printerQR import encode_label
+from printer.label_template import DEFAULT_TEMPLATE
+from metrics import counter, histogram
+
+
+# 打印机状态
+STATUS_READY = 'ready'
+STATUS_PAPER_OUT = 'paper_out'
+STATUS_OFFLINE = 'offline'
+STATUS_UNKNOWN = 'unknown'  # 打印机没有应答状态查询
+
+STATUS_TEXT = {
+    STATUS_READY: "打印机就绪",
+    STATUS_PAPER_OUT: "打印机缺纸，请装纸",
+    STATUS_OFFLINE: "打印机忙或离线",
+    STATUS_UNKNOWN: "打印机状态未知",
+}
+
+PRINT_JOBS = counter('print_jobs_total', '打印完成的任务数')
+PRINT_FAILURES = counter('print_failures_total', '重试后仍失败的打印任务数')
+PRINT_JOB_SECONDS = histogram('print_job_seconds', '一个打印任务从开始发送到发送完成的耗时')
+
+
+class PrintJob:
+    """一个打印任务，数据在提交时已编码为字节流"""
+
+    def __init__(self, job_id, data, description, copies=1):
+        self.job_id = job_id
+        self.data = data
+        self.description = description
+        self.copies = copies
+        self.attempts = 0
+
+
+class PrinterService(QObject):
+    """
+    打印服务：保持与打印机的串口连接，在后台线程中按队列顺序打印，不阻塞界面。
+    每个任务打印前查询打印机状态，缺纸或忙时暂停队列，恢复后继续打印。
+    """
+    job_finished = pyqtSignal(int, str)  # 任务ID, 描述
+    job_failed = pyqtSignal(int, str)  # 任务ID, 错误信息
+    status_changed = pyqtSignal(str)  # 打印机状态
+
+    def __init__(self, port='/dev/ttyAMA0', baudrate=9600, template=DEFAULT_TEMPLATE, query_status=True, max_attempts=3):
+        """
+        :param template: 标签模板（LabelTemplate）
+        :param query_status: 打印前是否查询打印机状态（打印机不支持时自动忽略）
+        :param max_attempts: 串口出错时单个任务的最大尝试次数
+        """
+        super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self.template = template
+        self.query_status = query_status
+        self.max_attempts = max_attempts
+        self.ser = None
+        self.jobs = queue.Queue()
+        self.job_ids = itertools.count(1)
+        self.running = False
+        self.thread = None
+        self.status = None
+        self.retry_interval = 2.0  # 缺纸、离线或串口错误后的重试间隔（秒）
+
+    def start(self):
+        """启动后台打印线程"""
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._worker, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """停止打印线程并关闭串口（队列中未打印的任务被丢弃）"""
+        if self.running:
+            self.running = False
+            self.jobs.put(None)  # 唤醒等待中的线程
+            if self.thread is not None:
+                self.thread.join(timeout=2)
+                self.thread = None
+        self._close()
+
+    def pending_count(self):
+        """队列中等待打印的任务数"""
+        return self.jobs.qsize()
+
+    def submit(self, content, content1, copies=1):
+        """
+        提交一张标签的打印任务，立即返回任务ID。字段超长时抛出 ValueError。
+        :param content: 二维码内容
+        :param content1: 第二行文字
+        :param copies: 打印份数
+        """
+        job = PrintJob(next(self.job_ids), encode_label(content, content1, self.template), content, copies)
+        self.jobs.put(job)
+        return job.job_id
+
+    def submit_batch(self, labels, copies=1):
+        """
+        批量提交标签，所有标签合并为一个任务连续发送。
+        :param labels: [(content, content1), ...]
+        :return: 任务ID，没有标签时返回 None
+        """
+        if not labels:
+            return None
+        data = b"".join(encode_label(content, content1, self.template) for content, content1 in labels)
+        job = PrintJob(next(self.job_ids), data, f"{len(labels)}张标签", copies)
+        self.jobs.put(job)
+        return job.job_id
+
+    def _open(self):
+        if self.ser is None or not self.ser.is_open:
+            self.ser = serial.Serial(self.port, self.baudrate, timeout=0.3, write_timeout=5)
+
+    def _close(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except serial.SerialException:
+                pass
+            self.ser = None
+
+    def _query_status(self):
+        """通过实时状态指令（DLE EOT）查询打印机状态"""
+        if not self.query_status:
+            return STATUS_UNKNOWN
+        self.ser.reset_input_buffer()
+        # DLE EOT 4: 纸传感器状态，bit5/bit6 为缺纸
+        self.ser.write(b"\x10\x04\x04")
+        paper = self.ser.read(1)
+        if not paper:
+            # 打印机不支持状态查询，之后不再查询
+            self.query_status = False
+            return STATUS_UNKNOWN
+        if paper[0] & 0x60:
+            return STATUS_PAPER_OUT
+        # DLE EOT 1: 打印机状态，bit3 为离线（正在打印或出错）
+        self.ser.write(b"\x10\x04\x01")
+        state = self.ser.read(1)
+        if state and state[0] & 0x08:
+            return STATUS_OFFLINE
+        return STATUS_READY
+
+    def _set_status(self, status):
+        if status != self.status:
+            self.status = status
+            self.status_changed.emit(status)
+
+    def _wait_until_ready(self):
+        """缺纸或离线时暂停，直到打印机恢复或服务停止"""
+        while self.running:
+            status = self._query_status()
+            self._set_status(status)
+            if status in (STATUS_READY, STATUS_UNKNOWN):
+                return True
+            time.sleep(self.retry_interval)
+        return False
+
+    def _worker(self):
+        while self.running:
+            job = self.jobs.get()
+            if job is None:
+                break
+            while self.running:
+                try:
+                    self._open()
+                    if not self._wait_until_ready():
+                        break
+                    with PRINT_JOB_SECONDS.time():
+                        for _ in range(job.copies):
+                            self.ser.write(job.data)
+                        self.ser.flush()  # 等待数据全部发出
+                    PRINT_JOBS.inc()
+                    self.job_finished.emit(job.job_id, job.description)
+                    break
+                except (serial.SerialException, OSError) as e:
+                    self._close()
+                    job.attempts += 1
+                    if job.attempts >= self.max_attempts:
+                        PRINT_FAILURES.inc()
+                        self.job_failed.emit(job.job_id, str(e))
+                        break
+                    time.sleep(self.retry_interval)
@@ -0,0 +1,202 @@
+import time
+from collections import namedtuple
+from applog import get_logger
+
+
+log = get_logger('qr')
+
+
+# 应答帧: 02 00 | 状态 | 数据长度 | 数据 | CRC(2字节)
+RESPONSE_HEAD = b'\x02\x00'
+# 扫码数据的结束符（模块开启回车/换行后缀时）
+SCAN_TERMINATORS = b'\r\n'
+
+# kind: 'response' 指令应答 / 'scan' 扫码数据
+# payload: 应答为数据字节，扫码为解码后的字符串
+# raw: 完整原始字节
+# timestamp: 帧首字节到达的时间（time.monotonic）
+# status: 应答状态字节，扫码数据为 None
+GM861Frame = namedtuple('GM861Frame', ['kind', 'payload', 'raw', 'timestamp', 'status'])
+
+
+def crc16_xmodem(data):
+    """GM861 使用的 CRC-CCITT(XMODEM) 校验"""
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
+
+class GM861Parser:
+    """
+    GM861 串口字节流解析器。
+    跨多次读取重组数据帧，按帧头区分指令应答和扫码数据，
+    只在得到完整的帧后才输出。
+    """
+
+    def __init__(self, encoding='gbk', idle_gap=0.02, check_crc=True):
+        """
+        :param encoding: 扫码数据的编码
+        :param idle_gap: 无结束符时，超过该间隔（秒）没有新数据即认为扫码数据结束
+        :param check_crc: 是否校验应答帧的 CRC
+        """
+        self.encoding = encoding
+        self.idle_gap = idle_gap
+        self.check_crc = check_crc
+        self.buffer = bytearray()
+        self.frame_start_time = None
+        self.last_data_time = None
+        self.crc_errors = 0
+        self.decode_errors = 0
+
+    @property
+    def pending(self):
+        """缓冲区中是否还有未完成的数据"""
+        return len(self.buffer) > 0
+
+    def feed(self, data, timestamp=None):
+        """
+        送入一次读取到的字节，返回其中已完整的帧列表。
+        :param data: 本次读取的字节
+        :param timestamp: 字节到达时间，默认取当前时间
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if not data:
+            return []
+        if not self.buffer:
+            self.frame_start_time = timestamp
+        self.buffer += data
+        self.last_data_time = timestamp
+        return self._parse(timestamp)
+
+    def flush(self, now=None, force=False):
+        """
+        数据间隔超过 idle_gap（或 force=True）时，把缓冲区剩余内容作为扫码数据输出。
+        在串口读超时（没有新数据）时调用。
+        """
+        if not self.buffer:
+            return []
+        if now is None:
+            now = time.monotonic()
+        if not force and now - self.last_data_time < self.idle_gap:
+            return []
+        # 不完整的应答帧等待超时后丢弃，避免误当作扫码数据
+        if self.buffer.startswith(RESPONSE_HEAD):
+            self.buffer.clear()
+            return []
+        raw = bytes(self.buffer)
+        self.buffer.clear()
+        frame = self._make_scan_frame(raw, self.frame_start_time)
+        return [frame] if frame else []
+
+    def reset(self):
+        """清空缓冲区"""
+        self.buffer.clear()
+        self.frame_start_time = None
+
+    def _parse(self, timestamp):
+        frames = []
+        while self.buffer:
+            # 跳过扫码数据之间残留的结束符
+            if self.buffer[0] in SCAN_TERMINATORS:
+                del self.buffer[0]
+                continue
+
+            if self.buffer.startswith(RESPONSE_HEAD) or self.buffer == RESPONSE_HEAD[:1]:
+                if len(self.buffer) < 4:
+                    break  # 帧头不完整，等待后续数据
+                length = self.buffer[3]
+                total = 4 + length + 2
+                if len(self.buffer) < total:
+                    break
+                raw = bytes(self.buffer[:total])
+                del self.buffer[:total]
+                frame = self._make_response_frame(raw, self.frame_start_time)
+                if frame:
+                    frames.append(frame)
+                self.frame_start_time = timestamp
+                continue
+
+            # 扫码数据：到结束符或下一个应答帧头为止
+            end = self._find_scan_end()
+            if end is None:
+                break  # 没有结束符，等待更多数据或空闲超时
+            raw = bytes(self.buffer[:end])
+            del self.buffer[:end]
+            frame = self._make_scan_frame(raw, self.frame_start_time)
+            if frame:
+                frames.append(frame)
+            self.frame_start_time = timestamp
+        return frames
+
+    def _find_scan_end(self):
+        ends = [i for i in (self.buffer.find(b'\r'), self.buffer.find(b'\n'),
+                            self.buffer.find(RESPONSE_HEAD, 1)) if i != -1]
+        return min(ends) if ends else None
+
+    def _make_response_frame(self, raw, timestamp):
+        status = raw[2]
+        payload = raw[4:-2]
+        if self.check_crc:
+            crc = crc16_xmodem(raw[2:-2])
+            if raw[-2:] != bytes([crc >> 8, crc & 0xFF]):
+                self.crc_errors += 1
+                log.warning("GM861应答校验失败", raw=raw.hex())
+                return None
+        return GM861Frame('response', payload, raw, timestamp, status)
+
+    def _make_scan_frame(self, raw, timestamp):
+        text = raw.strip()
+        if not text:
+            return None
+        try:
+            payload = text.decode(self.encoding)
+        except UnicodeDecodeError as e:
+            self.decode_errors += 1
+            log.warning("扫码数据解码失败: %s", e, raw=raw.hex())
+            return None
+        return GM861Frame('scan', payload, raw, timestamp, None)
+
+
+def replay(chunks, parser=None):
+    """
+    按顺序把录制的字节块送入解析器，返回全部帧（结尾强制输出剩余数据）。
+    :param chunks: 字节块列表，元素可以是 bytes，或 (到达时间, bytes)
+    """
+    if parser is None:
+        parser = GM861Parser()
+    frames = []
+    timestamp = 0.0
+    for chunk in chunks:
+        if isinstance(chunk, tuple):
+            timestamp, chunk = chunk
+        # 相邻块的时间差超过 idle_gap 时，先输出之前未结束的扫码数据
+        if parser.pending and timestamp - parser.last_data_time >= parser.idle_gap:
+            frames.extend(parser.flush(timestamp))
+        frames.extend(parser.feed(chunk, timestamp))
+    frames.extend(parser.flush(force=True))
+    return frames
+
+
+if __name__ == "__main__":
+    # 回放录制的串口数据，检查解析结果
+    import sys
+    from qr.gm861_corpus import CAPTURED_STREAMS
+
+    failed = 0
+    for name, chunks, expected in CAPTURED_STREAMS:
+        got = [(frame.kind, frame.payload) for frame in replay(chunks)]
+        if got != expected:
+            failed += 1
+            print(f"[失败] {name}: 期望 {expected}, 实际 {got}")
+        else:
+            print(f"[通过] {name}")
+    print(f"共 {len(CAPTURED_STREAMS)} 组, 失败 {failed} 组")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,21 @@
+# GM861 串口录制数据，用于回放检查 qr.gm861 的解析结果
+# 每组: (名称, 读取到的字节块, 期望输出 [(类型, 内容)])
+# 字节块为 (到达时间, bytes) 时，回放会按时间间隔判断无结束符扫码数据的边界
+
+ACK = b'\x02\x00\x00\x01\x00\x33\x31'  # 触发/写标志位指令的成功应答
+
+CAPTURED_STREAMS = [
+    ("触发指令应答", [ACK], [('response', b'\x00')]),
+    ("应答跨两次读取", [b'\x02\x00', b'\x00\x01', b'\x00\x33\x31'], [('response', b'\x00')]),
+    ("应答校验错误", [b'\x02\x00\x00\x01\x00\x00\x00'], []),
+    ("读标志位应答", [b'\x02\x00\x00\x01\xd7\x88\xab'], [('response', b'\xd7')]),
+    ("带回车的二维码", [b'1:12\r'], [('scan', '1:12')]),
+    ("二维码跨多次读取", [b'1:', b'1', b'2\r\n'], [('scan', '1:12')]),
+    ("应答与二维码粘连", [ACK + b'1:12'], [('response', b'\x00'), ('scan', '1:12')]),
+    ("二维码与应答粘连", [b'3:45' + ACK], [('scan', '3:45'), ('response', b'\x00')]),
+    ("两个二维码同一次读取", [b'1:12\r1:13\r'], [('scan', '1:12'), ('scan', '1:13')]),
+    ("无结束符按间隔分帧", [(0.0, b'1:12'), (0.5, b'1:13')], [('scan', '1:12'), ('scan', '1:13')]),
+    ("无结束符间隔内拼接", [(0.0, b'12:'), (0.005, b'3456')], [('scan', '12:3456')]),
+    ("GBK编码内容", ['仓库1:12'.encode('gbk') + b'\r\n'], [('scan', '仓库1:12')]),
+    ("带分号附加数据", [ACK, b'2:7;A1\r'], [('response', b'\x00'), ('scan', '2:7;A1')]),
+]
@@ -1,95 +1,228 @@
 import serial
 import threading
 import time
+import queue
 from PyQt5.QtCore import QObject, pyqtSignal
+from qr.gm861 import GM861Parser
+from metrics import counter, histogram
+from applog import get_logger
+
+
+log = get_logger('qr')
+
+
+QR_SCANS = counter('qr_scans_total', '读头输出的扫码数据帧数')
+QR_SCAN_TO_UI_SECONDS = histogram('qr_scan_to_ui_seconds', '串口收到扫码数据到界面处理完成的延迟')
+
+
+# GM861 标志位地址 0x0000 的 bit1-0 为工作模式
+MODE_MANUAL = 0x00      # 手动模式
+MODE_COMMAND = 0x01     # 命令触发模式
+MODE_CONTINUOUS = 0x02  # 连续模式
+MODE_SENSE = 0x03       # 感应模式
 
 
 class SerialCommunicator(QObject):
     data_received = pyqtSignal(str)  # 定义一个信号
 
-    def __init__(self, port='/dev/ttyACM0', baudrate=115200):
+    def __init__(self, port='/dev/ttyACM0', baudrate=115200, scan_mode='sense'):
+        """
+        :param scan_mode: 'sense' 使用模块感应模式，有码即自动输出，无需轮询；
+                          'trigger' 使用自适应间隔发送触发指令（不支持感应模式时使用）
+        """
         super().__init__()  # 初始化QObject
-        self.ser = serial.Serial(port, baudrate, timeout=1)
+        # 读超时只决定停止线程时的响应速度，读数据本身是阻塞等待，不占用CPU
+        self.ser = serial.Serial(port, baudrate, timeout=0.2)
         self.running = False
         self.read_thread = None
         self.send_thread = None
+        self.stop_event = threading.Event()
+        self.scan_mode = scan_mode
         self.command = bytes([0x7E, 0x00, 0x08, 0x01, 0x00, 0x02, 0x01, 0xAB, 0xCD])
-        self.unwanted_data = b'\x02\x00\x00\x01\x0031'
+        self.parser = GM861Parser()
+        self.responses = queue.Queue(maxsize=8)  # 读线程运行时收到的指令应答
         self.expected_data = "1:12"
         self.last_received_data = ""
         self.received_expected_data = False
 
+        # 自适应触发间隔（秒）：识别到二维码后加快触发，空闲时逐步放慢
+        self.min_trigger_interval = 0.3
+        self.max_trigger_interval = 2.0
+        self.trigger_interval = self.min_trigger_interval
+
+        # 性能统计
+        self.last_received_time = None  # 最近一次收到数据的时间（time.monotonic）
+        self.scan_latencies = []  # 串口收到数据到界面处理完成的延迟（秒）
+        self.read_cpu_time = 0.0
+        self.send_cpu_time = 0.0
+        self.start_time = None
+        self.trigger_count = 0
+
     def start(self):
         """打开串口"""
         if not self.ser.is_open:
             self.ser.open()
-            print(f"串口已打开: {self.ser.name}")
+            log.info("扫码串口已打开", port=self.ser.name)
 
     def stop(self):
         """关闭串口"""
         if self.ser.is_open:
             self.close()
 
+    def send_command(self, command, timeout=0.5):
+        """发送一条指令并等待应答帧，返回应答帧，超时返回 None"""
+        # 清掉之前残留的应答
+        while not self.responses.empty():
+            self.responses.get_nowait()
+        self.ser.write(command)
+        if self.running:
+            # 读线程会把应答帧放入队列
+            try:
+                return self.responses.get(timeout=timeout)
+            except queue.Empty:
+                return None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for frame in self.parser.feed(self.ser.read(max(1, self.ser.in_waiting))):
+                if frame.kind == 'response':
+                    return frame
+        return None
+
+    def read_zone(self, address):
+        """读取模块标志位，返回一个字节的值，失败返回 None"""
+        command = bytes([0x7E, 0x00, 0x07, 0x01, (address >> 8) & 0xFF, address & 0xFF, 0x01, 0xAB, 0xCD])
+        frame = self.send_command(command)
+        if frame is not None and frame.status == 0x00 and len(frame.payload) == 1:
+            return frame.payload[0]
+        return None
+
+    def write_zone(self, address, value):
+        """写模块标志位，返回是否收到成功应答"""
+        command = bytes([0x7E, 0x00, 0x08, 0x01, (address >> 8) & 0xFF, address & 0xFF, value & 0xFF, 0xAB, 0xCD])
+        frame = self.send_command(command)
+        return frame is not None and frame.status == 0x00
+
+    def set_work_mode(self, mode):
+        """设置模块工作模式（只修改 0x0000 的 bit1-0，保留其他配置位）"""
+        current = self.read_zone(0x0000)
+        if current is None:
+            return False
+        if current & 0x03 == mode:
+            return True
+        return self.write_zone(0x0000, (current & 0xFC) | mode)
+
     def send_command_periodically(self):
-        """每隔1秒发送一次指定的十六进制指令"""
+        """按自适应间隔发送触发指令：刚识别到二维码时快速触发，空闲时逐步放慢"""
         while self.running:
             if self.ser.is_open:
                 self.ser.write(self.command)
+                self.trigger_count += 1
                 # print(f"发送指令: {self.command.hex()}")
                 self.received_expected_data = False  # 每次发送指令时重置标志位
-                time.sleep(1)  # 每隔1秒发送一次指令
+            self.send_cpu_time = time.thread_time()
+            # 用事件等待代替 sleep，停止时可以立即退出
+            if self.stop_event.wait(self.trigger_interval):
+                break
+            self.trigger_interval = min(self.trigger_interval * 1.5, self.max_trigger_interval)
 
     def read_from_serial(self):
-        """从串口读取数据并尝试使用GBK解码"""
+        """从串口读取数据，由 GM861Parser 重组成完整的帧后分发"""
+        idle_timeout = self.ser.timeout
         while self.running:
-            if self.ser.in_waiting > 0:
-                try:
-                    # 读取所有可用的数据
-                    data = self.ser.read(self.ser.in_waiting)
-
-                    if self.unwanted_data == data:
-                        print("未识别到预期数据")
-                    else:
-                        decoded_data = data.decode('gbk')
-                        print(f"接收到的数据: {decoded_data.strip()}")
-                        self.last_received_data = decoded_data.strip()
-
-                        # 发出信号
-                        self.data_received.emit(decoded_data.strip())
-
-                except UnicodeDecodeError as e:
-                    # 如果解码失败，则打印错误信息和原始十六进制数据
-                    print(f"解码失败: {e}")
-                    print(f"原始数据（十六进制）: {data.hex()}")
+            # 阻塞读取，线程在内核中等待，不再空转占用CPU
+            data = self.ser.read(max(1, self.ser.in_waiting))
+            if data:
+                frames = self.parser.feed(data)
+            else:
+                frames = self.parser.flush()
+            self.read_cpu_time = time.thread_time()
+
+            for frame in frames:
+                if frame.kind == 'response':
+                    # 指令应答交给 send_command，不再当作扫码数据
+                    try:
+                        self.responses.put_nowait(frame)
+                    except queue.Full:
+                        pass  # 周期触发的应答无人等待，直接丢弃
+                    continue
+                QR_SCANS.inc()
+                log.debug("扫码数据", payload=frame.payload)
+                self.last_received_data = frame.payload
+                self.last_received_time = frame.timestamp
+                # 识别到二维码后恢复最快的触发间隔
+                self.trigger_interval = self.min_trigger_interval
+
+                # 发出信号
+                self.data_received.emit(frame.payload)
+
+            # 有未结束的扫码数据时缩短读超时，以便按空闲间隔尽快分帧
+            timeout = self.parser.idle_gap if self.parser.pending else idle_timeout
+            if self.ser.timeout != timeout:
+                self.ser.timeout = timeout
+
+    def record_ui_latency(self):
+        """由界面在处理完扫码结果后调用，记录串口收到数据到界面处理完成的延迟"""
+        if self.last_received_time is not None:
+            self.scan_latencies.append(time.monotonic() - self.last_received_time)
+            QR_SCAN_TO_UI_SECONDS.observe(self.scan_latencies[-1])
+            del self.scan_latencies[:-200]  # 只保留最近200次
+
+    def get_stats(self):
+        """返回扫码延迟和后台线程CPU占用统计"""
+        elapsed = time.monotonic() - self.start_time if self.start_time else 0.0
+        latencies = sorted(self.scan_latencies)
+        stats = {
+            'mode': self.scan_mode,
+            'elapsed': elapsed,
+            'triggers': self.trigger_count,
+            'scans': len(latencies),
+            'cpu_percent': (self.read_cpu_time + self.send_cpu_time) / elapsed * 100 if elapsed else 0.0,
+        }
+        if latencies:
+            stats['latency_p50_ms'] = latencies[len(latencies) // 2] * 1000
+            stats['latency_max_ms'] = latencies[-1] * 1000
+        return stats
 
     def start_threads(self):
-        """开启后台线程用于发送和接收数据"""
+        """开启后台线程用于接收数据，非感应模式下同时开启触发线程"""
         if not self.running:
+            self.stop_event.clear()
+            self.parser.reset()
+            self.trigger_interval = self.min_trigger_interval
+            # 读线程启动前直接在当前线程完成模式配置
+            if self.scan_mode == 'sense' and not self.set_work_mode(MODE_SENSE):
+                log.warning("模块不支持感应模式，改用自适应触发模式")
+                self.scan_mode = 'trigger'
+            if self.scan_mode == 'trigger':
+                self.set_work_mode(MODE_COMMAND)
             self.running = True
+            self.start_time = time.monotonic()
             self.read_thread = threading.Thread(target=self.read_from_serial)
-            self.send_thread = threading.Thread(target=self.send_command_periodically)
             self.read_thread.start()
-            self.send_thread.start()
-            print("开始读取和发送串口数据...")
+            if self.scan_mode == 'trigger':
+                self.send_thread = threading.Thread(target=self.send_command_periodically)
+                self.send_thread.start()
+            log.info("开始读取扫码数据", mode=self.scan_mode)
 
     def stop_threads(self):
         """停止后台线程"""
         if self.running:
             self.running = False
+            self.stop_event.set()
             if self.read_thread is not None:
                 self.read_thread.join()
                 self.read_thread = None
             if self.send_thread is not None:
                 self.send_thread.join()
                 self.send_thread = None
-            print("停止读取和发送串口数据.")
+            log.info("停止读取扫码数据", **self.get_stats())
 
     def close(self):
         """关闭串口连接"""
         self.stop_threads()
         if self.ser.is_open:
             self.ser.close()
-            print("串口已关闭")
+            log.info("扫码串口已关闭")
 
 
 # # 使用示例
@@ -0,0 +1,44 @@
+import time
+
+
+class ScanDeduplicator:
+    """
+    扫码事件去重。
+    同一内容在时间窗口内重复出现时视为同一次扫码（标签一直停在读头前会被反复识别），
+    每次出现都会刷新时间，只有标签离开超过窗口时间后再次出现才算新的扫码。
+    """
+
+    def __init__(self, window=2.0, max_entries=64):
+        """
+        :param window: 去重时间窗口（秒）
+        :param max_entries: 最多记录的不同内容数量
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self.last_seen = {}
+
+    def accept(self, payload, now=None):
+        """返回该扫码内容是否应当作为新的扫码事件处理"""
+        if now is None:
+            now = time.monotonic()
+        # 先删除再插入，保持字典按最近出现时间排序
+        last = self.last_seen.pop(payload, None)
+        self.last_seen[payload] = now
+        if len(self.last_seen) > self.max_entries:
+            self._prune(now)
+        return last is None or now - last > self.window
+
+    def reset(self, payload=None):
+        """清除某个内容（或全部内容）的去重记录"""
+        if payload is None:
+            self.last_seen.clear()
+        else:
+            self.last_seen.pop(payload, None)
+
+    def _prune(self, now):
+        expired = [key for key, seen in self.last_seen.items() if now - seen > self.window]
+        for key in expired:
+            del self.last_seen[key]
+        # 仍然超出上限时丢弃最早的记录
+        while len(self.last_seen) > self.max_entries:
+            del self.last_seen[next(iter(self.last_seen))]
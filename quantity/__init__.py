@@ -0,0 +1,3 @@
+from .units import Quantity, parse_quantity, UNITS
+
+__all__ = ['Quantity', 'parse_quantity', 'UNITS']
@@ -0,0 +1,145 @@
+import re
+
+
+# 单位 -> (量纲, 换算到基本单位的系数)；质量的基本单位为 g，体积为 mL
+UNITS = {
+    'mg': ('mass', 0.001),
+    'g': ('mass', 1.0),
+    'kg': ('mass', 1000.0),
+    'lb': ('mass', 453.59237),
+    'oz': ('mass', 28.349523125),
+    'μl': ('volume', 0.001),
+    'ul': ('volume', 0.001),
+    'ml': ('volume', 1.0),
+    'l': ('volume', 1000.0),
+}
+
+# 显示时使用的单位写法
+UNIT_NAMES = {'μl': 'μL', 'ul': 'μL', 'ml': 'mL', 'l': 'L'}
+
+DEFAULT_UNIT = 'g'  # 没有写单位的数值按克处理（与以前只录入数字的记录一致）
+
+# 其他常见写法 -> UNITS 中的单位；复数（lbs、kgs）在 _unit_of 中去掉结尾的 s 再查
+UNIT_ALIASES = {
+    'µl': 'μl',  # 微符号 U+00B5
+    'gram': 'g', 'kilogram': 'kg', 'milligram': 'mg', 'pound': 'lb', 'ounce': 'oz',
+    'liter': 'l', 'litre': 'l', 'milliliter': 'ml', 'millilitre': 'ml',
+}
+
+# 数值（可带千位分隔符，如 1,000.5）及紧随其后的单词
+_QUANTITY_PATTERN = re.compile(r'(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*([a-zμµ]+)?', re.IGNORECASE)
+
+
+class Quantity:
+    """
+    带单位的数量。内部以基本单位（g 或 mL）的浮点数保存，
+    同时记住原来的显示单位和小数位数，显示时换算回去。
+    """
+    __slots__ = ('base', 'unit', 'precision')
+    UNITS = UNITS
+
+    def __init__(self, base, unit=DEFAULT_UNIT, precision=0):
+        """
+        :param base: 以基本单位表示的数值
+        :param unit: 显示单位（UNITS 中的键）
+        :param precision: 显示单位下的小数位数
+        """
+        unit = unit.lower()
+        if unit not in UNITS:
+            raise ValueError(f"不支持的单位: {unit}")
+        self.base = float(base)
+        self.unit = unit
+        self.precision = int(precision)
+
+    @classmethod
+    def from_value(cls, value, unit=DEFAULT_UNIT, precision=0):
+        """由显示单位下的数值构造"""
+        return cls(value * UNITS[unit.lower()][1], unit, precision)
+
+    @classmethod
+    def from_record(cls, record, field='净含量'):
+        """
+        由数据库记录构造：净含量为基本单位的数值，单位和精度在 单位/精度 列中。
+        旧记录没有单位列时按原来的文本解析。
+        """
+        value = record.get(field)
+        if value is None or value == 'null':
+            return None
+        if isinstance(value, (int, float)):
+            unit = record.get('单位') or DEFAULT_UNIT
+            precision = record.get('精度')
+            return cls(value, unit, precision if precision is not None else 0)
+        return parse_quantity(value)
+
+    @property
+    def dimension(self):
+        return UNITS[self.unit][0]
+
+    @property
+    def value(self):
+        """显示单位下的数值"""
+        return self.base / UNITS[self.unit][1]
+
+    def minus(self, used):
+        """减去用量（Quantity），精度取两者中较高的"""
+        if used.dimension != self.dimension:
+            raise ValueError(f"无法从{self.display()}中减去{used.display()}：单位量纲不同")
+        precision = max(self.precision, used.precision + _decimal_shift(used.unit, self.unit))
+        return Quantity(self.base - used.base, self.unit, precision)
+
+    def display(self):
+        return f"{self.value:.{self.precision}f}{UNIT_NAMES.get(self.unit, self.unit)}"
+
+    def __str__(self):
+        return self.display()
+
+    def __repr__(self):
+        return f"Quantity({self.base!r}, {self.unit!r}, {self.precision})"
+
+
+def _decimal_shift(from_unit, to_unit):
+    """从 from_unit 换算到 to_unit 时需要增加的小数位数（例如 mg -> g 为 3）"""
+    ratio = UNITS[to_unit][1] / UNITS[from_unit][1]
+    shift = 0
+    while ratio > 1.0001 and shift < 6:
+        ratio /= 10
+        shift += 1
+    return shift
+
+
+def _unit_of(word):
+    """单位写法对应的 UNITS 键，不认识时返回 None"""
+    word = word.lower()
+    word = UNIT_ALIASES.get(word, word)
+    if word in UNITS:
+        return word
+    if word.endswith('s'):
+        word = UNIT_ALIASES.get(word[:-1], word[:-1])
+        if word in UNITS:
+            return word
+    return None
+
+
+def parse_quantity(text, default_unit=DEFAULT_UNIT):
+    """
+    解析 "500.0g"、"2.5 L"、"2 lbs"、"1,000 g" 或纯数字为 Quantity，无法解析时返回 None。
+    数字后面是不认识的单位（如 "5 gal"）时不按默认单位处理，只有没写单位的数字才按 default_unit。
+    小数位数按原文保留，"500.0g" 显示时仍为 "500.0g"。
+    """
+    if text is None:
+        return None
+    if isinstance(text, Quantity):
+        return text
+    if isinstance(text, (int, float)):
+        # 浮点数的小数位数按最多 6 位有效小数计算，避免 0.1 * 3 之类的误差位
+        decimals = f"{float(text):.6f}".rstrip('0').split('.')[1]
+        return Quantity.from_value(float(text), default_unit, len(decimals))
+    for match in _QUANTITY_PATTERN.finditer(str(text).strip()):
+        integer, fraction, word = match.groups()
+        unit = _unit_of(word) if word else default_unit.lower()
+        if unit is None:
+            continue  # 数字后面不是单位（如 "1 x 500 g" 中的 x），看下一个数字
+        number = integer.replace(',', '') + (fraction or '')
+        precision = len(fraction) - 1 if fraction else 0
+        return Quantity.from_value(float(number), unit, precision)
+    return None
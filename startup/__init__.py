@@ -0,0 +1,3 @@
+from .timing import StartupTimer
+
+__all__ = ['StartupTimer']
@@ -0,0 +1,83 @@
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    启动耗时统计：按阶段记录耗时，并可记录启动期间每个顶层包第一次导入的耗时
+    （扣除其中嵌套导入的其他包，各包的时间相加不会重复计算）。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # [(阶段名称, 耗时秒, 结束时距启动的秒数)]
+        self.imports = {}  # 顶层包名 -> 导入耗时（秒，不含嵌套导入的其他包）
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.original_import = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name):
+        """记录一个启动阶段的耗时"""
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.phases.append((name, end - begin, end - self.started))
+
+    def mark(self, name):
+        """记录一个时间点（如窗口显示），耗时记为 0"""
+        with self.lock:
+            self.phases.append((name, 0.0, self.elapsed()))
+
+    def track_imports(self):
+        """开始记录导入耗时（替换 builtins.__import__，stop_tracking 时恢复）"""
+        if self.original_import is not None:
+            return
+        self.original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop_tracking(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self.original_import or builtins.__import__
+        root = name.partition('.')[0]
+        if level or not root or root in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        # 第一次导入该顶层包：计时，并从外层正在导入的包中扣除这段时间
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(0.0)
+        begin = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - begin
+            nested = stack.pop()
+            if stack:
+                stack[-1] += total
+            with self.lock:
+                self.imports[root] = self.imports.get(root, 0.0) + total - nested
+
+    def report(self, top=10):
+        """文本形式的启动耗时报告：各阶段耗时和最慢的若干个导入"""
+        lines = [f"启动耗时 {self.elapsed() * 1000:.0f} ms"]
+        for name, duration, at in self.phases:
+            lines.append(f"  {name:<16} {duration * 1000:8.1f} ms  (第 {at * 1000:.0f} ms)")
+        if self.imports:
+            lines.append("  导入耗时（不含嵌套导入的其他包）:")
+            for root, duration in sorted(self.imports.items(), key=lambda item: -item[1])[:top]:
+                lines.append(f"    {root:<14} {duration * 1000:8.1f} ms")
+        return '\n'.join(lines)
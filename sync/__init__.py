@@ -0,0 +1,3 @@
+from .sync_engine import SyncEngine, SyncService
+
+__all__ = ['SyncEngine', 'SyncService']
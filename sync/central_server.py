@@ -0,0 +1,138 @@
+import argparse
+import gzip
+import json
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CentralStore:
+    """
+    中心库：保存各站同步上来的 records / change_logs。
+    以 (站点_id, 本站主键) 为键幂等写入，同一批数据重复发送不会产生重复行。
+    同一键收到录入时间不同的行（例如某站数据库重建后产品ID被重复使用）时视为冲突，
+    保留原有数据，把新数据记入 conflicts 表并返回给该站。
+    """
+
+    # 用来判断是否为同一行数据的时间列
+    TIME_COLUMNS = {'records': '录入时间', 'change_logs': '更新时间'}
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        for table in self.TIME_COLUMNS:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    站点_id INTEGER,
+                    本站_id INTEGER,
+                    时间 TEXT,
+                    数据 TEXT,
+                    PRIMARY KEY (站点_id, 本站_id)
+                ) WITHOUT ROWID;
+            """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS conflicts (
+                站点_id INTEGER,
+                表名 TEXT,
+                本站_id INTEGER,
+                数据 TEXT,
+                收到时间 TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS station_cursors (
+                站点_id INTEGER,
+                表名 TEXT,
+                序号 INTEGER,
+                PRIMARY KEY (站点_id, 表名)
+            );
+        """)
+        self.conn.commit()
+
+    def apply(self, batch):
+        """写入一批数据，返回应答字典"""
+        table = batch['table']
+        if table not in self.TIME_COLUMNS:
+            return {'ok': False, 'error': f"不支持的表: {table}"}
+        station_id = int(batch['station_id'])
+        columns = batch['columns']
+        key_index = columns.index(batch['key'])
+        time_column = self.TIME_COLUMNS[table]
+        time_index = columns.index(time_column) if time_column in columns else None
+        conflicts = []
+        with self.lock:
+            for row in batch['rows']:
+                local_id = row[key_index]
+                row_time = row[time_index] if time_index is not None else None
+                data = json.dumps(dict(zip(columns, row)), ensure_ascii=False)
+                existing = self.conn.execute(
+                    f"SELECT 时间 FROM {table} WHERE 站点_id = ? AND 本站_id = ?;",
+                    (station_id, local_id)).fetchone()
+                if existing and existing[0] != row_time:
+                    self.conn.execute("INSERT INTO conflicts (站点_id, 表名, 本站_id, 数据) VALUES (?, ?, ?, ?);",
+                                      (station_id, table, local_id, data))
+                    conflicts.append({'table': table, 'id': local_id})
+                    continue
+                self.conn.execute(f"INSERT OR REPLACE INTO {table} (站点_id, 本站_id, 时间, 数据) VALUES (?, ?, ?, ?);",
+                                  (station_id, local_id, row_time, data))
+            self.conn.execute("INSERT OR REPLACE INTO station_cursors (站点_id, 表名, 序号) VALUES (?, ?, ?);",
+                              (station_id, table, batch['cursor']))
+            self.conn.commit()
+        return {'ok': True, 'applied': len(batch['rows']) - len(conflicts), 'conflicts': conflicts}
+
+    def cursors(self):
+        """各站已同步到的位置"""
+        with self.lock:
+            rows = self.conn.execute("SELECT 站点_id, 表名, 序号 FROM station_cursors ORDER BY 站点_id;").fetchall()
+        return [{'station_id': station_id, 'table': table, 'cursor': cursor} for station_id, table, cursor in rows]
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def do_POST(self):
+        if self.path != '/sync':
+            self._reply(404, {'ok': False, 'error': 'not found'})
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        try:
+            reply = self.store.apply(json.loads(body.decode('utf-8')))
+        except (ValueError, KeyError) as e:
+            reply = {'ok': False, 'error': str(e)}
+        self._reply(200 if reply['ok'] else 400, reply)
+
+    def do_GET(self):
+        if self.path == '/cursors':
+            self._reply(200, self.store.cursors())
+        else:
+            self._reply(404, {'ok': False, 'error': 'not found'})
+
+    def _reply(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(db_path, host='0.0.0.0', port=8765):
+    """创建中心服务器（调用 serve_forever 运行）"""
+    handler = type('Handler', (SyncRequestHandler,), {'store': CentralStore(db_path)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="库存同步中心服务器")
+    parser.add_argument('--db', default='central.db')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server = make_server(args.db, args.host, args.port)
+    print(f"中心服务器已启动: http://{args.host}:{args.port}/sync")
+    server.serve_forever()
@@ -0,0 +1,186 @@
+import gzip
+import json
+import sqlite3
+import threading
+import urllib.request
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+# 需要同步的表及其主键
+SYNC_TABLES = {
+    'records': '产品_id',
+    'change_logs': '记录_id',
+}
+
+
+class SyncEngine:
+    """
+    增量同步引擎：把本机新增或修改的 records / change_logs 行分批压缩后发送到中心服务器。
+    通过触发器把变化的行记录到 sync_log，同步后推进游标，
+    每次只发送游标之后变化的行，流量和时间只与增量有关。
+    """
+
+    def __init__(self, db_path, endpoint, station_id, batch_size=500, timeout=15):
+        """
+        :param db_path: 本机数据库路径（与 DynamicDatabase 相同）
+        :param endpoint: 中心服务器同步地址，如 http://192.168.1.10:8765/sync
+        :param station_id: 本站编号，中心库用 (站点_id, 产品_id) 区分各站的数据
+        :param batch_size: 每批最多发送的行数
+        """
+        self.endpoint = endpoint
+        self.station_id = station_id
+        self.batch_size = batch_size
+        self.timeout = timeout
+        # 同步在后台线程运行，使用独立的连接
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")  # 同步读取时不阻塞界面写入
+        self._install()
+
+    def _install(self):
+        """创建变化记录表、游标表和触发器（首次安装时把已有数据全部登记为待同步）"""
+        first_install = self.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'sync_log';").fetchone()[0] == 0
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_log (
+                序号 INTEGER PRIMARY KEY AUTOINCREMENT,
+                表名 TEXT,
+                行_id INTEGER
+            );
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_cursors (
+                表名 TEXT PRIMARY KEY,
+                序号 INTEGER
+            );
+        """)
+        for table, key in SYNC_TABLES.items():
+            for event in ('INSERT', 'UPDATE'):
+                self.conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS sync_{table}_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO sync_log (表名, 行_id) VALUES ('{table}', NEW.{key});
+                    END;
+                """)
+            if first_install:
+                self.conn.execute(f"INSERT INTO sync_log (表名, 行_id) SELECT '{table}', {key} FROM {table};")
+        self.conn.commit()
+
+    def _get_cursor(self, table):
+        row = self.conn.execute("SELECT 序号 FROM sync_cursors WHERE 表名 = ?;", (table,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_cursor(self, table, position):
+        self.conn.execute("INSERT OR REPLACE INTO sync_cursors (表名, 序号) VALUES (?, ?);", (table, position))
+        # 已同步的变化记录不再需要
+        self.conn.execute("DELETE FROM sync_log WHERE 表名 = ? AND 序号 <= ?;", (table, position))
+        self.conn.commit()
+
+    def pending_count(self):
+        """等待同步的变化数"""
+        return self.conn.execute("SELECT COUNT(*) FROM sync_log;").fetchone()[0]
+
+    def _next_batch(self, table):
+        """取游标之后的一批变化行，返回 (批次字典, 新游标)，没有变化时返回 (None, None)"""
+        cursor = self._get_cursor(table)
+        log = self.conn.execute(
+            "SELECT 序号, 行_id FROM sync_log WHERE 表名 = ? AND 序号 > ? ORDER BY 序号 LIMIT ?;",
+            (table, cursor, self.batch_size)).fetchall()
+        if not log:
+            return None, None
+        new_cursor = log[-1][0]
+        row_ids = list(dict.fromkeys(row_id for _, row_id in log))  # 同一行多次修改只发送一次
+        key = SYNC_TABLES[table]
+        placeholders = ', '.join('?' * len(row_ids))
+        result = self.conn.execute(f"SELECT * FROM {table} WHERE {key} IN ({placeholders});", row_ids)
+        columns = [description[0] for description in result.description]
+        batch = {
+            'station_id': self.station_id,
+            'table': table,
+            'key': key,
+            'columns': columns,
+            'rows': result.fetchall(),
+            'cursor': new_cursor,
+        }
+        return batch, new_cursor
+
+    def _post(self, batch):
+        body = gzip.compress(json.dumps(batch, ensure_ascii=False).encode('utf-8'))
+        request = urllib.request.Request(self.endpoint, data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+        })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def sync_once(self):
+        """
+        把所有待同步的变化发送到中心服务器。
+        :return: (发送的行数, 冲突列表)；网络错误时抛出异常，游标不推进，下次重发（服务器端幂等）
+        """
+        sent = 0
+        conflicts = []
+        for table in SYNC_TABLES:
+            while True:
+                batch, new_cursor = self._next_batch(table)
+                if batch is None:
+                    break
+                reply = self._post(batch)
+                if not reply.get('ok'):
+                    raise RuntimeError(reply.get('error', '中心服务器拒绝同步'))
+                conflicts.extend(reply.get('conflicts', []))
+                self._set_cursor(table, new_cursor)
+                sent += len(batch['rows'])
+        return sent, conflicts
+
+    def close(self):
+        self.conn.close()
+
+
+class SyncService(QObject):
+    """在后台线程中定期运行 SyncEngine"""
+    synced = pyqtSignal(int, object)  # 发送的行数, 冲突列表
+    sync_error = pyqtSignal(str)
+
+    def __init__(self, db_path, endpoint, station_id, interval=60):
+        super().__init__()
+        self.db_path = db_path
+        self.endpoint = endpoint
+        self.station_id = station_id
+        self.interval = interval
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def sync_now(self):
+        """立即同步一次"""
+        self.wakeup.set()
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self.wakeup.set()
+            if self.thread is not None:
+                self.thread.join(timeout=2)
+                self.thread = None
+
+    def _run(self):
+        engine = SyncEngine(self.db_path, self.endpoint, self.station_id)
+        try:
+            while self.running:
+                try:
+                    sent, conflicts = engine.sync_once()
+                    if sent or conflicts:
+                        self.synced.emit(sent, conflicts)
+                except Exception as e:
+                    self.sync_error.emit(str(e))
+                self.wakeup.wait(self.interval)
+                self.wakeup.clear()
+        finally:
+            engine.close()
@@ -0,0 +1,158 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QLineEdit, QTableWidget, QTableWidgetItem, QMessageBox)
+from PyQt5.QtCore import Qt
+from ocr.batch_enroll import BatchEnrollment, ERROR, REMOVED
+
+
+# 列表中显示、可修改的字段；其余识别字段（中文名称、分子式等）随记录一起保存
+BATCH_COLUMNS = ["位置", "名称", "cas", "lot", "净含量", "纯度", "供应商", "有效期"]
+
+class BatchEnrollDialog(QDialog):
+    """
+    批量录入对话框：连续拍摄多瓶，后台并发识别，
+    在列表中核对修改后一次性保存，并批量打印标签。
+    """
+
+    def __init__(self, parent, frame_source, service, warehouse_id, dispatcher=None):
+        """
+        :param frame_source: 返回当前摄像头图像的函数
+        :param service: InventoryService，保存、学习供应商格式和打印都经由它完成
+        :param dispatcher: 共享的 OCRDispatcher
+        """
+        super().__init__(parent)
+        self.setWindowTitle("批量录入")
+        self.resize(760, 420)
+        self.frame_source = frame_source
+        self.service = service
+        self.warehouse_id = warehouse_id
+        self.updating = False  # 程序填写表格时不触发修改处理
+        self.saved_count = 0
+
+        self.batch = BatchEnrollment(dispatcher=dispatcher, profile_store=service.profile_store)
+        self.batch.item_added.connect(self.add_row)
+        self.batch.item_updated.connect(self.update_row)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        position_layout = QHBoxLayout()
+        position_layout.addWidget(QLabel("位置:"))
+        self.position_edit = QLineEdit()
+        self.position_edit.setPlaceholderText("新拍摄的瓶子默认使用此位置")
+        position_layout.addWidget(self.position_edit)
+        layout.addLayout(position_layout)
+
+        self.table = QTableWidget(0, len(BATCH_COLUMNS) + 1)
+        self.table.setHorizontalHeaderLabels(["状态"] + BATCH_COLUMNS)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.cellChanged.connect(self.handle_cell_changed)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.capture_button = QPushButton("拍摄")
+        self.retry_button = QPushButton("重新识别")
+        self.remove_button = QPushButton("删除")
+        self.commit_button = QPushButton("保存并打印")
+        self.close_button = QPushButton("关闭")
+        for button in (self.capture_button, self.retry_button, self.remove_button,
+                       self.commit_button, self.close_button):
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.capture_button.clicked.connect(self.capture)
+        self.retry_button.clicked.connect(self.retry_selected)
+        self.remove_button.clicked.connect(self.remove_selected)
+        self.commit_button.clicked.connect(self.commit)
+        self.close_button.clicked.connect(self.reject)
+
+    def capture(self):
+        """拍摄当前瓶子，立即可以换下一瓶"""
+        frame = self.frame_source()
+        if frame is None:
+            self.status_label.setText("错误：没有可用的图像数据")
+            return
+        position = self.position_edit.text().strip()
+        self.batch.add_frame(frame, {'位置': position} if position else None)
+
+    def add_row(self, index):
+        self.table.insertRow(index)
+        self.update_row(index)
+
+    def update_row(self, index):
+        """刷新某一瓶的状态和字段"""
+        item = self.batch.items[index]
+        self.updating = True
+        status = QTableWidgetItem(item.state)
+        status.setFlags(status.flags() & ~Qt.ItemIsEditable)
+        if item.error:
+            status.setToolTip(item.error)
+        self.table.setItem(index, 0, status)
+        for column, field in enumerate(BATCH_COLUMNS, start=1):
+            self.table.setItem(index, column, QTableWidgetItem(str(item.fields.get(field, ""))))
+        self.table.setRowHidden(index, item.state == REMOVED)
+        self.updating = False
+        self.update_status()
+
+    def handle_cell_changed(self, row, column):
+        """操作员修改的值写回该瓶的字段"""
+        if self.updating or column == 0:
+            return
+        value = self.table.item(row, column).text().strip()
+        field = BATCH_COLUMNS[column - 1]
+        if value:
+            self.batch.items[row].fields[field] = value
+        else:
+            self.batch.items[row].fields.pop(field, None)
+
+    def update_status(self):
+        items = self.batch.accepted_items()
+        pending = self.batch.pending_count()
+        failed = sum(1 for item in items if item.state == ERROR)
+        self.status_label.setText(f"共 {len(items)} 瓶，识别中 {pending}，失败 {failed}")
+
+    def selected_rows(self):
+        return sorted({index.row() for index in self.table.selectedIndexes()})
+
+    def retry_selected(self):
+        for row in self.selected_rows():
+            self.batch.retry(row)
+
+    def remove_selected(self):
+        for row in self.selected_rows():
+            self.batch.remove(row)
+
+    def commit(self):
+        """所有瓶子在一个事务中保存，然后合并为一个打印任务"""
+        items = self.batch.accepted_items()
+        if not items:
+            self.status_label.setText("没有需要保存的记录")
+            return
+        if self.batch.pending_count():
+            self.status_label.setText("请等待识别完成后再保存")
+            return
+        failed = sum(1 for item in items if item.state == ERROR)
+        if failed:
+            self.status_label.setText(f"有 {failed} 瓶识别失败，请重试或删除后再保存")
+            return
+        records = [{key: value for key, value in item.fields.items() if value != ""} for item in items]
+        recognitions = [(item.layout, item.ocr_fields) if item.layout is not None else None for item in items]
+        try:
+            saved = self.service.enroll_batch(records, self.warehouse_id, recognitions)
+        except Exception as e:
+            QMessageBox.warning(self, "保存失败", f"批量保存失败，未写入任何记录：{e}")
+            return
+        self.saved_count = len(saved)
+
+        try:
+            self.service.print_records(saved, "批量录入")
+        except ValueError as e:
+            QMessageBox.warning(self, "打印失败", f"已保存 {len(records)} 条记录，但标签无法打印：{e}")
+        self.accept()
+
+    def done(self, result):
+        self.batch.shutdown()
+        super().done(result)
@@ -0,0 +1,72 @@
+import time
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem
+from PyQt5.QtCore import QTimer
+from metrics import REGISTRY
+
+
+DIAGNOSTICS_COLUMNS = ["指标", "次数/值", "每秒", "p50 (ms)", "p95 (ms)", "p99 (ms)", "说明"]
+
+
+class DiagnosticsDialog(QDialog):
+    """
+    诊断面板：每秒刷新一次各子系统的计数和耗时分布，
+    每秒一列由两次刷新之间的计数差计算（如摄像头帧率、扫码次数）。
+    """
+
+    def __init__(self, parent=None, registry=REGISTRY, interval=1000):
+        super().__init__(parent)
+        self.setWindowTitle("性能诊断")
+        self.resize(760, 420)
+        self.registry = registry
+        self.previous = {}  # 指标名 -> (时间, 次数)，用于计算每秒速率
+
+        layout = QVBoxLayout(self)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        self.table = QTableWidget(0, len(DIAGNOSTICS_COLUMNS))
+        self.table.setHorizontalHeaderLabels(DIAGNOSTICS_COLUMNS)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.close_button = QPushButton("关闭")
+        self.close_button.clicked.connect(self.accept)
+        button_layout.addStretch()
+        button_layout.addWidget(self.close_button)
+        layout.addLayout(button_layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval)
+        self.refresh()
+
+    def refresh(self):
+        if not self.registry.enabled:
+            self.status_label.setText("指标记录已关闭（配置文件中 metrics_enabled 为 false）")
+        else:
+            self.status_label.setText("")
+        metrics = self.registry.collect()
+        self.table.setRowCount(len(metrics))
+        now = time.monotonic()
+        for row, metric in enumerate(metrics):
+            if metric.kind == 'histogram':
+                count = metric.count
+                percentiles = [metric.percentile(p) for p in (50, 95, 99)]
+            else:
+                count = metric.value
+                percentiles = [None, None, None]
+            rate = ''
+            if metric.kind != 'gauge' and metric.name in self.previous:
+                last_time, last_count = self.previous[metric.name]
+                if now > last_time:
+                    rate = f"{(count - last_count) / (now - last_time):.1f}"
+            self.previous[metric.name] = (now, count)
+            values = [metric.name, str(count), rate] + \
+                [f"{value * 1000:.1f}" if value is not None else '' for value in percentiles] + [metric.help]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+    def done(self, result):
+        self.timer.stop()
+        super().done(result)
@@ -0,0 +1,156 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit,
+                             QTableView, QHeaderView, QAbstractItemView)
+from PyQt5.QtGui import QIntValidator
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from SQL.search import InventorySearch, BROWSE_COLUMNS
+from applog import get_logger
+
+
+log = get_logger('ui')
+
+
+class InventoryBrowserModel(QAbstractTableModel):
+    """
+    库存浏览的分页模型：先读取一页，视图滚动到底部时由 fetchMore 再读一页，
+    十万条记录也只读取看到的部分。每行保存为元组，按 BROWSE_COLUMNS 的顺序。
+    """
+
+    def __init__(self, search, page_size=100, parent=None):
+        super().__init__(parent)
+        self.search = search
+        self.page_size = page_size
+        self.rows = []
+        self.filters = {}
+        self.text = ''
+        self.has_more = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(BROWSE_COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self.rows[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return BROWSE_COLUMNS[section]
+        return section + 1
+
+    def _fetch_page(self):
+        after = self.rows[-1][BROWSE_COLUMNS.index('产品_id')] if self.rows else None
+        try:
+            records = self.search.page(self.filters, self.text, after=after, limit=self.page_size)
+        except Exception as e:
+            # FTS5 查询语法错误等，按没有结果处理
+            log.warning("库存查询出错: %s", e)
+            records = []
+        self.has_more = len(records) == self.page_size
+        return [tuple(record[column] for column in BROWSE_COLUMNS) for record in records]
+
+    def set_query(self, filters, text):
+        """更换筛选条件，重新读取第一页"""
+        self.beginResetModel()
+        self.filters = dict(filters)
+        self.text = text
+        self.rows = []
+        self.rows = self._fetch_page()
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        rows = self._fetch_page()
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+
+class InventoryBrowserDialog(QDialog):
+    """
+    库存浏览：按仓库、CAS、名称（前缀）、lot、位置筛选，或全文搜索名称、中文名称、CAS、lot 和位置。
+    输入停止一段时间后才查询，连续输入时不会每个字都查询一次。
+    """
+
+    def __init__(self, db_path, parent=None, warehouse_id=None, delay=300):
+        super().__init__(parent)
+        self.setWindowTitle("库存浏览")
+        self.resize(780, 440)
+        self.search = InventorySearch(db_path)
+        self.model = InventoryBrowserModel(self.search, parent=self)
+
+        layout = QVBoxLayout(self)
+        self.text_edit = QLineEdit()
+        self.text_edit.setPlaceholderText("搜索名称、中文名称、CAS、lot、位置")
+        layout.addWidget(self.text_edit)
+
+        filter_layout = QHBoxLayout()
+        self.filter_edits = {}
+        for field in ('仓库_id', 'cas', '名称', 'lot', '位置'):
+            edit = QLineEdit()
+            edit.setPlaceholderText(field)
+            filter_layout.addWidget(edit)
+            self.filter_edits[field] = edit
+        self.filter_edits['仓库_id'].setValidator(QIntValidator(0, 999))
+        if warehouse_id is not None:
+            self.filter_edits['仓库_id'].setText(str(warehouse_id))
+        layout.addLayout(filter_layout)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setWordWrap(False)
+        # 固定行高，视图不需要逐行计算高度
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(24)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.status_label = QLabel("")
+        self.close_button = QPushButton("关闭")
+        self.close_button.clicked.connect(self.accept)
+        button_layout.addWidget(self.status_label)
+        button_layout.addStretch()
+        button_layout.addWidget(self.close_button)
+        layout.addLayout(button_layout)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.refresh)
+        self.text_edit.textChanged.connect(self.timer.start)
+        for edit in self.filter_edits.values():
+            edit.textChanged.connect(self.timer.start)
+        self.refresh()
+
+    def current_filters(self):
+        filters = {field: edit.text().strip() for field, edit in self.filter_edits.items()}
+        if filters['仓库_id']:
+            filters['仓库_id'] = int(filters['仓库_id'])
+        return filters
+
+    def refresh(self):
+        filters, text = self.current_filters(), self.text_edit.text()
+        self.model.set_query(filters, text)
+        self.table.scrollToTop()
+        try:
+            self.status_label.setText(f"共 {self.search.count(filters, text)} 条")
+        except Exception as e:
+            log.warning("库存计数出错: %s", e)
+            self.status_label.setText("")
+
+    def done(self, result):
+        self.timer.stop()
+        self.search.close()
+        super().done(result)
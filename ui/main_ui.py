@@ -10,10 +10,11 @@
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                            QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+                            QLabel, QPushButton, QTableView,
                             QHeaderView, QStackedWidget, QSpinBox)
 from PyQt5.QtCore import Qt
 from .main_ui_event import MainUIEvent
+from .parameter_model import ParameterTableModel
 from camera import CameraThread
 
 
@@ -41,16 +42,16 @@ class Ui_Dialog(object):
             QPushButton:hover {
                 background-color: #1976D2;
             }
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 gridline-color: #E0E0E0;
                 border: 1px solid #E0E0E0;
                 border-radius: 4px;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 2px;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #E3F2FD;
                 color: black;
             }
@@ -158,9 +159,15 @@ class Ui_Dialog(object):
         self.serial_button.setIcon(QtGui.QIcon.fromTheme("configure"))
         self.export_button = QtWidgets.QPushButton("导出数据")
         self.export_button.setIcon(QtGui.QIcon.fromTheme("document-save"))
+        self.diagnostics_button = QtWidgets.QPushButton("诊断")
+        self.diagnostics_button.setIcon(QtGui.QIcon.fromTheme("utilities-system-monitor"))
+        self.browse_button = QtWidgets.QPushButton("库存")
+        self.browse_button.setIcon(QtGui.QIcon.fromTheme("system-search"))
         
         self.left_button_layout.addWidget(self.serial_button)
         self.left_button_layout.addWidget(self.export_button)
+        self.left_button_layout.addWidget(self.diagnostics_button)
+        self.left_button_layout.addWidget(self.browse_button)
         self.left_layout.addLayout(self.left_button_layout)
 
         # 数据显示区域
@@ -195,35 +202,33 @@ class Ui_Dialog(object):
         self.use_button = QtWidgets.QPushButton("使用")
         self.use_button.setIcon(QtGui.QIcon.fromTheme("system-run"))
         
+        self.batch_button = QtWidgets.QPushButton("批量录入")
+        self.batch_button.setIcon(QtGui.QIcon.fromTheme("document-multiple"))
+        
         self.right_button_layout.addWidget(self.input_button)
+        self.right_button_layout.addWidget(self.batch_button)
         self.right_button_layout.addWidget(self.use_button)
         self.right_layout.addLayout(self.right_button_layout)
 
         # 创建堆叠布局来切换两个表格
         self.table_stack = QtWidgets.QStackedWidget()
         
-        # 录入表格
-        self.input_table = QtWidgets.QTableWidget()
-        self.input_table.setColumnCount(2)
-        self.input_table.setRowCount(12)  # 保持12行
-        self.input_table.setHorizontalHeaderLabels(["参数", "数值"])
+        # 录入表格（数据在 input_model 中，参数行由 MainUIEvent.setup_table 设置）
+        self.input_model = ParameterTableModel()
+        self.input_table = QtWidgets.QTableView()
+        self.input_table.setModel(self.input_model)
         self.input_table.horizontalHeader().setStretchLastSection(True)
         self.input_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
         self.input_table.verticalHeader().setVisible(True)
         
         # 使用表格
-        self.use_table = QtWidgets.QTableWidget()
-        self.use_table.setColumnCount(2)
-        self.use_table.setRowCount(12)  # 修改为12行，与录入表格保持一致
-        self.use_table.setHorizontalHeaderLabels(["参数", "数值"])
+        self.use_model = ParameterTableModel()
+        self.use_table = QtWidgets.QTableView()
+        self.use_table.setModel(self.use_model)
         self.use_table.horizontalHeader().setStretchLastSection(True)
         self.use_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
         self.use_table.verticalHeader().setVisible(True)
         
-        # 设置使用表格的前两行数据
-        self.use_table.setItem(0, 0, QtWidgets.QTableWidgetItem("使用量"))
-        self.use_table.setItem(1, 0, QtWidgets.QTableWidgetItem("净含量"))
-        
         # 将表格添加到堆叠布局
         self.table_stack.addWidget(self.input_table)
         self.table_stack.addWidget(self.use_table)
@@ -266,22 +271,6 @@ class Ui_Dialog(object):
         self.status_bar.showMessage("系统就绪")
         self.main_layout.addWidget(self.status_bar)
 
-        # 设置表格数据
-        parameters = [
-            "净含量",
-            "位置",
-            "cas",
-            "lot",
-            "名称",
-            "中文名称",
-            "分子式",
-            "分子量",
-            "纯度"
-        ]
-        for i, param in enumerate(parameters):
-            self.input_table.setItem(i, 0, QtWidgets.QTableWidgetItem(param))
-            self.input_table.setItem(i, 1, QtWidgets.QTableWidgetItem(""))
-
         QtCore.QMetaObject.connectSlotsByName(Dialog)
 
     def retranslateUi(self, Dialog):
@@ -289,8 +278,11 @@ class Ui_Dialog(object):
         Dialog.setWindowTitle(_translate("Dialog", "Dialog"))
         self.serial_button.setText(_translate("Dialog", "设置串口"))
         self.export_button.setText(_translate("Dialog", "导出数据"))
+        self.diagnostics_button.setText(_translate("Dialog", "诊断"))
+        self.browse_button.setText(_translate("Dialog", "库存"))
         self.display_label.setText(_translate("Dialog", "数据显示区域"))
         self.input_button.setText(_translate("Dialog", "录入"))
+        self.batch_button.setText(_translate("Dialog", "批量录入"))
         self.use_button.setText(_translate("Dialog", "使用"))
         self.save_button.setText(_translate("Dialog", "保存"))
         self.print_button.setText(_translate("Dialog", "打印"))
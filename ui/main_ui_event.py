@@ -1,17 +1,37 @@
-from PyQt5 import QtWidgets
-from PyQt5.QtWidgets import QDialog
+from PyQt5.QtWidgets import QDialog, QInputDialog
+from PyQt5.QtCore import QTimer
 from libra.Libra import SerialConfigDialog, SerialMonitor
 from qr.qr1 import SerialCommunicator
-from printer.printerQR import print_string_to_printer
+from printer.print_service import PrinterService, STATUS_TEXT, STATUS_PAPER_OUT, STATUS_OFFLINE
+from printer.label_template import LABEL_TEMPLATES, DEFAULT_TEMPLATE
 from ocr.ocr_thread import OCRThread
-from ocr.ocr_result import extract_cas_number, extract_lot_number_from_data, extract_weight_from_data, extract_purity_from_data
-from SQL.chemical import query_by_cas_number
+from ocr.ocr_client import set_ocr_url
+from SQL import chemical
+from ocr.ocr_dispatcher import OCRDispatcher
+from ocr.supplier_profiles import ProfileStore
+from ocr.offline_queue import OfflineQueue, OfflineDrainThread
 from SQL.sql import DynamicDatabase
-from wifi import WiFiDialog  # 添加导入语句
+from SQL.alerts import AlertEngine
+from SQL.analytics import ConsumptionAnalytics
+from SQL.get_data import ExportDialog
+from quantity import Quantity
+from core import InventoryService, ENROLL_FIELDS, USE_FIELDS
+from core import events
+from wifi import WiFiDialog, NetworkManager  # 添加导入语句
+from sync import SyncService
+from ui.batch_dialog import BatchEnrollDialog
+from ui.diagnostics_dialog import DiagnosticsDialog
+from ui.inventory_browser import InventoryBrowserDialog
+from metrics import REGISTRY, MetricsServer, dump_metrics, gauge
+from api import StationAPI
+from api.bridge import MainThreadBridge
+from applog import get_logger, setup_logging, shutdown_logging
 import json
 import os
 
 
+log = get_logger('ui')
+
 
 class MainUIEvent:
     def __init__(self, ui):
@@ -21,32 +41,46 @@ class MainUIEvent:
         """
         self.ui = ui
         self.current_frame = None
-        self.input_data_dict = {}
-        self.jing_han_liang = 0.0
-        self.product_id = None
-        self.last_qr_result = None
-        self.get_message_for_qr_result_flag = False  # 用来限定扫描逻辑，避免识别同一个二维码后多次查询数据库
-        self.get_record_from_sql_flag = False  # 用来限定是否计算
-        self.ocr_result_flag = False  # 用来限定是否识别
-        self.use_data_flag = False  # 用来限定是否使用
+        self.ocr_frame = None  # 最近一次送去识别的图像
+        self.profile_store = ProfileStore()  # 供应商标签格式，按供应商提取字段并从修改中学习
+        # 录入、扫码、使用和打印的工作流在 InventoryService 中，本类只负责显示和按钮
+        self.service = InventoryService(profile_store=self.profile_store)
+        self.service.subscribe(self.handle_service_event)
         
         # 设置配置文件路径
         self.config_file = os.path.expanduser('~/.chemical_manager_config.json')
+
+        # 日志：各模块级别可在配置文件中用 log_level / log_levels 调整，默认写入内存文件系统
+        config = self.load_config()
+        log_options = {key: config[option] for key, option in
+                       (('level', 'log_level'), ('levels', 'log_levels'), ('log_dir', 'log_dir')) if option in config}
+        setup_logging(**log_options)
+
+        # 性能指标：配置文件中 metrics_enabled 为 false 时关闭，各子系统的记录调用直接返回
+        REGISTRY.enabled = config.get('metrics_enabled', True)
+        self.offline_pending_gauge = gauge('offline_pending_jobs', '离线待识别的图像数')
+        self.metrics_server = None
+        self.metrics_timer = None
+        self.station_api = None
+        self.api_bridge = None
         
         # 绑定按钮事件
         self.ui.serial_button.clicked.connect(self.set_port)
         self.ui.export_button.clicked.connect(self.export_data)
         self.ui.input_button.clicked.connect(self.input_data)
+        self.ui.batch_button.clicked.connect(self.batch_input)
         self.ui.use_button.clicked.connect(self.use_event)
         self.ui.save_button.clicked.connect(self.save_table)
         self.ui.print_button.clicked.connect(self.print_qr)
         self.ui.wifi_button.clicked.connect(self.wifi_settings)  # 添加WiFi按钮事件绑定
+        self.ui.diagnostics_button.clicked.connect(self.show_diagnostics)
+        self.ui.browse_button.clicked.connect(self.browse_inventory)
 
         # 设置表格参数
         self.setup_table()
 
-        # 连接表格单元格改动信号
-        self.ui.input_table.cellChanged.connect(self.handle_cell_changed)
+        # 只有操作员在录入表格中修改数值时才触发，程序填入的识别结果和查询结果不会触发
+        self.ui.input_model.value_edited.connect(self.handle_value_edited)
         
         # 连接仓库ID修改信号
         self.ui.warehouse_id_spinbox.valueChanged.connect(self.save_warehouse_id)
@@ -54,45 +88,182 @@ class MainUIEvent:
         self.serial_communicator = None
         self.user_weight_thread = None
         self.ocr_thread = None
-        self.db_manager = DynamicDatabase()
-        
+        # 以下子系统在窗口显示后由 startup_stages 分阶段启动
+        self.db_manager = None
+        self.alert_engine = None
+        self.alert_timer = None
+        self.analytics = None
+        self.printer_service = None
+        self.offline_queue = None
+        self.offline_drain = None
+        self.ocr_dispatcher = None
+        self.network_manager = None
+        self.sync_service = None
+
         # 加载保存的仓库ID
         self.load_warehouse_id()
 
+        # 启动完成前禁用需要数据库和后台服务的按钮
+        self.service_buttons = [self.ui.export_button, self.ui.browse_button, self.ui.input_button,
+                                self.ui.batch_button, self.ui.use_button, self.ui.save_button, self.ui.print_button, self.ui.wifi_button]
+        for button in self.service_buttons:
+            button.setEnabled(False)
+        self.ui.status_bar.showMessage("正在启动…")
+
+    def startup_stages(self):
+        """窗口显示后依次执行的启动阶段 [(名称, 函数)]，阶段之间处理界面事件"""
+        return [
+            ("打开数据库", self.start_database),
+            ("库存提醒和用量统计", self.start_inventory_services),
+            ("打印服务", self.start_printer_service),
+            ("OCR和离线识别", self.start_ocr_services),
+            ("网络和同步", self.start_network_services),
+            ("性能指标输出", self.start_metrics_export),
+            ("站点接口", self.start_station_api),
+            ("启动完成", self.finish_startup),
+        ]
+
+    def start_database(self):
+        # 产品ID按站点分段，多台设备打印的标签不会重复；站点编号在配置文件中用 station_id 指定
+        self.db_manager = DynamicDatabase(station_id=self.load_config().get('station_id'))
+        self.service.db_manager = self.db_manager
+
+    def start_inventory_services(self):
+        # 库存提醒：每次写入后按该产品的最新状态检查；规则可在配置文件中用 alert_rules 调整
+        self.alert_engine = AlertEngine(self.db_manager, self.load_config().get('alert_rules'))
+        self.alert_engine.add_listener(self.handle_alert)
+        # 久未使用、过期随时间到期，启动时和每小时检查一次
+        self.alert_timer = QTimer()
+        self.alert_timer.timeout.connect(self.check_due_alerts)
+        self.alert_timer.start(60 * 60 * 1000)
+        # 用量统计：每次写入后增量更新，用于预测用完日期和补货建议
+        self.analytics = ConsumptionAnalytics(self.db_manager)
+        self.service.analytics = self.analytics
+
+    def start_printer_service(self):
+        # 后台打印服务，打印不阻塞界面；标签尺寸可在配置文件中用 label_size 指定
+        label_size = self.load_config().get('label_size', DEFAULT_TEMPLATE.name)
+        self.printer_service = PrinterService(template=LABEL_TEMPLATES.get(label_size, DEFAULT_TEMPLATE))
+        self.printer_service.job_finished.connect(self.handle_print_finished)
+        self.printer_service.job_failed.connect(self.handle_print_failed)
+        self.printer_service.status_changed.connect(self.handle_printer_status)
+        self.printer_service.start()
+        self.service.printer_service = self.printer_service
+
+    def start_ocr_services(self):
+        # 离线识别队列：网络中断时暂存图像，恢复后自动补识别并写回 records
+        self.offline_queue = OfflineQueue()
+        self.service.offline_queue = self.offline_queue
+        self.offline_drain = OfflineDrainThread(self.offline_queue)
+        self.offline_drain.job_recognized.connect(self.handle_offline_result)
+        self.offline_drain.pending_changed.connect(self.handle_offline_pending)
+        self.offline_drain.start()
+        self.service.reconcile_offline_results()
+
+        # OCR请求调度：并发识别、截止时间和对冲请求，可在配置文件中用 ocr_workers / ocr_hedge 调整
+        config = self.load_config()
+        if config.get('ocr_url'):
+            set_ocr_url(config['ocr_url'])
+        if config.get('chemical_catalog'):
+            chemical.set_catalog_path(config['chemical_catalog'])
+        log.info("化学品参考库", path=chemical.CATALOG_PATH, version=chemical.catalog_info().get('version'))
+        self.ocr_dispatcher = OCRDispatcher(max_workers=config.get('ocr_workers', 2),
+                                            hedge=config.get('ocr_hedge', True))
+
+    def start_network_services(self):
+        # 无线网络管理在后台扫描，打开WiFi对话框时直接显示缓存结果
+        self.network_manager = NetworkManager()
+        self.network_manager.start()
+
+        # 多站同步：配置文件中设置 sync_endpoint 后，定期把新增记录发送到中心服务器
+        config = self.load_config()
+        if config.get('sync_endpoint'):
+            if not config.get('station_id'):
+                # 没有站点编号时产品ID落在 0 号段，各站的数据在中心库中会互相冲突而丢失
+                log.error("未设置 station_id，不启动多站同步", endpoint=config['sync_endpoint'])
+                self.ui.log_browser.append('<font color="red">未设置站点编号（station_id），多站同步未启动</font>')
+                return
+            self.sync_service = SyncService(self.db_manager.db_path, config['sync_endpoint'],
+                                            int(config['station_id']))
+            self.sync_service.synced.connect(self.handle_sync_result)
+            self.sync_service.sync_error.connect(self.handle_sync_error)
+            self.sync_service.start()
+
+    def start_metrics_export(self):
+        """
+        按配置输出性能指标：metrics_port 为本机 HTTP 接口（GET /metrics），
+        metrics_file 为定期写入的 Prometheus 文本文件（建议放在 /dev/shm 等内存文件系统）。
+        """
+        config = self.load_config()
+        if not REGISTRY.enabled:
+            return
+        if config.get('metrics_port'):
+            self.metrics_server = MetricsServer(int(config['metrics_port']))
+            self.metrics_server.start()
+        if config.get('metrics_file'):
+            self.metrics_file = config['metrics_file']
+            self.metrics_timer = QTimer()
+            self.metrics_timer.timeout.connect(self.dump_metrics_file)
+            self.metrics_timer.start(15 * 1000)
+
+    def start_station_api(self):
+        """
+        配置文件中设置 api_port 后启动站点接口（HTTP / WebSocket），供 LIMS、看板查询库存和订阅读数。
+        api_host 为监听地址，api_token 为访问令牌，api_enroll 为 true 时接受远程录入。
+        """
+        config = self.load_config()
+        if not config.get('api_port'):
+            return
+        enroll = None
+        if config.get('api_enroll'):
+            # 录入在主线程中执行，与界面操作不会同时写数据库
+            self.api_bridge = MainThreadBridge()
+            enroll = lambda fields, warehouse_id: self.api_bridge.submit(self.service.enroll_remote,
+                                                                         fields, warehouse_id)
+        self.station_api = StationAPI(self.db_manager.db_path, int(config['api_port']),
+                                      host=config.get('api_host', '0.0.0.0'), token=config.get('api_token'),
+                                      enroll=enroll, station_info={'station_id': config.get('station_id'),
+                                                                   'warehouse_id': self.get_warehouse_id()})
+        self.service.subscribe(self.station_api.handle_service_event)
+        self.station_api.start()
+
+    def dump_metrics_file(self):
+        try:
+            dump_metrics(self.metrics_file)
+        except OSError as e:
+            log.warning("写入性能指标文件失败: %s", e)
+
+    def show_diagnostics(self):
+        """性能诊断面板"""
+        dialog = DiagnosticsDialog(self.ui)
+        dialog.exec_()
+
+    def browse_inventory(self):
+        """库存浏览，默认筛选当前仓库"""
+        dialog = InventoryBrowserDialog(self.db_manager.db_path, self.ui, warehouse_id=self.get_warehouse_id())
+        dialog.exec_()
+
+    def finish_startup(self):
+        for button in self.service_buttons:
+            button.setEnabled(True)
+        self.ui.status_bar.showMessage("就绪")
+        self.check_due_alerts()
+        active = self.alert_engine.active_alerts()
+        if active:
+            self.ui.log_browser.append(f'<font color="red">当前有 {len(active)} 条库存提醒，可在“导出数据”中导出</font>')
+
     def setup_table(self):
         """设置表格参数"""
-        # 设置录入表格行数
-        self.ui.input_table.setRowCount(12)
-        
-        # 定义参数名称
-        parameters = [
-            "净含量",
-            "位置",
-            "cas",
-            "lot",
-            "名称",
-            "中文名称",
-            "分子式",
-            "分子量",
-            "纯度"
-        ]
-        
-        # 设置参数名称
-        for i, param in enumerate(parameters):
-            self.ui.input_table.setItem(i, 0, QtWidgets.QTableWidgetItem(param))
-            self.ui.input_table.setItem(i, 1, QtWidgets.QTableWidgetItem(""))
-            
-        # 设置使用表格的固定参数
-        self.ui.use_table.setRowCount(14)  # 修改为14行
-        self.ui.use_table.setItem(0, 0, QtWidgets.QTableWidgetItem("使用量"))
-        self.ui.use_table.setItem(1, 0, QtWidgets.QTableWidgetItem("最新净含量"))
+        self.ui.input_model.set_rows(ENROLL_FIELDS)
+        # 使用表格：使用量、最新净含量，其后是扫码记录的字段
+        self.ui.use_model.set_rows(["使用量", "最新净含量"] + USE_FIELDS)
 
     def set_port(self):
         """设置串口按钮功能"""
         dialog = SerialConfigDialog(self.ui)  # 使用 self.ui 作为父对象
         if dialog.exec_() == QDialog.Accepted:
             selected_port, baud_rate = dialog.get_settings()
-            print(f"Selected Port: {selected_port}, Baud Rate: {baud_rate}")
+            log.info("天平串口设置", port=selected_port, baudrate=baud_rate)
       
             if self.user_weight_thread is not None:
                 if self.user_weight_thread.running:
@@ -103,35 +274,33 @@ class MainUIEvent:
             self.ui.log_browser.append("串口设置成功")
     
     def get_weight(self, weight):
-        """获取重量"""
-        print(f"重量: {weight}")
-        # 将重量值显示在使用表格的使用量行
-        self.ui.use_table.setItem(0, 1, QtWidgets.QTableWidgetItem(str(weight)))
-        if self.get_record_from_sql_flag:
-            # 获取weight的小数位数
-            weight_str = str(weight)
-            decimal_places = len(weight_str.split('.')[1]) if '.' in weight_str else 0
-            
-            # 计算净含量并格式化
-            jing_han_liang = self.jing_han_liang - weight
-            formatted_jing_han_liang = f"{jing_han_liang:.{decimal_places}f}"
-            self.ui.use_table.setItem(1, 1, QtWidgets.QTableWidgetItem(formatted_jing_han_liang))
+        """获取重量，已扫码时由服务计算剩余量"""
+        self.service.update_weight(weight, self.user_weight_thread.precision)
 
 
     def export_data(self):
         """导出数据按钮功能"""
-        print("导出数据按钮被点击")
-        # 在这里添加数据导出的逻辑
+        dialog = ExportDialog(self.db_manager.db_path, self.ui, analytics=self.analytics)
+        dialog.exec_()
+
+    def handle_alert(self, alert):
+        """新产生的库存提醒"""
+        self.ui.log_browser.append(f'<font color="red">[{alert["类型"]}] {alert["内容"]}</font>')
+
+    def check_due_alerts(self):
+        """检查久未使用和过期提醒"""
+        try:
+            self.alert_engine.check_due()
+        except Exception as e:
+            log.exception("检查库存提醒出错: %s", e)
 
     def clear_input_table_values(self):
         """清空录入表格的数值列"""
-        for row in range(self.ui.input_table.rowCount()):
-            self.ui.input_table.setItem(row, 1, QtWidgets.QTableWidgetItem(""))
+        self.ui.input_model.clear_values()
 
     def clear_use_table_values(self):
         """清空使用表格的数值列"""
-        for row in range(self.ui.use_table.rowCount()):
-            self.ui.use_table.setItem(row, 1, QtWidgets.QTableWidgetItem(""))
+        self.ui.use_model.clear_values()
 
     def input_data(self):
         """数据录入按钮功能"""
@@ -148,7 +317,7 @@ class MainUIEvent:
         if self.ocr_thread is None:
             try:
                 # 创建OCR服务线程
-                self.ocr_thread = OCRThread()
+                self.ocr_thread = OCRThread(self.ocr_dispatcher)
                 self.ocr_thread.ocr_result_signal.connect(self.handle_ocr_result)
                 self.ocr_thread.error_signal.connect(self.handle_ocr_error)  # 连接错误信号
                 self.ocr_thread.start()  # 启动服务线程，它会自动挂起等待数据
@@ -157,48 +326,50 @@ class MainUIEvent:
         
         # 如果有当前帧，发送给OCR服务线程
         if self.current_frame is not None:
+            self.ocr_frame = self.current_frame
+            if not self.offline_drain.online:
+                # 已知网络不可用，不再等待超时，直接离线录入
+                self.start_offline_entry()
+                return
             self.ui.log_browser.append("正在进行OCR识别")
             self.ocr_thread.process_image(self.current_frame)  # 发送图像数据给OCR服务线程
         else:
             self.ui.log_browser.append("错误：没有可用的图像数据")
 
+    def batch_input(self):
+        """批量录入按钮功能：连续拍摄多瓶，核对后一次保存并批量打印"""
+        self.ui.table_stack.setCurrentWidget(self.ui.input_table)
+        dialog = BatchEnrollDialog(self.ui, lambda: self.current_frame, self.service,
+                                   self.get_warehouse_id(), self.ocr_dispatcher)
+        dialog.exec_()
+        if dialog.saved_count:
+            self.ui.log_browser.append(f"批量录入保存成功：{dialog.saved_count} 瓶")
+        dialog.deleteLater()
+
     def handle_ocr_result(self, result):
         """处理OCR识别结果"""
         try:
-            # 获取data字段
-            ocr_text = result.get('data', '')
-            # print(ocr_text)
-            cas_number, cas_success = extract_cas_number(ocr_text)
-            lot_number, lot_success = extract_lot_number_from_data(ocr_text)
-            weight, weight_success = extract_weight_from_data(ocr_text)
-            purity, purity_success = extract_purity_from_data(ocr_text)
-            
-            # print("result:")
-            # print(f"CAS号: {cas_number}, 批号: {lot_number}, 重量: {weight}, 纯度: {purity}")
-            if cas_success:
-                self.ui.input_table.setItem(2, 1, QtWidgets.QTableWidgetItem(str(cas_number)))
-            if lot_success:
-                self.ui.input_table.setItem(3, 1, QtWidgets.QTableWidgetItem(str(lot_number)))
-            if weight_success:
-                self.ui.input_table.setItem(0, 1, QtWidgets.QTableWidgetItem(str(weight)))
-            if purity_success:
-                self.ui.input_table.setItem(8, 1, QtWidgets.QTableWidgetItem(str(purity)))
-
-            # 记录日志
-            self.ui.log_browser.append("OCR识别完成")
-            self.ocr_result_flag = True
-            
+            self.service.apply_ocr_result(result.get('data', ''))
+            self.offline_drain.set_online(True)
         except Exception as e:
             self.ui.log_browser.append(f"处理OCR结果错误: {str(e)}")
 
-    def query_chemical_info(self, cas_number):
-        """查询化学品信息"""
-        chemical_info = query_by_cas_number(cas_number)
-        self.ui.input_table.setItem(7, 1, QtWidgets.QTableWidgetItem(str(chemical_info[1])))
-        self.ui.input_table.setItem(6, 1, QtWidgets.QTableWidgetItem(str(chemical_info[2])))
-        self.ui.input_table.setItem(5, 1, QtWidgets.QTableWidgetItem(str(chemical_info[3])))
-        self.ui.input_table.setItem(4, 1, QtWidgets.QTableWidgetItem(str(chemical_info[4])))
-    
+    def start_offline_entry(self):
+        """网络不可用时的录入：暂存图像，允许先保存并打印标签，识别结果稍后补全"""
+        self.service.start_offline_entry(self.ocr_frame)
+
+    def handle_offline_result(self, job_id, product_id, warehouse_id, result):
+        """离线任务识别完成，把结果写回 records"""
+        self.service.reconcile_offline_results()
+
+    def handle_offline_pending(self, count):
+        """显示剩余离线任务数"""
+        self.offline_pending_gauge.set(count)
+        if count:
+            self.ui.status_bar.showMessage(f"离线待识别: {count}")
+        else:
+            self.ui.status_bar.showMessage("离线任务已全部识别")
+
     def handle_camera_frame(self, frame):
         """处理摄像头帧数据"""
         self.current_frame = frame
@@ -211,8 +382,7 @@ class MainUIEvent:
         self.clear_use_table_values()
         # 切换到使用表格
         self.ui.table_stack.setCurrentWidget(self.ui.use_table)
-        self.last_qr_result = None
-        self.get_message_for_qr_result_flag = False
+        self.service.begin_use()
         
         # 停止OCR服务线程
         if self.ocr_thread is not None:
@@ -222,7 +392,7 @@ class MainUIEvent:
                 if self.ocr_thread.isRunning():  # 如果线程还在运行
                     self.ocr_thread.terminate()  # 强制终止线程
             except Exception as e:
-                print(f"停止OCR线程时出错: {str(e)}")
+                log.warning("停止OCR线程时出错: %s", e)
             finally:
                 self.ocr_thread = None
         
@@ -239,83 +409,27 @@ class MainUIEvent:
                 self.ui.log_browser.append("错误：请先设置串口")
 
     def insert_record_into_use_table(self, record):
-        """将记录数据按照固定顺序插入到使用表格中，同时显示键和值"""
-        # 定义字段顺序
-        field_order = [
-            '中文名称',
-            '名称',
-            '分子式',
-            '分子量',
-            'cas',
-            '净含量',
-            '位置',
-            'lot',
-            '纯度',
-            '仓库_id',
-            '产品_id',
-            '录入时间'
-        ]
-        
-        # 从第2行开始插入数据
-        for row, field in enumerate(field_order, start=2):
-            # 插入键（参数名）
-            self.ui.use_table.setItem(row, 0, QtWidgets.QTableWidgetItem(field))
-            
-            # 获取值并处理
+        """将记录数据按照固定顺序显示到使用表格中"""
+        values = {}
+        for field in USE_FIELDS:
             value = record.get(field, '')
+            if field == '净含量':
+                quantity = Quantity.from_record(record)
+                value = quantity.display() if quantity is not None else ''
             # 如果值为'null'，则显示为空
             if value == 'null':
                 value = ''
-            # 插入值
-            self.ui.use_table.setItem(row, 1, QtWidgets.QTableWidgetItem(str(value)))
-
-    def get_message_for_qr_result(self, result_id):
-        """获取二维码结果对应的数据
-        :param result_id: 二维码结果ID
-        :return: bool - 是否成功查询到数据
-        """
-        # 分割 result_id 并转换为 int 类型
-        parts = result_id.split(':')
-        if len(parts) == 2:
-            part1 = int(parts[0])
-            part2 = int(parts[1].split(';')[0])  # 假设分号后面还有其他数据，这里只取分号前的部分
-            print(f"Part 1: {part1}, Part 2: {part2}")
-        else:
-            print("Invalid format of result_id")
-            return False
-            
-        try:
-            record = self.db_manager.get_change_logs_as_dict(part2,part1)  # 使用分割后的第一部分作为 product_id
-            if record == None:
-                record = self.db_manager.get_record_from_main_table(part2,part1)
-            if record:
-                print("成功获取记录:", record)
-                self.use_data_flag = True
-                self.get_record_from_sql_flag = True
-                self.clear_use_table_values()
-                self.insert_record_into_use_table(record)
-                self.jing_han_liang = float(record["净含量"])
-                return True
-            else:
-                self.ui.log_browser.append('<font color="red">未找到对应数据，请先录入</font>')
-                return False
-        except Exception as e:
-            print("发生异常:", str(e))
-            return False
+            values[field] = value
+        self.ui.use_model.update(values)
 
     def get_qr_result(self, data):
-        """获取二维码结果"""
+        """获取二维码结果：去重、查询和锁定由服务处理"""
         try:
-            if self.get_message_for_qr_result_flag is False:
-                if data != self.last_qr_result:
-                    self.ui.log_browser.append(f"获取到二维码结果: {data}")
-                    if self.get_message_for_qr_result(data):
-                        self.get_message_for_qr_result_flag = True
-                        self.last_qr_result = data
+            if self.service.handle_scan(data) and self.serial_communicator is not None:
+                # 记录扫码到界面显示的延迟
+                self.serial_communicator.record_ui_latency()
         except Exception as e:
-            print(f"{e}")
-
-        
+            log.exception("处理扫码结果出错: %s", e)
 
     def get_warehouse_id(self):
         """获取仓库ID的值"""
@@ -323,218 +437,257 @@ class MainUIEvent:
 
     def get_input_table_data(self):
         """获取输入表格的数据，返回字典形式，空值以null表示"""
-        data = {}
-        for row in range(self.ui.input_table.rowCount()):
-            param_item = self.ui.input_table.item(row, 0)  # 参数名
-            value_item = self.ui.input_table.item(row, 1)  # 参数值
-            
-            # 只有当参数名和数值都为空时才跳过
-            if not param_item and not value_item:
-                continue
-                
-            # 获取参数名，如果为空则跳过
-            if not param_item:
-                continue
-            param_name = param_item.text().strip()
-            
-            # 获取参数值，如果为空则设为null
-            param_value = "null"
-            if value_item and value_item.text().strip():
-                param_value = value_item.text().strip()
-                
-            data[param_name] = param_value
-        return data
+        return self.ui.input_model.to_dict()
 
     def get_use_table_data(self):
         """获取使用表格的数据，返回字典形式，空值以null表示"""
-        data = {}
-        for row in range(self.ui.use_table.rowCount()):
-            param_item = self.ui.use_table.item(row, 0)  # 参数名
-            value_item = self.ui.use_table.item(row, 1)  # 参数值
-            
-            # 只有当参数名和数值都为空时才跳过
-            if not param_item and not value_item:
-                continue
-                
-            # 获取参数名，如果为空则跳过
-            if not param_item:
-                continue
-            param_name = param_item.text().strip()
-            
-            # 获取参数值，如果为空则设为null
-            param_value = "null"
-            if value_item and value_item.text().strip():
-                param_value = value_item.text().strip()
-                
-            data[param_name] = param_value
-        return data
+        return self.ui.use_model.to_dict()
 
     def save_table(self):
         """保存表格按钮功能"""
-        print("保存表格按钮被点击")
-        self.get_message_for_qr_result_flag = False
+        self.service.release_scan()
         self.ui.log_browser.append("开始保存")
         # 根据当前显示的表格决定保存哪个表格的数据
         current_table = self.ui.table_stack.currentWidget()
-        if current_table == self.ui.input_table and self.ocr_result_flag:
-            print("此时是录入表格")
-            self.input_data_dict = self.get_input_table_data()
-            self.input_data_dict['仓库_id'] = self.get_warehouse_id()
-            print(self.input_data_dict)
-            self.product_id = self.db_manager.insert_initial_data(self.input_data_dict)
-            self.db_manager.print_records_contents()
-            self.ui.log_browser.append("保存成功")
-            self.ocr_result_flag = False
-        elif current_table == self.ui.input_table and not self.ocr_result_flag:
-            self.ui.log_browser.append("请先点击录入按钮进行内容识别")
-        if current_table == self.ui.use_table and self.use_data_flag:
-            print("此时是使用表格")
-            use_data = self.get_use_table_data()
-            # 将净含量的值替换为最新净含量的值
-            if '最新净含量' in use_data:
-                use_data['净含量'] = use_data['最新净含量']
-                del use_data['最新净含量']
-            
-            # 确保净含量的小数位数与原始数据一致
-            if '净含量' in use_data:
-                # 获取原始净含量的小数位数
-                original_net_weight = use_data['净含量']
-                decimal_places = len(original_net_weight.split('.')[1]) if '.' in original_net_weight else 0
-                # 格式化净含量，保持原始小数位数
-                use_data['净含量'] = f"{float(original_net_weight):.{decimal_places}f}"
-            
-            print(use_data)
-            self.db_manager.insert_change_log_from_dict(use_data)
-            self.db_manager.print_change_logs_contents()
-            self.ui.log_browser.append("保存成功")
-            self.get_record_from_sql_flag = False
-            self.use_data_flag = False
-        elif current_table == self.ui.use_table and not self.use_data_flag:
-            self.ui.log_browser.append("请点击使用按钮再次识别同一二维码或放入新的二维码识别")
-            
+        if current_table == self.ui.input_table:
+            if self.service.recognized:
+                self.service.enroll(self.get_input_table_data(), self.get_warehouse_id())
+            else:
+                self.ui.log_browser.append("请先点击录入按钮进行内容识别")
+        elif current_table == self.ui.use_table:
+            if self.service.current_record is not None:
+                self.service.record_use(self.get_use_table_data())
+            else:
+                self.ui.log_browser.append("请点击使用按钮再次识别同一二维码或放入新的二维码识别")
 
     def print_qr(self):
         """打印二维码按钮功能"""
-        print("打印二维码按钮被点击")
         if self.ui.table_stack.currentWidget() == self.ui.input_table:
             self.ui.log_browser.append("开始打印")
-            # 检查input_data_dict是否存在且包含必要数据
-            if not self.input_data_dict:
+            if not self.service.last_enrolled:
                 self.ui.log_browser.append("错误：没有可用的数据")
                 return
-            
-            product_id = self.product_id
-                
-            # 获取仓库ID和产品ID
-            warehouse_id = self.input_data_dict.get('仓库_id')
-            position = self.input_data_dict.get('位置', '')
-            
-            if warehouse_id is None or product_id is None:
-                self.ui.log_browser.append("错误：缺少仓库ID或产品ID")
+            # 加入后台打印队列，不等待打印完成即可录入下一瓶
+            try:
+                self.service.print_enrolled_label()
+            except ValueError as e:
+                self.ui.log_browser.append(f'<font color="red">打印失败：{e}</font>')
                 return
-                
-            # 生成二维码内容
-            content = f"{warehouse_id}:{product_id}"
-            content1 = position if position else "未知位置"
-            
-            # 调用打印函数
+            self.clear_input_table_values()
+        elif self.ui.table_stack.currentWidget() == self.ui.use_table:
+            self.print_use_labels()
+
+    def print_use_labels(self):
+        """使用表格下的打印：重打当前瓶子的标签，或打印所在货架的全部标签"""
+        use_data = self.get_use_table_data()
+        warehouse_id = use_data.get('仓库_id', 'null')
+        product_id = use_data.get('产品_id', 'null')
+        if warehouse_id == 'null' or product_id == 'null':
+            self.ui.log_browser.append("错误：请先扫描二维码")
+            return
+        position = use_data.get('位置', 'null')
+
+        choice, ok = QInputDialog.getItem(self.ui, "打印", "选择打印内容:",
+                                          ["重打当前标签", "打印当前货架全部标签"], 0, False)
+        if not ok:
+            return
+        try:
+            if choice == "重打当前标签":
+                copies, ok = QInputDialog.getInt(self.ui, "打印", "打印份数:", 1, 1, 50)
+                if ok:
+                    self.service.print_label(warehouse_id, product_id, position, copies)
+            else:
+                self.service.print_shelf(warehouse_id, position)
+        except ValueError as e:
+            self.ui.log_browser.append(f'<font color="red">打印失败：{e}</font>')
+
+    def handle_service_event(self, event):
+        """把服务的事件显示到表格和日志中"""
+        log_browser = self.ui.log_browser
+        if isinstance(event, events.OCRFieldsReady):
+            if event.supplier:
+                log_browser.append(f"识别为供应商：{event.supplier}")
+            self.ui.input_model.update(event.fields)
+            log_browser.append("OCR识别完成")
+        elif isinstance(event, events.OfflineEntryStarted):
+            log_browser.append('<font color="orange">网络不可用，已暂存标签图像。'
+                               '可手动填写后保存并打印，网络恢复后自动补全识别结果</font>')
+        elif isinstance(event, events.ChemicalInfoFound):
+            self.ui.input_model.update(event.fields)
+            log_browser.append(f"已更新CAS号 {event.cas} 对应的化学品信息")
+        elif isinstance(event, events.ChemicalInfoMissing):
+            log_browser.append(f'<font color="red">未找到CAS号 {event.cas} 对应的化学品信息</font>')
+        elif isinstance(event, events.RecordEnrolled):
+            if event.remote:
+                log_browser.append(f"收到远程录入：{event.warehouse_id}:{event.product_id}")
+            elif not event.batch:  # 批量录入在对话框关闭后汇总显示
+                log_browser.append("保存成功")
+        elif isinstance(event, events.ProfileLearned):
+            log_browser.append(f"已记住 {event.supplier} 标签格式：{'、'.join(event.fields)}")
+        elif isinstance(event, events.OfflineJobQueued):
+            log_browser.append(f"已加入离线识别队列（{event.pending} 个待识别）")
+        elif isinstance(event, events.OfflineRecordCompleted):
+            log_browser.append(f"离线识别完成：产品 {event.warehouse_id}:{event.product_id} "
+                               f"已补全 {'、'.join(event.fields)}")
+        elif isinstance(event, events.ScanAccepted):
+            log_browser.append(f"获取到二维码结果: {event.code}")
+        elif isinstance(event, events.RecordLoaded):
+            self.clear_use_table_values()
+            self.insert_record_into_use_table(event.record)
+        elif isinstance(event, events.RecordNotFound):
+            log_browser.append('<font color="red">未找到对应数据，请先录入</font>')
+        elif isinstance(event, events.WeightChanged):
+            # 将重量值显示在使用表格的使用量行，剩余量显示在最新净含量行（数值不变时不刷新）
+            self.ui.use_model.set_value("使用量", event.weight)
+            if event.remaining is not None:
+                self.ui.use_model.set_value("最新净含量", event.remaining.display())
+        elif isinstance(event, events.UsageRecorded):
+            log_browser.append("保存成功")
+            if event.forecast and event.forecast['预计用完']:
+                log_browser.append(f"近期日用量约 {event.forecast['日用量'].display()}，"
+                                   f"预计 {event.forecast['预计用完']} 用完")
+        elif isinstance(event, events.LabelsQueued):
+            log_browser.append(f"已加入打印队列：{event.description}（等待 {event.pending} 个）")
+        elif isinstance(event, events.ServiceError):
+            log_browser.append(f'<font color="red">{event.message}</font>')
+
+    def handle_print_finished(self, job_id, description):
+        """打印任务完成"""
+        self.ui.log_browser.append(f"打印完成：{description}")
+
+    def handle_print_failed(self, job_id, message):
+        """打印任务失败"""
+        self.ui.log_browser.append(f'<font color="red">打印失败：{message}</font>')
+
+    def handle_printer_status(self, status):
+        """打印机状态变化（缺纸、离线等）"""
+        text = STATUS_TEXT.get(status, status)
+        if status in (STATUS_PAPER_OUT, STATUS_OFFLINE):
+            self.ui.log_browser.append(f'<font color="red">{text}</font>')
+        self.ui.status_bar.showMessage(text)
+
+    def handle_sync_result(self, sent, conflicts):
+        """同步完成"""
+        self.ui.status_bar.showMessage(f"已同步 {sent} 条记录到中心服务器")
+        for conflict in conflicts:
+            self.ui.log_browser.append(
+                f'<font color="red">同步冲突: {conflict["table"]} 中的 {conflict["id"]} 与中心库已有数据不一致</font>')
+
+    def handle_sync_error(self, error_message):
+        """同步失败，下次同步时自动重发"""
+        self.ui.status_bar.showMessage(f"同步失败: {error_message}")
+
+    def closeEvent(self):
+        """关闭窗口时释放资源：各服务分别停止，其中一个出错不影响其余的服务"""
+        for name, stop in self.shutdown_steps():
             try:
-                print_string_to_printer(content, content1)
-                self.ui.log_browser.append("打印成功")
-                self.clear_input_table_values()
+                stop()
             except Exception as e:
-                self.ui.log_browser.append(f"打印失败：{e}")
+                log.exception("停止%s出错: %s", name, e)
+        shutdown_logging()
 
-    def closeEvent(self):
-        """关闭窗口时释放资源"""
-        try:
-            # 停止串口通信
-            if self.serial_communicator is not None:
-                self.serial_communicator.stop()
-                self.serial_communicator.stop_threads()
-            
-            # 停止OCR服务线程
-            if self.ocr_thread is not None:
-                self.ocr_thread.stop()
-                
-            # 停止重量线程
-            if self.user_weight_thread is not None:
-                self.user_weight_thread.stop()
-        except Exception as e:
-            pass
+    def shutdown_steps(self):
+        """关闭时依次执行的 (名称, 函数)；启动未完成时部分服务尚未创建，跳过即可"""
+        steps = []
+        if self.serial_communicator is not None:
+            steps.append(("串口通信", self._stop_serial))
+        if self.ocr_thread is not None:
+            steps.append(("OCR线程", lambda: self.ocr_thread.stop()))
+        if self.ocr_dispatcher is not None:
+            steps.append(("OCR调度器", self._stop_ocr_dispatcher))
+        if self.user_weight_thread is not None:
+            steps.append(("重量线程", lambda: self.user_weight_thread.stop()))
+        if self.printer_service is not None:
+            steps.append(("打印服务", lambda: self.printer_service.stop()))
+        if self.offline_drain is not None:
+            steps.append(("离线识别", self._stop_offline_drain))
+        if self.network_manager is not None:
+            steps.append(("网络管理", lambda: self.network_manager.stop()))
+        if self.sync_service is not None:
+            steps.append(("多站同步", lambda: self.sync_service.stop()))
+        if self.alert_timer is not None:
+            steps.append(("库存提醒", lambda: self.alert_timer.stop()))
+        if self.metrics_timer is not None:
+            steps.append(("指标导出", self._stop_metrics_dump))
+        if self.metrics_server is not None:
+            steps.append(("指标服务", lambda: self.metrics_server.stop()))
+        if self.station_api is not None:
+            steps.append(("站点接口", lambda: self.station_api.stop()))
+        return steps
+
+    def _stop_serial(self):
+        self.serial_communicator.stop()
+        self.serial_communicator.stop_threads()
+
+    def _stop_ocr_dispatcher(self):
+        self.ocr_dispatcher.shutdown()
+        log.info("OCR耗时统计", **self.ocr_dispatcher.stats())
+
+    def _stop_offline_drain(self):
+        self.offline_drain.stop()
+        self.offline_queue.close()
+
+    def _stop_metrics_dump(self):
+        self.metrics_timer.stop()
+        self.dump_metrics_file()
 
     def handle_ocr_error(self, error_message):
         """处理OCR错误"""
         self.ui.log_browser.append(f'<font color="red">{error_message}</font>')
-        # 如果OCR服务不可用，停止OCR线程
+        # 如果OCR服务不可用，停止OCR线程，转为离线录入
         if "无法连接到OCR服务" in error_message or "OCR服务响应超时" in error_message:
             if self.ocr_thread is not None:
                 self.ocr_thread.stop()
                 self.ocr_thread = None
-
-    def handle_cell_changed(self, row, column):
-        """处理表格单元格内容改动
-        :param row: 行号
-        :param column: 列号
+            self.offline_drain.set_online(False)
+            if self.ocr_frame is not None:
+                self.start_offline_entry()
+
+    def handle_value_edited(self, name, value):
+        """操作员修改了录入表格中的数值
+        :param name: 参数名
+        :param value: 新的数值
         """
-        # 只处理第二列（数值列）的改动
-        if column != 1:
-            return
-            
-        # 获取参数名
-        param_item = self.ui.input_table.item(row, 0)
-        if not param_item:
-            return
-            
-        param_name = param_item.text().strip()
-        
-        # 如果是CAS号行
-        if param_name == "cas":
-            # 获取新的CAS号值
-            value_item = self.ui.input_table.item(row, column)
-            if value_item:
-                new_cas = value_item.text().strip()
-                if new_cas:  # 如果CAS号不为空
-                    try:
-                        # 查询化学品信息
-                        chemical_info = query_by_cas_number(new_cas)
-                        if chemical_info:
-                            # 更新其他字段
-                            self.ui.input_table.setItem(7, 1, QtWidgets.QTableWidgetItem(str(chemical_info[1])))  # 分子量
-                            self.ui.input_table.setItem(6, 1, QtWidgets.QTableWidgetItem(str(chemical_info[2])))  # 分子式
-                            self.ui.input_table.setItem(5, 1, QtWidgets.QTableWidgetItem(str(chemical_info[3])))  # 中文名称
-                            self.ui.input_table.setItem(4, 1, QtWidgets.QTableWidgetItem(str(chemical_info[4])))  # 名称
-                            self.ui.log_browser.append(f"已更新CAS号 {new_cas} 对应的化学品信息")
-                        else:
-                            self.ui.log_browser.append(f'<font color="red">未找到CAS号 {new_cas} 对应的化学品信息</font>')
-                    except Exception as e:
-                        self.ui.log_browser.append(f'<font color="red">查询化学品信息出错: {str(e)}</font>')
+        # 如果是CAS号行，查到的化学品信息由 ChemicalInfoFound 事件填入表格
+        if name == "cas" and value.strip():
+            self.service.lookup_chemical(value.strip())
 
     def wifi_settings(self):
         """WiFi设置按钮功能"""
-        dialog = WiFiDialog(self.ui)
+        dialog = WiFiDialog(self.ui, self.network_manager)
         dialog.exec_()
+        dialog.deleteLater()
+
+    def load_config(self):
+        """读取JSON配置文件，文件不存在或损坏时返回空字典"""
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            log.warning("读取配置文件失败: %s", e)
+        return {}
+
+    def save_config(self, **values):
+        """更新JSON配置文件中的指定项，保留其他配置"""
+        config = self.load_config()
+        config.update(values)
+        with open(self.config_file, 'w') as f:
+            json.dump(config, f)
 
     def save_warehouse_id(self):
         """保存仓库ID到JSON文件"""
         warehouse_id = self.ui.warehouse_id_spinbox.value()
-        config = {
-            'warehouse_id': warehouse_id
-        }
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f)
+            self.save_config(warehouse_id=warehouse_id)
         except Exception as e:
             self.ui.log_browser.append(f"保存仓库ID失败: {str(e)}")
 
     def load_warehouse_id(self):
         """从JSON文件加载仓库ID"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                    warehouse_id = config.get('warehouse_id', 1)  # 默认值为1
-                    self.ui.warehouse_id_spinbox.setValue(warehouse_id)
+            warehouse_id = self.load_config().get('warehouse_id', 1)  # 默认值为1
+            self.ui.warehouse_id_spinbox.setValue(warehouse_id)
         except Exception as e:
             self.ui.log_browser.append(f"加载仓库ID失败: {str(e)}")
             self.ui.warehouse_id_spinbox.setValue(1)  # 如果加载失败，设置默认值
\ No newline at end of file
@@ -0,0 +1,106 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+
+PARAMETER_HEADERS = ["参数", "数值"]
+
+
+class ParameterTableModel(QAbstractTableModel):
+    """
+    录入/使用表格的数据模型：每行一个 参数 -> 数值，数值只保存字符串。
+    程序更新（识别结果、天平读数、扫码记录）只对变化的单元格发出 dataChanged，
+    不会触发 value_edited；只有用户在表格中编辑数值时才发出 value_edited(参数, 数值)。
+    """
+    value_edited = pyqtSignal(str, str)
+
+    def __init__(self, names=(), parent=None):
+        super().__init__(parent)
+        self.names = list(names)
+        self.values = [""] * len(self.names)
+        self.rows = {name: row for row, name in enumerate(self.names)}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PARAMETER_HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        if index.column() == 0:
+            return self.names[index.row()]
+        return self.values[index.row()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return PARAMETER_HEADERS[section]
+        return section + 1
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == 1:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """表格视图中的用户编辑"""
+        if not index.isValid() or index.column() != 1 or role != Qt.EditRole:
+            return False
+        name = self.names[index.row()]
+        if self._store(index.row(), value):
+            self.value_edited.emit(name, self.values[index.row()])
+        return True
+
+    def _store(self, row, value):
+        """保存数值并刷新该单元格，数值没有变化时返回 False"""
+        value = "" if value is None else str(value)
+        if self.values[row] == value:
+            return False
+        self.values[row] = value
+        index = self.index(row, 1)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def set_rows(self, names):
+        """重新设置参数行并清空数值；行名不变时只清空数值"""
+        names = list(names)
+        if names == self.names:
+            self.clear_values()
+            return
+        self.beginResetModel()
+        self.names = names
+        self.values = [""] * len(names)
+        self.rows = {name: row for row, name in enumerate(names)}
+        self.endResetModel()
+
+    def set_value(self, name, value):
+        """程序设置某个参数的数值，参数不存在时忽略"""
+        row = self.rows.get(name)
+        if row is not None:
+            self._store(row, value)
+
+    def update(self, values):
+        """按参数名批量设置数值，发出一次覆盖变化行范围的 dataChanged"""
+        changed = []
+        for name, value in values.items():
+            row = self.rows.get(name)
+            value = "" if value is None else str(value)
+            if row is not None and self.values[row] != value:
+                self.values[row] = value
+                changed.append(row)
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 1), self.index(max(changed), 1),
+                                  [Qt.DisplayRole, Qt.EditRole])
+
+    def clear_values(self):
+        self.update({name: "" for name in self.names})
+
+    def value(self, name):
+        row = self.rows.get(name)
+        return self.values[row] if row is not None else ""
+
+    def to_dict(self):
+        """参数 -> 数值的字典，空值以 null 表示"""
+        return {name: value.strip() or "null" for name, value in zip(self.names, self.values) if name}
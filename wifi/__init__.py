@@ -1,3 +1,4 @@
 from .wifi_dialog import WiFiDialog
+from .network_manager import NetworkManager
 
-__all__ = ['WiFiDialog'] 
\ No newline at end of file
+__all__ = ['WiFiDialog', 'NetworkManager'] 
\ No newline at end of file
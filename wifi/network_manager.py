@@ -0,0 +1,331 @@
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from PyQt5 import QtCore
+from wifi.wpa_ctrl import WpaCtrl, WpaCtrlError, decode_ssid, encode_ssid, encode_psk
+from applog import get_logger
+
+
+log = get_logger('wifi')
+
+
+class ScanEntry:
+    """一条扫描结果"""
+
+    def __init__(self, ssid, signal, seen_at):
+        self.ssid = ssid
+        self.signal = signal  # dBm
+        self.seen_at = seen_at  # time.monotonic
+
+    @property
+    def age(self):
+        """距上次扫描到该网络的秒数"""
+        return time.monotonic() - self.seen_at
+
+
+class NetworkManager(QtCore.QObject):
+    """
+    无线网络管理服务。
+    在后台线程中通过 wpa_supplicant 控制接口扫描和连接，缓存扫描结果（信号强度和时间），
+    并把连接状态变化作为信号发出。打开WiFi对话框时直接使用缓存，不再同步扫描。
+    没有控制接口时退回到 iwlist/iwconfig 命令。
+    """
+    scan_updated = QtCore.pyqtSignal(object)  # [ScanEntry, ...]，按信号强度排序
+    state_changed = QtCore.pyqtSignal(str, str)  # wpa_state, 当前SSID（未连接为空）
+    connection_result = QtCore.pyqtSignal(bool, str)
+    disconnect_result = QtCore.pyqtSignal(bool, str)
+
+    def __init__(self, interface='wlan0', ctrl_factory=None, scan_interval=60, entry_ttl=180, connect_timeout=20):
+        """
+        :param ctrl_factory: 创建控制接口连接的函数，默认连接 wpa_supplicant，测试时可传入 FakeWpaCtrl（见 wifi/wpa_replay.py）
+        :param scan_interval: 后台扫描间隔（秒）
+        :param entry_ttl: 扫描结果超过该时间未再出现即从缓存中删除（秒）
+        :param connect_timeout: 连接超时（秒）
+        """
+        super().__init__()
+        self.interface = interface
+        self.ctrl_factory = ctrl_factory or (lambda: WpaCtrl(interface))
+        self.scan_interval = scan_interval
+        self.entry_ttl = entry_ttl
+        self.connect_timeout = connect_timeout
+        self.entries = {}  # ssid -> ScanEntry
+        self.known_networks = {}  # ssid -> network id
+        self.wpa_state = 'UNKNOWN'
+        self.current_ssid = None
+        self.commands = queue.Queue()
+        self.pending_connect = None  # (ssid, network_id, 是否新添加, 截止时间)
+        self.running = False
+        self.thread = None
+        self.ctrl = None
+        self.events = None
+        self.last_scan = 0.0
+
+    def start(self):
+        """启动后台线程"""
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """停止后台线程"""
+        if self.running:
+            self.running = False
+            self.commands.put(None)
+            if self.thread is not None:
+                self.thread.join(timeout=2)
+                self.thread = None
+
+    def cached_networks(self):
+        """返回缓存的扫描结果，按信号强度从强到弱排序"""
+        return sorted(self.entries.values(), key=lambda entry: entry.signal, reverse=True)
+
+    def is_known(self, ssid):
+        """wpa_supplicant 中是否已保存该网络（重连不需要密码）"""
+        return ssid in self.known_networks
+
+    def request_scan(self):
+        """立即扫描一次（异步，结果通过 scan_updated 发出）"""
+        self.commands.put(('scan',))
+
+    def connect_to(self, ssid, password=None):
+        """连接网络（异步，结果通过 connection_result 发出）；已保存的网络可以不提供密码"""
+        self.commands.put(('connect', ssid, password))
+
+    def disconnect_from(self):
+        """断开当前连接（异步，结果通过 disconnect_result 发出）"""
+        self.commands.put(('disconnect',))
+
+    ########## 后台线程 ##########
+
+    def _run(self):
+        try:
+            self.ctrl = self.ctrl_factory()
+            self.events = self.ctrl_factory()
+            self.events.attach()
+        except (WpaCtrlError, OSError) as e:
+            log.warning("wpa_supplicant 控制接口不可用，改用命令行方式: %s", e)
+            self.ctrl = None
+            self._run_legacy()
+            return
+
+        try:
+            self._refresh_status()
+            self._refresh_known_networks()
+            self._scan()
+            while self.running:
+                event = self.events.recv_event(timeout=0.5)
+                if event:
+                    self._handle_event(event)
+                self._process_commands()
+                self._check_pending_connect()
+                if time.monotonic() - self.last_scan > self.scan_interval:
+                    self._scan()
+        except WpaCtrlError as e:
+            log.error("wpa_supplicant 通信错误: %s", e)
+        finally:
+            for ctrl in (self.ctrl, self.events):
+                if ctrl is not None:
+                    ctrl.close()
+
+    def _process_commands(self):
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if command is None:
+                return
+            if command[0] == 'scan':
+                self._scan()
+            elif command[0] == 'connect':
+                self._start_connect(command[1], command[2])
+            elif command[0] == 'disconnect':
+                ok = self.ctrl.request('DISCONNECT').strip() == 'OK'
+                self.disconnect_result.emit(ok, "WiFi已断开连接" if ok else "断开失败")
+
+    def _scan(self):
+        self.last_scan = time.monotonic()
+        # FAIL-BUSY 表示已经在扫描，等待 SCAN-RESULTS 事件即可
+        self.ctrl.request('SCAN')
+
+    def _handle_event(self, event):
+        if event.startswith('CTRL-EVENT-SCAN-RESULTS'):
+            self._update_scan_results()
+        elif event.startswith('CTRL-EVENT-CONNECTED') or event.startswith('CTRL-EVENT-DISCONNECTED'):
+            self._refresh_status()
+            if self.pending_connect and self.current_ssid == self.pending_connect[0]:
+                self._finish_connect(True, "WiFi连接成功")
+        elif event.startswith('CTRL-EVENT-SSID-TEMP-DISABLED') and self.pending_connect:
+            if 'WRONG_KEY' in event:
+                self._finish_connect(False, "密码错误")
+
+    def _update_scan_results(self):
+        now = time.monotonic()
+        lines = self.ctrl.request('SCAN_RESULTS').splitlines()[1:]
+        for line in lines:
+            fields = line.split('\t')
+            if len(fields) < 5 or not fields[4]:
+                continue
+            ssid = decode_ssid(fields[4])
+            signal = int(fields[2])
+            entry = self.entries.get(ssid)
+            # 同名多个接入点时保留最强的信号
+            if entry is None or entry.seen_at < now or signal > entry.signal:
+                self.entries[ssid] = ScanEntry(ssid, signal, now)
+        for ssid in [ssid for ssid, entry in self.entries.items() if now - entry.seen_at > self.entry_ttl]:
+            del self.entries[ssid]
+        self.scan_updated.emit(self.cached_networks())
+
+    def _refresh_status(self):
+        status = dict(line.split('=', 1) for line in self.ctrl.request('STATUS').splitlines() if '=' in line)
+        state = status.get('wpa_state', 'UNKNOWN')
+        ssid = decode_ssid(status['ssid']) if state == 'COMPLETED' and 'ssid' in status else None
+        if state != self.wpa_state or ssid != self.current_ssid:
+            self.wpa_state = state
+            self.current_ssid = ssid
+            self.state_changed.emit(state, ssid or "")
+
+    def _refresh_known_networks(self):
+        self.known_networks = {}
+        for line in self.ctrl.request('LIST_NETWORKS').splitlines()[1:]:
+            fields = line.split('\t')
+            if len(fields) >= 2:
+                self.known_networks[decode_ssid(fields[1])] = int(fields[0])
+
+    def _start_connect(self, ssid, password):
+        if self.pending_connect:
+            self.connection_result.emit(False, "正在连接其他网络")
+            return
+        network_id = self.known_networks.get(ssid)
+        added = False
+        if network_id is None or password:
+            if network_id is None:
+                network_id = int(self.ctrl.request('ADD_NETWORK').strip())
+                added = True
+            self.ctrl.request(f'SET_NETWORK {network_id} ssid {encode_ssid(ssid)}')
+            if password:
+                self.ctrl.request(f'SET_NETWORK {network_id} psk {encode_psk(ssid, password)}')
+            else:
+                self.ctrl.request(f'SET_NETWORK {network_id} key_mgmt NONE')
+        # 已保存的网络直接切换，不需要重启 wpa_supplicant
+        if self.ctrl.request(f'SELECT_NETWORK {network_id}').strip() != 'OK':
+            if added:
+                self.ctrl.request(f'REMOVE_NETWORK {network_id}')
+            self.connection_result.emit(False, "选择网络失败")
+            return
+        self.pending_connect = (ssid, network_id, added, time.monotonic() + self.connect_timeout)
+        if self.current_ssid == ssid and self.wpa_state == 'COMPLETED':
+            self._finish_connect(True, "WiFi连接成功")
+
+    def _check_pending_connect(self):
+        if self.pending_connect and time.monotonic() > self.pending_connect[3]:
+            self._finish_connect(False, "连接超时")
+
+    def _finish_connect(self, success, message):
+        ssid, network_id, added, _ = self.pending_connect
+        self.pending_connect = None
+        if success:
+            self.ctrl.request('SAVE_CONFIG')
+            self.known_networks[ssid] = network_id
+        elif added:
+            self.ctrl.request(f'REMOVE_NETWORK {network_id}')
+        self.connection_result.emit(success, message)
+
+    ########## 没有控制接口时的命令行方式 ##########
+
+    def _run_legacy(self):
+        self._legacy_status()
+        self._legacy_scan()
+        while self.running:
+            try:
+                command = self.commands.get(timeout=self.scan_interval)
+            except queue.Empty:
+                self._legacy_scan()
+                continue
+            if command is None:
+                break
+            if command[0] == 'scan':
+                self._legacy_scan()
+            elif command[0] == 'connect':
+                self._legacy_connect(command[1], command[2])
+            elif command[0] == 'disconnect':
+                self._legacy_disconnect()
+
+    def _legacy_status(self):
+        try:
+            result = subprocess.run(['iwconfig', self.interface], capture_output=True, text=True)
+            match = re.search(r'ESSID:"([^"]*)"', result.stdout)
+            ssid = match.group(1) if match else None
+        except Exception:
+            ssid = None
+        state = 'COMPLETED' if ssid else 'DISCONNECTED'
+        if state != self.wpa_state or ssid != self.current_ssid:
+            self.wpa_state = state
+            self.current_ssid = ssid
+            self.state_changed.emit(state, ssid or "")
+
+    def _legacy_scan(self):
+        try:
+            output = subprocess.check_output(['sudo', 'iwlist', self.interface, 'scan'], encoding='utf-8')
+        except Exception as e:
+            log.warning("扫描失败: %s", e)
+            return
+        now = time.monotonic()
+        for cell in output.split('Cell ')[1:]:
+            ssid = re.search(r'ESSID:"([^"]*)"', cell)
+            signal = re.search(r'Signal level=(-?\d+)', cell)
+            if ssid and ssid.group(1):
+                self.entries[ssid.group(1)] = ScanEntry(ssid.group(1), int(signal.group(1)) if signal else -100, now)
+        for ssid in [ssid for ssid, entry in self.entries.items() if now - entry.seen_at > self.entry_ttl]:
+            del self.entries[ssid]
+        self.scan_updated.emit(self.cached_networks())
+
+    def _legacy_disconnect(self):
+        try:
+            subprocess.run(['sudo', 'killall', 'wpa_supplicant'], check=False, capture_output=True)
+            subprocess.run(['sudo', 'killall', 'dhclient'], check=False, capture_output=True)
+            self.disconnect_result.emit(True, "WiFi已断开连接")
+        except Exception as e:
+            self.disconnect_result.emit(False, str(e))
+        self._legacy_status()
+
+    def _legacy_connect(self, ssid, password):
+        """重新启动 wpa_supplicant 连接（原有方式，较慢）"""
+        config_path = "/tmp/wpa_supplicant.conf"
+        try:
+            subprocess.run(['sudo', 'killall', 'wpa_supplicant'], check=False, capture_output=True)
+            subprocess.run(['sudo', 'killall', 'dhclient'], check=False, capture_output=True)
+            # 与控制接口方式一致：没有密码时按开放网络连接
+            if password:
+                security = f"psk={encode_psk(ssid, password)}\n    key_mgmt=WPA-PSK"
+            else:
+                security = "key_mgmt=NONE"
+            config = f"""ctrl_interface=DIR=/var/run/wpa_supplicant GROUP=netdev
+update_config=1
+country=CN
+
+network={{
+    ssid={encode_ssid(ssid)}
+    {security}
+}}"""
+            with open(config_path, "w") as f:
+                f.write(config)
+            subprocess.run(['sudo', 'wpa_supplicant', '-B', '-i', self.interface, '-c', config_path],
+                           check=True, capture_output=True)
+            subprocess.run(['sudo', 'dhclient', self.interface], check=True, capture_output=True)
+            for _ in range(10):  # 最多等待10秒
+                self._legacy_status()
+                if self.current_ssid == ssid:
+                    self.connection_result.emit(True, "WiFi连接成功")
+                    return
+                time.sleep(1)
+            self.connection_result.emit(False, "连接超时")
+        except Exception as e:
+            self.connection_result.emit(False, str(e))
+        finally:
+            if os.path.exists(config_path):
+                os.remove(config_path)
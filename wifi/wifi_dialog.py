@@ -1,28 +1,36 @@
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                             QPushButton, QComboBox, QLineEdit, QMessageBox)
-import subprocess
-import re
-import time
-import threading
 import os
 import json
+from wifi.network_manager import NetworkManager
+from applog import get_logger
+
+
+log = get_logger('wifi')
+
 
 class WiFiDialog(QDialog):
     # 定义信号
     status_update = QtCore.pyqtSignal(str)
-    connection_result = QtCore.pyqtSignal(bool, str)
-    disconnect_result = QtCore.pyqtSignal(bool, str)
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, network_manager=None):
+        """
+        :param network_manager: 共享的 NetworkManager，不提供时新建一个
+        """
         super().__init__(parent)
         self.setWindowTitle("WiFi设置")
         self.setFixedSize(400, 300)
+        if network_manager is None:
+            network_manager = NetworkManager()
+            network_manager.start()
+        self.network_manager = network_manager
         self.wifi_credentials_file = os.path.expanduser("~/.wifi_credentials.json")
         self.load_wifi_credentials()
         self.setup_ui()
-        self.scan_wifi()
-        self.current_ssid = self.get_current_ssid()
+        # 先显示缓存的扫描结果，再在后台刷新
+        self.update_wifi_list(self.network_manager.cached_networks())
+        self.network_manager.request_scan()
         
     def load_wifi_credentials(self):
         """加载保存的WiFi凭据"""
@@ -33,7 +41,7 @@ class WiFiDialog(QDialog):
             else:
                 self.wifi_credentials = {}
         except Exception as e:
-            print(f"加载WiFi凭据失败: {e}")
+            log.warning("加载WiFi凭据失败: %s", e)
             self.wifi_credentials = {}
             
     def save_wifi_credentials(self):
@@ -42,7 +50,7 @@ class WiFiDialog(QDialog):
             with open(self.wifi_credentials_file, 'w') as f:
                 json.dump(self.wifi_credentials, f)
         except Exception as e:
-            print(f"保存WiFi凭据失败: {e}")
+            log.error("保存WiFi凭据失败: %s", e)
             
     def update_wifi_credentials(self, ssid, password):
         """更新WiFi凭据"""
@@ -111,22 +119,30 @@ class WiFiDialog(QDialog):
         
         # 连接信号
         self.status_update.connect(self._update_status_text)
-        self.connection_result.connect(self._handle_connection_result)
-        self.disconnect_result.connect(self._handle_disconnect_result)
+        self.network_manager.scan_updated.connect(self.update_wifi_list)
+        self.network_manager.state_changed.connect(self.update_status)
+        self.network_manager.connection_result.connect(self._handle_connection_result)
+        self.network_manager.disconnect_result.connect(self._handle_disconnect_result)
         
         self.update_status()
+
+    def done(self, result):
+        """关闭对话框时断开与 NetworkManager 的信号连接"""
+        if self.isVisible():
+            self._disconnect_manager()
+        super().done(result)
+
+    def _disconnect_manager(self):
+        self.network_manager.scan_updated.disconnect(self.update_wifi_list)
+        self.network_manager.state_changed.disconnect(self.update_status)
+        self.network_manager.connection_result.disconnect(self._handle_connection_result)
+        self.network_manager.disconnect_result.disconnect(self._handle_disconnect_result)
         
     def get_current_ssid(self):
-        """获取当前连接的WiFi名称"""
-        try:
-            result = subprocess.run(['iwconfig', 'wlan0'], 
-                                 capture_output=True, text=True)
-            match = re.search(r'ESSID:"([^"]*)"', result.stdout)
-            return match.group(1) if match else None
-        except:
-            return None
+        """获取当前连接的WiFi名称（由 NetworkManager 缓存，不再调用 iwconfig）"""
+        return self.network_manager.current_ssid
             
-    def update_status(self):
+    def update_status(self, *args):
         """更新状态显示"""
         current_ssid = self.get_current_ssid()
         if current_ssid:
@@ -142,36 +158,30 @@ class WiFiDialog(QDialog):
         self.status_label.setText(text)
         
     def scan_wifi(self):
-        """扫描可用的WiFi网络"""
-        self.wifi_combo.clear()
+        """扫描可用的WiFi网络（后台进行，结果到达后更新列表）"""
         self.status_update.emit("正在扫描WiFi...")
-        
-        try:
-            # 使用iwlist命令获取WiFi列表
-            output = subprocess.check_output(['sudo', 'iwlist', 'wlan0', 'scan'], encoding='utf-8')
-            # 提取SSID
-            ssids = re.findall(r'ESSID:"([^"]*)"', output)
-            # 去重
-            unique_ssids = list(dict.fromkeys(ssids))
-            
-            # 添加空选项
-            self.wifi_combo.addItem("")
-            
-            # 添加WiFi网络
-            for ssid in unique_ssids:
-                if ssid:  # 只添加非空的SSID
-                    self.wifi_combo.addItem(ssid)
-            
-            # 如果有当前连接，选中它
-            current_ssid = self.get_current_ssid()
-            if current_ssid:
-                index = self.wifi_combo.findText(current_ssid)
-                if index >= 0:
-                    self.wifi_combo.setCurrentIndex(index)
-            
-            self.update_status()
-        except Exception as e:
-            self.status_update.emit(f"扫描失败: {str(e)}")
+        self.network_manager.request_scan()
+
+    def update_wifi_list(self, entries):
+        """用扫描结果更新下拉列表，保留当前选择"""
+        selected = self.wifi_combo.currentText()
+        self.wifi_combo.blockSignals(True)
+        self.wifi_combo.clear()
+        # 添加空选项
+        self.wifi_combo.addItem("")
+        for entry in entries:
+            self.wifi_combo.addItem(entry.ssid)
+            index = self.wifi_combo.count() - 1
+            self.wifi_combo.setItemData(index, f"信号 {entry.signal} dBm，{int(entry.age)} 秒前", QtCore.Qt.ToolTipRole)
+
+        # 保留用户的选择，否则选中当前连接
+        index = self.wifi_combo.findText(selected or self.get_current_ssid() or "")
+        if index >= 0:
+            self.wifi_combo.setCurrentIndex(index)
+        self.wifi_combo.blockSignals(False)
+        if self.wifi_combo.currentText() != selected:
+            self.on_wifi_selected(self.wifi_combo.currentText())
+        self.update_status()
     
     def on_wifi_selected(self, ssid):
         """当选择WiFi时启用连接按钮并自动填充密码"""
@@ -190,52 +200,24 @@ class WiFiDialog(QDialog):
             return
             
         password = self.password_input.text()
-        if not password:
+        # 已保存在 wpa_supplicant 中的网络可以直接重连
+        if not password and not self.network_manager.is_known(self.selected_ssid):
             QMessageBox.warning(self, "警告", "请输入WiFi密码")
             return
             
         self.status_update.emit("正在连接...")
         self.connect_btn.setEnabled(False)
         self.disconnect_btn.setEnabled(False)
-        
-        # 在新线程中执行连接操作
-        threading.Thread(target=self._connect_wifi_thread, 
-                        args=(self.selected_ssid, password),
-                        daemon=True).start()
+        self.connecting_ssid = self.selected_ssid
+        self.connecting_password = password
+        self.network_manager.connect_to(self.selected_ssid, password or None)
     
     def disconnect_wifi(self):
         """断开当前WiFi连接"""
         self.status_update.emit("正在断开连接...")
         self.connect_btn.setEnabled(False)
         self.disconnect_btn.setEnabled(False)
-        
-        # 在新线程中执行断开操作
-        threading.Thread(target=self._disconnect_wifi_thread, 
-                        daemon=True).start()
-    
-    def _disconnect_wifi_thread(self):
-        """在新线程中执行断开连接"""
-        try:
-            # 停止wpa_supplicant
-            subprocess.run(['sudo', 'killall', 'wpa_supplicant'], 
-                         check=False, capture_output=True)
-            subprocess.run(['sudo', 'killall', 'dhclient'], 
-                         check=False, capture_output=True)
-            
-            # 关闭wlan0接口
-            subprocess.run(['sudo', 'ifconfig', 'wlan0', 'down'], 
-                         check=True, capture_output=True)
-            
-            # 等待一下确保接口完全关闭
-            time.sleep(1)
-            
-            # 重新启动wlan0接口
-            subprocess.run(['sudo', 'ifconfig', 'wlan0', 'up'], 
-                         check=True, capture_output=True)
-            
-            self.disconnect_result.emit(True, "WiFi已断开连接")
-        except Exception as e:
-            self.disconnect_result.emit(False, str(e))
+        self.network_manager.disconnect_from()
     
     @QtCore.pyqtSlot(bool, str)
     def _handle_disconnect_result(self, success, message):
@@ -246,84 +228,18 @@ class WiFiDialog(QDialog):
         else:
             QMessageBox.warning(self, "错误", f"断开连接失败: {message}")
     
-    def _connect_wifi_thread(self, ssid, password):
-        """在新线程中执行WiFi连接"""
-        try:
-            # 先断开当前连接
-            subprocess.run(['sudo', 'killall', 'wpa_supplicant'], 
-                         check=False, capture_output=True)
-            subprocess.run(['sudo', 'killall', 'dhclient'], 
-                         check=False, capture_output=True)
-            
-            # 关闭wlan0接口
-            subprocess.run(['sudo', 'ifconfig', 'wlan0', 'down'], 
-                         check=True, capture_output=True)
-            
-            # 等待一下确保接口完全关闭
-            time.sleep(1)
-            
-            # 重新启动wlan0接口
-            subprocess.run(['sudo', 'ifconfig', 'wlan0', 'up'], 
-                         check=True, capture_output=True)
-            
-            # 创建wpa_supplicant配置
-            config = f"""ctrl_interface=DIR=/var/run/wpa_supplicant GROUP=netdev
-update_config=1
-country=CN
-
-network={{
-    ssid="{ssid}"
-    psk="{password}"
-    key_mgmt=WPA-PSK
-}}"""
-            
-            # 保存配置文件
-            with open("/tmp/wpa_supplicant.conf", "w") as f:
-                f.write(config)
-            
-            # 启动wpa_supplicant
-            subprocess.run(['sudo', 'wpa_supplicant', '-B', '-i', 'wlan0', '-c', '/tmp/wpa_supplicant.conf'], 
-                         check=True, capture_output=True)
-            
-            # 等待wpa_supplicant启动
-            time.sleep(2)
-            
-            # 获取IP地址
-            subprocess.run(['sudo', 'dhclient', 'wlan0'], 
-                         check=True, capture_output=True)
-            
-            # 等待连接成功
-            for _ in range(10):  # 最多等待10秒
-                time.sleep(1)
-                result = subprocess.run(['iwconfig', 'wlan0'], 
-                                     capture_output=True, text=True)
-                if ssid in result.stdout:
-                    # 连接成功，保存凭据
-                    self.update_wifi_credentials(ssid, password)
-                    self.connection_result.emit(True, "WiFi连接成功")
-                    return
-            
-            # 连接失败，如果之前保存过这个WiFi的凭据，则删除
-            if ssid in self.wifi_credentials:
-                self.remove_wifi_credentials(ssid)
-            self.connection_result.emit(False, "连接超时")
-            
-        except Exception as e:
-            # 连接失败，如果之前保存过这个WiFi的凭据，则删除
-            if ssid in self.wifi_credentials:
-                self.remove_wifi_credentials(ssid)
-            self.connection_result.emit(False, str(e))
-        finally:
-            # 清理临时文件
-            try:
-                os.remove("/tmp/wpa_supplicant.conf")
-            except:
-                pass
-    
     @QtCore.pyqtSlot(bool, str)
     def _handle_connection_result(self, success, message):
         """处理连接结果"""
         self.update_status()
+        ssid = getattr(self, 'connecting_ssid', None)
+        if ssid:
+            if success and self.connecting_password:
+                # 连接成功，保存凭据
+                self.update_wifi_credentials(ssid, self.connecting_password)
+            elif not success and ssid in self.wifi_credentials:
+                # 连接失败，如果之前保存过这个WiFi的凭据，则删除
+                self.remove_wifi_credentials(ssid)
         if success:
             QMessageBox.information(self, "成功", message)
             self.close()  # 连接成功后关闭对话框
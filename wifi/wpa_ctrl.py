@@ -0,0 +1,227 @@
+import os
+import re
+import hashlib
+import socket
+import tempfile
+import itertools
+import time
+
+
+class WpaCtrlError(Exception):
+    """与 wpa_supplicant 控制接口通信失败"""
+
+
+class WpaCtrl:
+    """
+    wpa_supplicant 控制接口客户端（Unix 数据报套接字）。
+    直接向正在运行的 wpa_supplicant 发送命令，不再杀进程、重启网卡。
+    """
+    _counter = itertools.count()
+
+    def __init__(self, interface='wlan0', ctrl_dir='/var/run/wpa_supplicant'):
+        self.path = os.path.join(ctrl_dir, interface)
+        self.local_path = os.path.join(
+            tempfile.gettempdir(), f"wpa_ctrl_{os.getpid()}_{next(self._counter)}")
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self.sock.bind(self.local_path)
+            self.sock.connect(self.path)
+        except OSError as e:
+            self.close()
+            raise WpaCtrlError(f"无法连接 wpa_supplicant 控制接口 {self.path}: {e}")
+
+    def request(self, command, timeout=3.0):
+        """发送命令并返回应答文本（跳过期间收到的事件消息）"""
+        try:
+            self.sock.send(command.encode('utf-8'))
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WpaCtrlError(f"命令超时: {command.split()[0]}")
+                self.sock.settimeout(remaining)
+                reply = self.sock.recv(8192).decode('utf-8', errors='replace')
+                if not reply.startswith('<'):
+                    return reply
+        except socket.timeout:
+            raise WpaCtrlError(f"命令超时: {command.split()[0]}")
+        except OSError as e:
+            raise WpaCtrlError(str(e))
+
+    def attach(self):
+        """订阅事件消息，之后用 recv_event 接收"""
+        if self.request('ATTACH').strip() != 'OK':
+            raise WpaCtrlError("ATTACH 失败")
+
+    def recv_event(self, timeout):
+        """接收一条事件消息（去掉优先级前缀），超时返回 None"""
+        self.sock.settimeout(timeout)
+        try:
+            message = self.sock.recv(8192).decode('utf-8', errors='replace')
+        except socket.timeout:
+            return None
+        except OSError as e:
+            raise WpaCtrlError(str(e))
+        return re.sub(r'^<\d+>', '', message)
+
+    def close(self):
+        try:
+            self.sock.close()
+        finally:
+            if os.path.exists(self.local_path):
+                os.unlink(self.local_path)
+
+
+def decode_ssid(text):
+    """还原 wpa_supplicant 输出中转义的 SSID（如中文会输出为 \\xe4\\xb8...）"""
+    if '\\' not in text:
+        return text
+    data = bytearray()
+    i = 0
+    while i < len(text):
+        if text.startswith('\\x', i) and i + 4 <= len(text):
+            data.append(int(text[i + 2:i + 4], 16))
+            i += 4
+        elif text[i] == '\\' and i + 1 < len(text):
+            data += text[i + 1].encode('utf-8')
+            i += 2
+        else:
+            data += text[i].encode('utf-8')
+            i += 1
+    return data.decode('utf-8', errors='replace')
+
+
+def encode_ssid(ssid):
+    """SET_NETWORK 使用的 SSID 参数：十六进制形式，可以包含任意字符"""
+    return ssid.encode('utf-8').hex()
+
+
+def escape_ssid(ssid):
+    """按 wpa_supplicant 输出的方式转义 SSID（非 ASCII 字节输出为 \\xNN），与 decode_ssid 相反"""
+    text = ''
+    for byte in ssid.encode('utf-8'):
+        char = chr(byte)
+        if char in '\\"':
+            text += '\\' + char
+        elif 32 <= byte < 127:
+            text += char
+        else:
+            text += f'\\x{byte:02x}'
+    return text
+
+
+def encode_psk(ssid, password):
+    """
+    SET_NETWORK 使用的 psk 参数：由密码和 SSID 计算出的 64 位十六进制密钥（与 wpa_passphrase 相同），
+    不加引号发送，密码中的引号、空格等字符不需要转义。已经是 64 位十六进制的密码原样使用。
+    """
+    if len(password) == 64 and all(c in '0123456789abcdefABCDEF' for c in password):
+        return password.lower()
+    return hashlib.pbkdf2_hmac('sha1', password.encode('utf-8'), ssid.encode('utf-8'), 4096, 32).hex()
+
+
+class FakeWpaCtrl:
+    """
+    wpa_supplicant 控制接口的替身，在没有无线网卡的环境下开发和测试 NetworkManager。
+    同一个实例同时充当命令通道和事件通道。
+    """
+
+    def __init__(self, networks=None, passwords=None, connect_delay=0.2):
+        """
+        :param networks: [(ssid, 信号强度dBm), ...]
+        :param passwords: {ssid: 正确密码}
+        :param connect_delay: 模拟的连接耗时（秒）
+        """
+        self.networks = networks or [("Lab-WiFi", -45), ("Office", -67)]
+        self.passwords = passwords or {"Lab-WiFi": "12345678"}
+        self.connect_delay = connect_delay
+        self.configured = {}  # id -> {'ssid':..., 'psk':...}
+        self.next_id = 0
+        self.current = None
+        self.events = []  # [(触发时间, 事件文本)]
+        self.commands = []  # 收到的命令，便于检查
+
+    def request(self, command, timeout=3.0):
+        self.commands.append(command)
+        parts = command.split(' ', 3)
+        name = parts[0]
+        if name == 'PING':
+            return 'PONG\n'
+        if name == 'SCAN':
+            self._emit('CTRL-EVENT-SCAN-RESULTS ', 0.05)
+            return 'OK\n'
+        if name == 'SCAN_RESULTS':
+            lines = ['bssid / frequency / signal level / flags / ssid']
+            for i, (ssid, signal) in enumerate(self.networks):
+                lines.append(f"00:11:22:33:44:{i:02x}\t2437\t{signal}\t[WPA2-PSK-CCMP][ESS]\t{escape_ssid(ssid)}")
+            return '\n'.join(lines) + '\n'
+        if name == 'STATUS':
+            if self.current is None:
+                return 'wpa_state=DISCONNECTED\n'
+            return (f"wpa_state=COMPLETED\nssid={escape_ssid(self.configured[self.current]['ssid'])}\n"
+                    "ip_address=192.168.1.50\n")
+        if name == 'LIST_NETWORKS':
+            lines = ['network id / ssid / bssid / flags']
+            for network_id, config in self.configured.items():
+                flags = '[CURRENT]' if network_id == self.current else ''
+                lines.append(f"{network_id}\t{escape_ssid(config['ssid'])}\tany\t{flags}")
+            return '\n'.join(lines) + '\n'
+        if name == 'ADD_NETWORK':
+            network_id = self.next_id
+            self.next_id += 1
+            self.configured[network_id] = {}
+            return f"{network_id}\n"
+        if name == 'SET_NETWORK':
+            network_id, key, value = int(parts[1]), parts[2], parts[3]
+            if key == 'ssid':
+                value = bytes.fromhex(value).decode('utf-8') if not value.startswith('"') else value.strip('"')
+            else:
+                value = value.strip('"')
+            self.configured[network_id][key] = value
+            return 'OK\n'
+        if name == 'SELECT_NETWORK':
+            network_id = int(parts[1])
+            config = self.configured.get(network_id)
+            if config is None:
+                return 'FAIL\n'
+            password = self.passwords.get(config['ssid'])
+            if (password and encode_psk(config['ssid'], password)) == config.get('psk'):
+                self.current = network_id
+                self._emit(f"CTRL-EVENT-CONNECTED - Connection to 00:11:22:33:44:00 completed [id={network_id}]",
+                           self.connect_delay)
+            else:
+                self._emit(f"CTRL-EVENT-SSID-TEMP-DISABLED id={network_id} ssid=\"{config['ssid']}\" "
+                           "auth_failures=1 duration=10 reason=WRONG_KEY", self.connect_delay)
+            return 'OK\n'
+        if name == 'REMOVE_NETWORK':
+            self.configured.pop(int(parts[1]), None)
+            return 'OK\n'
+        if name == 'DISCONNECT':
+            if self.current is not None:
+                self.current = None
+                self._emit('CTRL-EVENT-DISCONNECTED bssid=00:11:22:33:44:00 reason=3 locally_generated=1', 0.01)
+            return 'OK\n'
+        if name in ('ATTACH', 'SAVE_CONFIG', 'ENABLE_NETWORK', 'RECONNECT'):
+            return 'OK\n'
+        return 'UNKNOWN COMMAND\n'
+
+    def attach(self):
+        self.request('ATTACH')
+
+    def recv_event(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if self.events and self.events[0][0] <= now:
+                return self.events.pop(0)[1]
+            wait = min([deadline] + [event[0] for event in self.events]) - now
+            if wait <= 0 and now >= deadline:
+                return None
+            time.sleep(max(0.0, min(wait, 0.05)))
+
+    def close(self):
+        pass
+
+    def _emit(self, message, delay):
+        self.events.append((time.monotonic() + delay, message))
+        self.events.sort(key=lambda event: event[0])
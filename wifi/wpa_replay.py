@@ -0,0 +1,63 @@
+"""
+用 FakeWpaCtrl 回放扫描、连接和出错时的应答，检查 NetworkManager 的解析结果（不需要无线网卡）：
+    python -m wifi.wpa_replay
+"""
+import sys
+from wifi.network_manager import NetworkManager
+from wifi.wpa_ctrl import FakeWpaCtrl
+
+
+NETWORKS = [("Lab-WiFi", -45), ("实验室", -52), ('Guest "5G"', -70)]
+PASSWORDS = {"Lab-WiFi": "12345678", "实验室": 'p"ss word\\'}
+
+
+def replay():
+    """在当前线程中驱动 NetworkManager，返回 [(检查项, 实际, 期望), ...]"""
+    fake = FakeWpaCtrl(networks=NETWORKS, passwords=PASSWORDS, connect_delay=0.01)
+    manager = NetworkManager(ctrl_factory=lambda: fake, connect_timeout=1)
+    manager.ctrl = manager.events = fake
+    results = []
+    manager.connection_result.connect(lambda ok, message: results.append((ok, message)))
+
+    def pump():
+        while True:
+            event = fake.recv_event(timeout=0.05)
+            if event is None:
+                return
+            manager._handle_event(event)
+
+    def connect(ssid, password):
+        manager._start_connect(ssid, password)
+        pump()
+        return results.pop() if results else None
+
+    checks = []
+    manager._refresh_status()
+    checks.append(("初始状态", manager.wpa_state, 'DISCONNECTED'))
+    manager._scan()
+    pump()
+    checks.append(("扫描结果", [(entry.ssid, entry.signal) for entry in manager.cached_networks()], NETWORKS))
+    checks.append(("密码错误", connect("Lab-WiFi", "wrong-password"), (False, "密码错误")))
+    checks.append(("删除连接失败的网络", dict(fake.configured), {}))
+    checks.append(("中文SSID和带引号的密码", connect("实验室", PASSWORDS["实验室"]), (True, "WiFi连接成功")))
+    checks.append(("连接后状态", (manager.wpa_state, manager.current_ssid), ('COMPLETED', "实验室")))
+    manager._refresh_known_networks()
+    checks.append(("已保存网络", manager.is_known("实验室"), True))
+    fake.request('DISCONNECT')
+    pump()
+    checks.append(("断开后状态", (manager.wpa_state, manager.current_ssid), ('DISCONNECTED', None)))
+    return checks
+
+
+if __name__ == "__main__":
+    checks = replay()
+    failed = 0
+    for name, got, expected in checks:
+        if got != expected:
+            failed += 1
+            print(f"[失败] {name}: 期望 {expected}, 实际 {got}")
+        else:
+            print(f"[通过] {name}")
+    print(f"共 {len(checks)} 项, 失败 {failed} 项")
+    if failed:
+        sys.exit(1)